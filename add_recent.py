@@ -3,37 +3,7 @@ from openpyxl import load_workbook
 from datetime import datetime, date
 import sqlite3
 
-def parse_date(value):
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value.date()
-    if isinstance(value, date):
-        return value
-    if isinstance(value, str):
-        value = value.strip()
-        if 'x' in value.lower():
-            return None
-        formats = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']
-        for fmt in formats:
-            try:
-                return datetime.strptime(value, fmt).date()
-            except:
-                continue
-    return None
-
-def parse_price(value):
-    if value is None:
-        return 0.0
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        value = value.replace('$', '').replace(',', '').strip()
-        try:
-            return float(value)
-        except:
-            return 0.0
-    return 0.0
+from parsing import parse_date, parse_price, parse_phone
 
 xlsx_path = "/home/bad/Desktop/David/quotes (version 1) (Autosaved) (Autosaved).xlsx"
 db_path = "/home/bad/Desktop/David/quoteforge/instance/quoteforge.db"
@@ -65,7 +35,7 @@ for row_num, row in enumerate(ws.iter_rows(min_row=6, values_only=True), start=6
         continue
     
     name = str(name).strip() if name else "Unknown"
-    phone = str(phone).strip() if phone and str(phone) != '0' else None
+    phone = parse_phone(phone)
     address = str(address).strip() if address else None
     description = str(description).strip() if description else "No description"
     price_val = parse_price(price)
@@ -92,6 +62,13 @@ for row_num, row in enumerate(ws.iter_rows(min_row=6, values_only=True), start=6
                (customer_id, qn, description, price_val, job_date.isoformat(), datetime.now().isoformat()))
     imported += 1
 
+# Closed-FY report snapshots and customer stats may now be stale; the app
+# rebuilds snapshots on demand and customer stats at startup
+for table in ('report_snapshot', 'customer_stats'):
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    if cur.fetchone():
+        cur.execute(f"DELETE FROM {table}")
+
 conn.commit()
 conn.close()
 
@@ -0,0 +1,139 @@
+"""
+Columnar job analytics for the reports page.
+
+app.py loads every job's date, price, status and COGS into a JobColumns once
+per data version; the series below are vectorised group-bys (np.bincount)
+over those arrays instead of one SQL aggregate per month or status.
+"""
+import numpy as np
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+FY_MONTH_LABELS = MONTH_LABELS[6:] + MONTH_LABELS[:6]  # Australian FY runs July-June
+MARGIN_BINS = [-100, 0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]  # Gross margin %, clipped to +/-100
+
+
+def month_index(d):
+    """Months since Jan 1970 - the bucket key used throughout"""
+    return (d.year - 1970) * 12 + d.month - 1
+
+
+def month_label(index):
+    return f'{MONTH_LABELS[index % 12]} {1970 + index // 12}'
+
+
+class JobColumns:
+    """Jobs as parallel NumPy arrays"""
+
+    def __init__(self, days, prices, cogs, status_codes, statuses, revenue_statuses):
+        self.days = days                  # datetime64[D]
+        self.months = days.astype('datetime64[M]').astype(np.int64)
+        self.prices = prices              # ex GST
+        self.cogs = cogs
+        self.status_codes = status_codes  # index into self.statuses
+        self.statuses = statuses
+        self.revenue = np.isin(status_codes, [statuses.index(s) for s in revenue_statuses if s in statuses])
+
+    @classmethod
+    def from_rows(cls, rows, statuses, revenue_statuses):
+        """Build from (date, price, status, cogs) rows; jobs without a date are left out"""
+        statuses = list(statuses)
+        codes = {status: i for i, status in enumerate(statuses)}
+        rows = [row for row in rows if row[0] is not None]
+        if rows:
+            dates, prices, status_names, cogs = zip(*rows)
+        else:
+            dates, prices, status_names, cogs = (), (), (), ()
+        for status in status_names:
+            # Statuses outside STATUS_LABELS still get a bucket of their own
+            if status not in codes:
+                codes[status] = len(statuses)
+                statuses.append(status)
+        return cls(
+            np.array(dates, dtype='datetime64[D]'),
+            np.nan_to_num(np.array(prices, dtype=np.float64)),
+            np.nan_to_num(np.array(cogs, dtype=np.float64)),
+            np.array([codes[s] for s in status_names], dtype=np.int16),
+            statuses,
+            revenue_statuses,
+        )
+
+    def __len__(self):
+        return len(self.days)
+
+    def period(self, date_start, date_end):
+        """Boolean mask of jobs dated within [date_start, date_end]"""
+        return (self.days >= np.datetime64(date_start)) & (self.days <= np.datetime64(date_end))
+
+
+def monthly_totals(cols, first_month, last_month, mask=None):
+    """(revenue, cogs) per month for month indexes first_month..last_month, revenue jobs only"""
+    n = last_month - first_month + 1
+    selected = cols.revenue & (cols.months >= first_month) & (cols.months <= last_month)
+    if mask is not None:
+        selected &= mask
+    buckets = cols.months[selected] - first_month
+    revenue = np.bincount(buckets, weights=cols.prices[selected], minlength=n)
+    cogs = np.bincount(buckets, weights=cols.cogs[selected], minlength=n)
+    return revenue, cogs
+
+
+def rolling_revenue(cols, end_date, months=36, window=12):
+    """Monthly revenue and its trailing `window`-month total for the `months` months up to end_date"""
+    last = month_index(end_date)
+    first = last - months - window + 2
+    revenue, _ = monthly_totals(cols, first, last)
+    rolling = np.convolve(revenue, np.ones(window), mode='valid')
+    return {
+        'labels': [month_label(i) for i in range(last - months + 1, last + 1)],
+        'revenue': revenue[window - 1:].round(2).tolist(),
+        'rolling': rolling.round(2).tolist(),
+    }
+
+
+def seasonality(cols, last_fy):
+    """Average revenue per FY month (Jul..Jun) across FYs up to last_fy that had any revenue"""
+    fy_offset = cols.months - 6  # July-based months, so // 12 and % 12 give FY and FY month
+    selected = cols.revenue & (fy_offset // 12 + 1970 <= last_fy)
+    if not selected.any():
+        return {'labels': FY_MONTH_LABELS, 'average': [0] * 12, 'share': [0] * 12, 'fys': 0}
+
+    offsets = fy_offset[selected]
+    first_fy_offset = offsets.min() // 12 * 12
+    n_fys = (offsets.max() - first_fy_offset) // 12 + 1
+    grid = np.bincount(offsets - first_fy_offset, weights=cols.prices[selected],
+                       minlength=n_fys * 12).reshape(n_fys, 12)
+    grid = grid[grid.sum(axis=1) > 0]  # Skip gap years with no jobs at all
+
+    average = grid.mean(axis=0)
+    total = average.sum()
+    return {
+        'labels': FY_MONTH_LABELS,
+        'average': average.round(2).tolist(),
+        'share': (average / total * 100).round(1).tolist() if total else [0] * 12,
+        'fys': len(grid),
+    }
+
+
+def average_job_value(cols, mask):
+    """[(status, job count, average price)] for statuses with jobs in mask"""
+    codes = cols.status_codes[mask]
+    n = len(cols.statuses)
+    counts = np.bincount(codes, minlength=n)
+    totals = np.bincount(codes, weights=cols.prices[mask], minlength=n)
+    averages = np.divide(totals, counts, out=np.zeros(n), where=counts > 0)
+    return [(status, int(counts[i]), round(float(averages[i]), 2))
+            for i, status in enumerate(cols.statuses) if counts[i]]
+
+
+def margin_distribution(cols, mask):
+    """Histogram of gross margin % over revenue jobs in mask that have materials recorded"""
+    selected = mask & cols.revenue & (cols.prices > 0) & (cols.cogs > 0)
+    margins = np.clip((cols.prices[selected] - cols.cogs[selected]) / cols.prices[selected] * 100, -100, 100)
+    counts, _ = np.histogram(margins, bins=MARGIN_BINS)
+    labels = ['< 0%'] + [f'{lo}-{hi}%' for lo, hi in zip(MARGIN_BINS[1:-1], MARGIN_BINS[2:])]
+    return {
+        'labels': labels,
+        'counts': counts.tolist(),
+        'jobs': int(selected.sum()),
+        'median': round(float(np.median(margins)), 1) if len(margins) else None,
+    }
@@ -1,31 +1,425 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session, Response, stream_with_context, stream_template, get_flashed_messages
+from flask import g, abort, has_app_context, has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
 from datetime import datetime, date, timedelta, timezone
 from apscheduler.schedulers.background import BackgroundScheduler
 from functools import wraps
-from sqlalchemy import text, func
+from collections import namedtuple, OrderedDict, defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text, func, event, create_engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import NullPool
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.local import LocalProxy
+from openpyxl import Workbook
+from PIL import Image, ImageOps
 import os
-import shutil
+import io
+import csv
+import json
 import hashlib
 import ipaddress
+import tempfile
+import re
+import time
+import bisect
+import heapq
+import logging
+import threading
+import queue
+import uuid
+import mimetypes
+import sqlite3
+import fcntl
+import zipfile
+import click
+
+import analytics
+import quotes
+from parsing import parse_date, phone_digits
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'quoteforge-secret-key-2025-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quoteforge.db'
+# Override to point at another database file (benchmarks, load tests, staging copies)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('QUOTEFORGE_DATABASE_URI', 'sqlite:///quoteforge.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['WTF_CSRF_ENABLED'] = True
 app.config['WTF_CSRF_TIME_LIMIT'] = 3600
+# Per-request SQL/render timing in a Server-Timing header (QUOTEFORGE_SQL_TIMING=0 to disable)
+app.config['SQL_TIMING_ENABLED'] = os.environ.get('QUOTEFORGE_SQL_TIMING', '1') == '1'
+# Statements slower than this go to the slow-query log with their plan (0 disables)
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('QUOTEFORGE_SLOW_QUERY_MS', '100'))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('QUOTEFORGE_SLOW_QUERY_LOG',
+                                              os.path.join(os.path.dirname(__file__), 'slow_query.log'))
+# Prometheus /metrics endpoint and the per-request collection behind it (QUOTEFORGE_METRICS=0 to disable)
+app.config['METRICS_ENABLED'] = os.environ.get('QUOTEFORGE_METRICS', '1') == '1'
+# Job attachments (fabric photos, signed quotes); larger requests get a 413
+app.config['UPLOAD_DIR'] = os.environ.get('QUOTEFORGE_UPLOAD_DIR',
+                                          os.path.join(os.path.dirname(__file__), 'uploads'))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('QUOTEFORGE_MAX_UPLOAD_MB', '50')) * 1024 * 1024
+# Printable quotes/invoices: rendered-document cache and the business block printed on them
+app.config['QUOTE_CACHE_DIR'] = os.environ.get('QUOTEFORGE_QUOTE_CACHE_DIR',
+                                               os.path.join(os.path.dirname(__file__), 'quote_cache'))
+app.config['QUOTE_BUSINESS_NAME'] = os.environ.get('QUOTEFORGE_BUSINESS_NAME', 'QuoteForge Upholstery')
+app.config['QUOTE_BUSINESS_DETAILS'] = os.environ.get('QUOTEFORGE_BUSINESS_DETAILS', '')  # ABN, address, phone
+app.config['QUOTE_FOOTER'] = os.environ.get('QUOTEFORGE_QUOTE_FOOTER', 'Thank you for your business.')
+# Multi-workshop hosting: a JSON registry of tenants, each with its own SQLite file under TENANT_DIR.
+# With no registry the app runs single-shop on SQLALCHEMY_DATABASE_URI, exactly as before.
+app.config['TENANTS_FILE'] = os.environ.get('QUOTEFORGE_TENANTS_FILE', os.path.join(app.instance_path, 'tenants.json'))
+app.config['TENANT_DIR'] = os.environ.get('QUOTEFORGE_TENANT_DIR', os.path.join(app.instance_path, 'tenants'))
+app.config['MAX_OPEN_TENANTS'] = int(os.environ.get('QUOTEFORGE_MAX_OPEN_TENANTS', '8'))
+# Optional read replica (QUOTEFORGE_REPLICA=1): a copy of the database, refreshed in the background, that the
+# REPLICA_ENDPOINTS read from while it is at most REPLICA_MAX_LAG seconds behind (the primary otherwise)
+app.config['REPLICA_ENABLED'] = os.environ.get('QUOTEFORGE_REPLICA', '0') == '1'
+app.config['REPLICA_MAX_LAG'] = float(os.environ.get('QUOTEFORGE_REPLICA_MAX_LAG', '60'))
+# Backup/restore run as background tasks, recorded in their own small database so they survive a restore
+app.config['TASKS_DATABASE'] = os.environ.get('QUOTEFORGE_TASKS_DB', os.path.join(app.instance_path, 'tasks.db'))
+app.config['TASK_WORKERS'] = int(os.environ.get('QUOTEFORGE_TASK_WORKERS', '2'))
+app.config['REPLICA_ENDPOINTS'] = set(os.environ.get('QUOTEFORGE_REPLICA_ENDPOINTS',
+                                                     'reports,reports_export,lcars_reports').split(','))
+# Nightly database maintenance (statistics, space reclaim, checkpoint): the hour it starts and the seconds
+# each database may spend on it before the remaining steps wait for the next night
+app.config['MAINTENANCE_HOUR'] = int(os.environ.get('QUOTEFORGE_MAINTENANCE_HOUR', '3'))
+app.config['MAINTENANCE_BUDGET'] = float(os.environ.get('QUOTEFORGE_MAINTENANCE_BUDGET', '60'))
+# Port for `python3 app.py` (load tests start a second server alongside the real one)
+app.config['PORT'] = int(os.environ.get('QUOTEFORGE_PORT', '8001'))
+
+##############################################
+# ============== TENANTS ==============
+##############################################
+
+Tenant = namedtuple('Tenant', 'slug name hosts password_hash')
+TENANT_SLUG_RE = re.compile(r'^[a-z0-9][a-z0-9_-]{0,39}$')
+_tenant_registry = {'mtime': None, 'tenants': {}, 'hosts': {}}
+
+def load_tenants():
+    """slug -> Tenant from TENANTS_FILE, re-read when the file changes (empty in single-shop mode)"""
+    path = app.config['TENANTS_FILE']
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if mtime != _tenant_registry['mtime']:
+        tenants = {}
+        if mtime is not None:
+            with open(path) as f:
+                for slug, entry in json.load(f).items():
+                    if not TENANT_SLUG_RE.match(slug):
+                        print(f"[WARN] Ignoring tenant with invalid slug: {slug!r}")
+                        continue
+                    tenants[slug] = Tenant(slug, entry.get('name', slug),
+                                           [h.lower() for h in entry.get('hosts', [])], entry['password_hash'])
+        _tenant_registry['hosts'] = {host: t.slug for t in tenants.values() for host in t.hosts}
+        _tenant_registry['tenants'] = tenants
+        _tenant_registry['mtime'] = mtime
+    return _tenant_registry['tenants']
+
+def tenant_slugs():
+    """Every tenant, or [None] - the single shared database - in single-shop mode"""
+    return sorted(load_tenants()) or [None]
+
+def current_tenant_slug():
+    return g.get('tenant') if has_app_context() else None
+
+def current_tenant():
+    slug = current_tenant_slug()
+    return load_tenants().get(slug) if slug else None
+
+def tenant_for_host(host):
+    load_tenants()
+    return _tenant_registry['hosts'].get(host.split(':')[0].lower())
+
+def tenant_database_path(slug):
+    return os.path.join(app.config['TENANT_DIR'], f'{slug}.db')
+
+def tenant_storage_dir(base_dir):
+    """Per-tenant subdirectory of an uploads/cache/backup directory (the directory itself in single-shop mode)"""
+    slug = current_tenant_slug()
+    return os.path.join(base_dir, slug) if slug else base_dir
+
+@contextmanager
+def tenant_context(slug):
+    """App context bound to one tenant's database, for startup, scheduler jobs and CLI commands"""
+    with app.app_context():
+        g.tenant = slug
+        yield
+
+class TenantEngines:
+    """One engine per tenant database, created on first use.
+    
+    Only MAX_OPEN_TENANTS stay open; the least recently used one is disposed (its
+    pooled connections closed) and its in-memory caches dropped when another opens.
+    """
+    def __init__(self):
+        self.engines = OrderedDict()
+        self.prepared = set()  # Schema checked this process
+        self.lock = threading.Lock()
+    
+    def get(self, slug):
+        with self.lock:
+            engine = self.engines.get(slug)
+            if engine is not None:
+                self.engines.move_to_end(slug)
+                return engine
+            os.makedirs(app.config['TENANT_DIR'], exist_ok=True)
+            engine = create_engine(f'sqlite:///{tenant_database_path(slug)}')
+            if slug not in self.prepared:
+                db.metadata.create_all(engine)
+                setup_indexes_and_fts(engine)
+                self.prepared.add(slug)
+            self.engines[slug] = engine
+            while len(self.engines) > app.config['MAX_OPEN_TENANTS']:
+                idle_slug, idle = self.engines.popitem(last=False)
+                idle.dispose()
+                drop_tenant_caches(idle_slug)
+            return engine
+    
+    def dispose(self, slug):
+        """Close a tenant's connections (before its file is replaced by a restore)"""
+        with self.lock:
+            engine = self.engines.pop(slug, None)
+        if engine is not None:
+            engine.dispose()
+        drop_tenant_caches(slug)
+
+tenant_engines = TenantEngines()
+_tenant_cache_instances = []
 
-db = SQLAlchemy(app)
+def tenant_cache(factory):
+    """Proxy to a per-tenant instance of an in-memory cache, so one shop's data never serves another's"""
+    instances = {}
+    _tenant_cache_instances.append(instances)
+    def current():
+        slug = current_tenant_slug()
+        instance = instances.get(slug)
+        if instance is None:
+            instance = instances.setdefault(slug, factory())
+        return instance
+    return LocalProxy(current)
+
+def drop_tenant_caches(slug):
+    for instances in _tenant_cache_instances:
+        instances.pop(slug, None)
+
+def current_engine():
+    slug = current_tenant_slug()
+    return tenant_engines.get(slug) if slug else db.engine
+
+class TenantSession(FlaskSQLAlchemySession):
+    """Send every statement to the current tenant's database, and reads to its replica where routed"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            # Flushes (and the derived-table writes in flush hooks) always go to the primary
+            if g.get('read_replica') and not self._flushing:
+                return replica_engine(database_path())
+            slug = current_tenant_slug()
+            if slug:
+                return tenant_engines.get(slug)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@app.before_request
+def select_tenant():
+    """Tenant from the hostname, else from the workshop chosen at login"""
+    tenants = load_tenants()
+    if tenants:
+        slug = tenant_for_host(request.host) or session.get('tenant')
+        g.tenant = slug if slug in tenants else None
+
+@app.cli.command('add-tenant')
+@click.argument('slug')
+@click.option('--name', required=True, help="Workshop name, printed on its quotes")
+@click.option('--host', 'hosts', multiple=True, help='Hostname that goes straight to this workshop (repeatable)')
+@click.option('--database', type=click.Path(exists=True, dir_okay=False), help='Start from a copy of this SQLite file')
+@click.password_option()
+def add_tenant_command(slug, name, hosts, database, password):
+    """Register a workshop in TENANTS_FILE and create its database"""
+    if not TENANT_SLUG_RE.match(slug):
+        raise click.BadParameter('use lowercase letters, digits, - and _', param_hint='SLUG')
+    path = app.config['TENANTS_FILE']
+    registry = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            registry = json.load(f)
+    if slug in registry:
+        raise click.ClickException(f'Tenant {slug} already exists')
+    if os.path.exists(tenant_database_path(slug)):
+        raise click.ClickException(f'{tenant_database_path(slug)} already exists')
+    if database:
+        os.makedirs(app.config['TENANT_DIR'], exist_ok=True)
+        # Online backup, not a file copy: committed pages can still be in the -wal file. The archive
+        # comes too, under the lock archive-jobs takes, so the pair matches.
+        with archive_lock(database):
+            copy_database(database, tenant_database_path(slug))
+            if os.path.exists(archive_path(database)):
+                copy_database(archive_path(database), archive_path(tenant_database_path(slug)))
+    
+    registry[slug] = {'name': name, 'hosts': [h.lower() for h in hosts],
+                      'password_hash': generate_password_hash(password)}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+    
+    with tenant_context(slug):
+        current_engine()  # Creates the schema and indexes
+        rebuild_customer_trigrams()
+        rebuild_customer_stats()
+    print(f"✓ Tenant {slug} added ({tenant_database_path(slug)})")
+
+db = SQLAlchemy(app, session_options={'class_': TenantSession})
+
+@event.listens_for(Engine, 'connect')
+def use_write_ahead_log(dbapi_connection, connection_record):
+    """WAL, so a reader left open (a streamed page or export on a slow connection) never blocks a save"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    try:
+        dbapi_connection.execute('PRAGMA journal_mode = WAL')
+    except sqlite3.OperationalError:
+        pass  # Read-only replica connections keep whatever mode the file has
 
 GST_RATE = 0.10  # 10% GST
+REVENUE_STATUSES = ['completed', 'deposit_paid', 'in_progress']
+EXPORT_BATCH_SIZE = 500  # Rows fetched per round trip when streaming exports
+STREAM_CHUNK_SIZE = 16 * 1024  # Characters of streamed page HTML gathered per write
 # Password hash for 'davidbudgewoijanet' - generated once, stored securely
 APP_PASSWORD_HASH = generate_password_hash('davidbudgewoijanet')
 MAX_LOGIN_ATTEMPTS = 3
 LOCKOUT_DURATION = timedelta(minutes=30)
 
+# ============== METRICS ==============
+
+# Minimal in-process Prometheus registry. Hot-path updates are a dict bump under one lock;
+# everything that needs a query (pool, lockouts) is computed at scrape time instead.
+METRICS_LOCK = threading.Lock()
+METRIC_COUNTERS = {}    # (name, labels) -> value
+METRIC_GAUGES = {}      # (name, labels) -> value
+METRIC_HISTOGRAMS = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+JOB_DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300)
+
+METRIC_INFO = {
+    'quoteforge_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status'),
+    'quoteforge_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint', LATENCY_BUCKETS),
+    'quoteforge_http_response_size_bytes': ('histogram', 'HTTP response body size by endpoint', SIZE_BUCKETS),
+    'quoteforge_db_statements_total': ('counter', 'SQL statements executed, by endpoint (background for scheduler jobs)'),
+    'quoteforge_db_statement_seconds_total': ('counter', 'Time spent executing SQL statements, by endpoint'),
+    'quoteforge_db_pool_connections': ('gauge', 'Connection pool state'),
+    'quoteforge_login_failures_total': ('counter', 'Failed login attempts'),
+    'quoteforge_login_lockouts_total': ('counter', 'Logins locked out after too many failures'),
+    'quoteforge_login_locked_ips': ('gauge', 'IP addresses currently locked out'),
+    'quoteforge_tenants_open': ('gauge', 'Workshop databases with an open engine'),
+    'quoteforge_replica_copy_seconds': ('gauge', 'Duration of the last read replica copy, by tenant'),
+    'quoteforge_login_lockout_duration_seconds': ('gauge', 'Length of a login lockout'),
+    'quoteforge_scheduler_job_runs_total': ('counter', 'Scheduler job runs by job and outcome'),
+    'quoteforge_scheduler_job_duration_seconds': ('histogram', 'Scheduler job run time', JOB_DURATION_BUCKETS),
+    'quoteforge_scheduler_job_last_success_timestamp_seconds': ('gauge', 'Unix time of the last successful run'),
+    'quoteforge_backup_size_bytes': ('gauge', 'Size of the most recent backup file'),
+    'quoteforge_login_attempts_cleaned_total': ('counter', 'Expired login attempt rows deleted by cleanup'),
+    'quoteforge_change_log_compacted_total': ('counter', 'Superseded change log entries removed by compaction'),
+    'quoteforge_tasks_total': ('counter', 'Background tasks finished, by kind and outcome'),
+    'quoteforge_maintenance_step_seconds': ('gauge', 'Duration of each step of the last database maintenance run'),
+    'quoteforge_maintenance_reclaimed_bytes_total': ('counter', 'Database file space returned by maintenance'),
+    'quoteforge_database_size_bytes': ('gauge', 'Database size after the last maintenance run'),
+    'quoteforge_database_locked_total': ('counter', 'Requests turned away because the database stayed locked'),
+}
+
+def metric_inc(name, labels=(), amount=1):
+    with METRICS_LOCK:
+        METRIC_COUNTERS[(name, labels)] = METRIC_COUNTERS.get((name, labels), 0) + amount
+
+def metric_set(name, value, labels=()):
+    with METRICS_LOCK:
+        METRIC_GAUGES[(name, labels)] = value
+
+def metric_observe(name, value, labels=()):
+    buckets = METRIC_INFO[name][2]
+    with METRICS_LOCK:
+        series = METRIC_HISTOGRAMS.get((name, labels))
+        if series is None:
+            series = METRIC_HISTOGRAMS[(name, labels)] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def render_metrics(gauges=None):
+    """Render every metric in the Prometheus text exposition format"""
+    with METRICS_LOCK:
+        counters = dict(METRIC_COUNTERS)
+        all_gauges = dict(METRIC_GAUGES)
+        histograms = {key: list(series) for key, series in METRIC_HISTOGRAMS.items()}
+    all_gauges.update(gauges or {})
+    
+    lines = []
+    for name, info in METRIC_INFO.items():
+        kind = info[0]
+        lines.append(f'# HELP {name} {info[1]}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), series in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(info[2], series):
+                    lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} {series[-1]}')
+                lines.append(f'{name}_sum{format_labels(labels)} {series[-2]}')
+                lines.append(f'{name}_count{format_labels(labels)} {series[-1]}')
+        else:
+            source = counters if kind == 'counter' else all_gauges
+            for (metric, labels), value in sorted(source.items()):
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+def monitored_job(job_name):
+    """Run a scheduler job once per tenant (inside its app context) and record its outcome and duration"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                failures = []
+                for slug in tenant_slugs():
+                    # One shop's failure must not stop the job for the others
+                    try:
+                        with tenant_context(slug):
+                            result = f(*args, **kwargs)
+                    except Exception as e:
+                        print(f"[WARN] {job_name} failed for tenant {slug or 'default'}: {e}")
+                        failures.append(e)
+                if failures:
+                    raise failures[0]
+            except Exception:
+                metric_inc('quoteforge_scheduler_job_runs_total', (('job', job_name), ('outcome', 'failure')))
+                raise
+            finally:
+                metric_observe('quoteforge_scheduler_job_duration_seconds', time.perf_counter() - started,
+                               (('job', job_name),))
+            metric_inc('quoteforge_scheduler_job_runs_total', (('job', job_name), ('outcome', 'success')))
+            metric_set('quoteforge_scheduler_job_last_success_timestamp_seconds', time.time(), (('job', job_name),))
+            return result
+        return wrapper
+    return decorator
+
 # ============== AUTH & SECURITY ==============
 
 def get_client_ip():
@@ -34,17 +428,23 @@ def get_client_ip():
         return request.headers.get('X-Forwarded-For').split(',')[0].strip()
     return request.remote_addr or '127.0.0.1'
 
+def as_utc(value):
+    """SQLite hands DateTime columns back naive; treat them as the UTC they were stored as"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 def is_ip_locked(ip_address):
     """Check if IP is locked due to too many failed attempts"""
     attempt = LoginAttempt.query.filter_by(ip_address=ip_address).first()
     if not attempt:
         return False
     
-    if attempt.locked_until and attempt.locked_until > datetime.now(timezone.utc):
+    if attempt.locked_until and as_utc(attempt.locked_until) > datetime.now(timezone.utc):
         return True
     
     # Clear lock if expired
-    if attempt.locked_until and attempt.locked_until <= datetime.now(timezone.utc):
+    if attempt.locked_until and as_utc(attempt.locked_until) <= datetime.now(timezone.utc):
         attempt.attempts = 0
         attempt.locked_until = None
         db.session.commit()
@@ -63,8 +463,10 @@ def record_failed_login(ip_address):
         attempt.last_attempt = datetime.now(timezone.utc)
     
     # Lock after MAX_LOGIN_ATTEMPTS failures
+    metric_inc('quoteforge_login_failures_total')
     if attempt.attempts >= MAX_LOGIN_ATTEMPTS:
         attempt.locked_until = datetime.now(timezone.utc) + LOCKOUT_DURATION
+        metric_inc('quoteforge_login_lockouts_total')
     
     db.session.commit()
     return attempt.attempts
@@ -91,36 +493,49 @@ def sanitize_input(text, max_length=None):
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not session.get('logged_in'):
+        # A session only opens the shop it logged in to
+        if not session.get('logged_in') or session.get('tenant') != g.get('tenant'):
             return redirect(url_for('login', next=request.url))
         return f(*args, **kwargs)
     return decorated_function
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
-    if session.get('logged_in'):
+    if session.get('logged_in') and session.get('tenant') == g.get('tenant'):
         return redirect(url_for('index'))
     
+    # On a hostname shared by several workshops the form also asks which one
+    choose_workshop = bool(load_tenants()) and not tenant_for_host(request.host)
+    if choose_workshop:
+        workshop = sanitize_input(request.form.get('workshop', ''), max_length=40).lower()
+        g.tenant = workshop if workshop in load_tenants() else None
+        if not g.tenant:
+            if request.method == 'POST':
+                flash('Unknown workshop.', 'error')
+            return render_template('login.html', choose_workshop=True)
+    
     ip_address = get_client_ip()
     
     # Check if IP is locked
     if is_ip_locked(ip_address):
         attempt = LoginAttempt.query.filter_by(ip_address=ip_address).first()
         if attempt and attempt.locked_until:
-            remaining = attempt.locked_until - datetime.now(timezone.utc)
+            remaining = as_utc(attempt.locked_until) - datetime.now(timezone.utc)
             minutes = int(remaining.total_seconds() / 60) + 1
             flash(f'Too many failed login attempts. Account locked for {minutes} more minutes.', 'error')
-            return render_template('login.html')
+            return render_template('login.html', choose_workshop=choose_workshop)
     
     if request.method == 'POST':
         # Sanitize input
         password = sanitize_input(request.form.get('password', ''), max_length=200)
         
         # Verify password using hash
-        if password and check_password_hash(APP_PASSWORD_HASH, password):
+        tenant = current_tenant()
+        if password and check_password_hash(tenant.password_hash if tenant else APP_PASSWORD_HASH, password):
             # Successful login - clear attempts
             clear_login_attempts(ip_address)
             session['logged_in'] = True
+            session['tenant'] = g.get('tenant')
             session.permanent = True
             app.permanent_session_lifetime = timedelta(days=30)
             # Regenerate session ID on login (prevent session fixation)
@@ -141,11 +556,12 @@ def login():
             else:
                 flash(f'Too many failed attempts. Account locked for {LOCKOUT_DURATION.seconds // 60} minutes.', 'error')
     
-    return render_template('login.html')
+    return render_template('login.html', choose_workshop=choose_workshop)
 
 @app.route('/logout')
 def logout():
     session.pop('logged_in', None)
+    session.pop('tenant', None)
     flash('You have been logged out.', 'success')
     return redirect(url_for('login'))
 
@@ -159,6 +575,8 @@ class Customer(db.Model):
     address = db.Column(db.Text)
     jobs = db.relationship('Job', backref='customer', lazy=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Written by SQL in refresh_customer_stats(), never through the ORM
+    stats = db.relationship('CustomerStats', uselist=False, viewonly=True, lazy=True)
 
 class Job(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -173,6 +591,8 @@ class Job(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     # Materials relationship
     materials = db.relationship('Material', backref='job', lazy=True, cascade='all, delete-orphan')
+    documents = db.relationship('Document', backref='job', lazy=True, cascade='all, delete-orphan',
+                                order_by='Document.created_at')
     
     @property
     def gst(self):
@@ -201,9 +621,28 @@ class Material(db.Model):
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
-    filename = db.Column(db.String(200))
+    filename = db.Column(db.String(200))  # SHA-256 of the content - the blob's name in uploads/objects
     original_name = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def path(self):
+        return document_blob_path(self.filename)
+    
+    @property
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+    
+    @property
+    def mimetype(self):
+        return mimetypes.guess_type(self.original_name or '')[0] or 'application/octet-stream'
+    
+    @property
+    def is_image(self):
+        return self.mimetype in THUMBNAIL_TYPES
 
 class Backup(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -220,15 +659,65 @@ class LoginAttempt(db.Model):
     last_attempt = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ReportSnapshot(db.Model):
+    """Cached reports() figures for a closed period (FY, quarter or month)"""
+    id = db.Column(db.Integer, primary_key=True)
+    period_key = db.Column(db.String(50), unique=True, nullable=False)  # e.g. FY2022, FY2022-Q3, FY2022-M2022-08
+    fy = db.Column(db.Integer, nullable=False, index=True)
+    date_start = db.Column(db.Date, nullable=False)
+    date_end = db.Column(db.Date, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON from compute_report_data()
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CustomerTrigram(db.Model):
+    """Trigram postings over customer names and addresses, for typo-tolerant search"""
+    __tablename__ = 'customer_trigram'
+    gram = db.Column(db.String(3), primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True, index=True)
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class CustomerStats(db.Model):
+    """Lifetime per-customer totals, kept current from Job and Material writes"""
+    __tablename__ = 'customer_stats'
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0, index=True)  # Ex GST, REVENUE_STATUSES jobs
+    cogs = db.Column(db.Float, nullable=False, default=0)  # Materials on those jobs
+    outstanding = db.Column(db.Float, nullable=False, default=0)  # Balance owing inc GST on deposit_paid/in_progress jobs
+    first_job_date = db.Column(db.Date)
+    last_job_date = db.Column(db.Date, index=True)
+    
+    @property
+    def gross_profit(self):
+        return self.revenue - self.cogs
+
+class ChangeLog(db.Model):
+    """Append-only record of Customer/Job/Material writes; the id is the /api/changes cursor"""
+    __tablename__ = 'change_log'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # Key of CHANGE_FEED
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # AUTOINCREMENT so compaction can never hand out a cursor a client has already seen
+    __table_args__ = (db.Index('idx_change_log_entity', 'entity', 'entity_id'), {'sqlite_autoincrement': True})
+
+class ChangeFeedGeneration(db.Model):
+    """Single row naming this history of the change log; a restore starts a new one, so older cursors reset"""
+    __tablename__ = 'change_feed_generation'
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.String(32), nullable=False)
+
 ##############################################
 # ============== DB INDEX / FTS HELPERS ==============
 ##############################################
 
 
-def setup_indexes_and_fts():
+def setup_indexes_and_fts(engine=None):
     """
     Create database indexes for faster search queries.
     Simple indexed LIKE queries are fast enough for our dataset size.
+    `python3 bench.py --plans` shows which of these each route's queries use.
     """
     from sqlalchemy import text
     
@@ -238,19 +727,26 @@ def setup_indexes_and_fts():
         "CREATE INDEX IF NOT EXISTS idx_customer_name ON customer(name COLLATE NOCASE)",
         "CREATE INDEX IF NOT EXISTS idx_customer_phone ON customer(phone)",
         "CREATE INDEX IF NOT EXISTS idx_customer_email ON customer(email COLLATE NOCASE)",
-        "CREATE INDEX IF NOT EXISTS idx_customer_address ON customer(address COLLATE NOCASE)",
         # Job indexes
         "CREATE INDEX IF NOT EXISTS idx_job_quote_number ON job(quote_number COLLATE NOCASE)",
-        "CREATE INDEX IF NOT EXISTS idx_job_description ON job(description COLLATE NOCASE)",
-        "CREATE INDEX IF NOT EXISTS idx_job_notes ON job(notes COLLATE NOCASE)",
         # Composite index for common filters
         "CREATE INDEX IF NOT EXISTS idx_job_customer_date ON job(customer_id, date)",
+        # Status + date range filters (reports, dashboards, /jobs?status=); price makes the revenue sums covering
+        "CREATE INDEX IF NOT EXISTS idx_job_status_date_price ON job(status, date, price)",
+        # Date ranges and newest-first ordering without a status filter
+        "CREATE INDEX IF NOT EXISTS idx_job_date ON job(date)",
+        # COGS joins and Job.materials loads
+        "CREATE INDEX IF NOT EXISTS idx_material_job ON material(job_id)",
     ]
+    # Searched with leading-wildcard LIKE, which can't use them - they only slowed down writes
+    dropped_indexes = ['idx_customer_address', 'idx_job_description', 'idx_job_notes']
 
-    with db.engine.begin() as conn:
+    with (engine or current_engine()).begin() as conn:
         # Create indexes
         for stmt in index_statements:
             conn.execute(text(stmt))
+        for name in dropped_indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
         print("✓ Database indexes created")
 
 
@@ -293,9 +789,13 @@ def get_quarter_dates(fy_year, quarter):
         return date(fy_year + 1, 4, 1), date(fy_year + 1, 6, 30)
 
 def get_available_fys():
-    """Get list of financial years with data"""
+    """Get list of financial years with data (archived years included)"""
     min_date = db.session.query(db.func.min(Job.date)).scalar()
     max_date = db.session.query(db.func.max(Job.date)).scalar()
+    summary = archive_summary()
+    if summary and summary['first_date']:
+        min_date = min(min_date or summary['first_date'], summary['first_date'])
+        max_date = max_date or summary['last_date']
     if not min_date or not max_date:
         return [get_financial_year(date.today())]
     
@@ -303,6 +803,995 @@ def get_available_fys():
     end_fy = get_financial_year(max_date)
     return list(range(end_fy, start_fy - 1, -1))
 
+##############################################
+# ============== JOB ARCHIVE ==============
+##############################################
+
+# Jobs (and their materials) from long-closed FYs can be moved into <database>.archive.db, which is
+# ATTACHed as `archive` on every connection. Day-to-day queries only see the hot tables; reports,
+# dated /jobs filters and lifetime figures read both through job_sources().
+ARCHIVE_SCHEMA = 'archive'
+ARCHIVE_BACKUP_SUFFIX = '.archive'
+archive_metadata = db.MetaData(schema=ARCHIVE_SCHEMA)
+_archive_summaries = {}  # archive path -> (mtime, summary)
+
+def archive_copy(table):
+    """The archive's version of a hot table: same columns, no constraints (archived rows are read-only)"""
+    return db.Table(table.name, archive_metadata,
+                    *[db.Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns])
+
+archive_job_table = archive_copy(Job.__table__)
+archive_material_table = archive_copy(Material.__table__)
+db.Index('idx_archive_job_date', archive_job_table.c.date)
+db.Index('idx_archive_job_customer', archive_job_table.c.customer_id)
+db.Index('idx_archive_material_job', archive_material_table.c.job_id)
+
+def archive_path(primary):
+    """Archive file for a database (a read replica attaches its primary's archive)"""
+    base = os.path.splitext(primary)[0]
+    if base.endswith('.replica'):
+        base = base[:-len('.replica')]
+    return base + '.archive.db'
+
+@event.listens_for(Engine, 'connect')
+@event.listens_for(Engine, 'checkout')
+def attach_archive(dbapi_connection, connection_record, *args):
+    """Keep the archive attached to match the file on disk - checked on every checkout, since archive-jobs
+    (a separate process) can create, remove or recreate it under pooled connections"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    info = connection_record.info
+    if 'main' not in info:
+        info['main'] = dbapi_connection.execute('PRAGMA database_list').fetchone()[2]
+    try:
+        inode = os.stat(archive_path(info['main'])).st_ino if info['main'] else None
+    except OSError:
+        inode = None
+    if info.get('archive_inode') == inode:
+        return
+    if info.pop('archive_inode', None) is not None:
+        dbapi_connection.execute(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+    if inode is not None:
+        dbapi_connection.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path(info['main']),))
+        info['archive_inode'] = inode
+
+@contextmanager
+def archive_lock(primary=None):
+    """Held while jobs move between a database (default: the current one) and its archive, or the pair is
+    copied as one (backup, restore). A file lock, since archive-jobs runs as its own process."""
+    with open(archive_path(primary or database_path()) + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def archive_exists():
+    return os.path.exists(archive_path(database_path()))
+
+def archive_summary():
+    """Status counts, revenue and date range of the archived jobs (cached until the archive changes), or None"""
+    path = archive_path(database_path())
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _archive_summaries.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    job = archive_job_table
+    first_date, last_date = db.session.execute(db.select(db.func.min(job.c.date), db.func.max(job.c.date))).one()
+    summary = {
+        'status_counts': dict(db.session.execute(
+            db.select(job.c.status, db.func.count()).group_by(job.c.status)).all()),
+        'revenue': db.session.execute(
+            db.select(db.func.sum(job.c.price)).where(job.c.status.in_(REVENUE_STATUSES))).scalar() or 0,
+        'first_date': first_date,
+        'last_date': last_date,
+    }
+    summary['job_count'] = sum(summary['status_counts'].values())
+    _archive_summaries[path] = (mtime, summary)
+    return summary
+
+def reaches_archive(start_date):
+    """True when a date range starting at start_date overlaps archived jobs"""
+    summary = archive_summary()
+    return bool(summary and summary['last_date'] and start_date <= summary['last_date'])
+
+def job_sources(include_archive):
+    """(job, material) to query: the hot models, or aliases over hot UNION ALL archive rows"""
+    if not include_archive or not archive_exists():
+        return Job, Material
+    jobs = db.union_all(db.select(*Job.__table__.c), db.select(*archive_job_table.c)).subquery('all_jobs')
+    materials = db.union_all(db.select(*Material.__table__.c),
+                             db.select(*archive_material_table.c)).subquery('all_materials')
+    return db.aliased(Job, jobs, adapt_on_names=True), db.aliased(Material, materials, adapt_on_names=True)
+
+def archive_union_sql():
+    """Hot + archive row sources for hand-written SQL"""
+    return {
+        'jobs': f'(SELECT * FROM job UNION ALL SELECT * FROM {ARCHIVE_SCHEMA}.job)',
+        'materials': f'(SELECT * FROM material UNION ALL SELECT * FROM {ARCHIVE_SCHEMA}.material)',
+    }
+
+def archived_job_or_404(job_id):
+    """An archived job, read-only, with its materials loaded from the archive"""
+    if not archive_exists():
+        abort(404)
+    job_entity, material_entity = job_sources(True)
+    job = db.session.query(job_entity).filter(job_entity.id == job_id).first_or_404()
+    materials = db.session.query(material_entity).filter(material_entity.job_id == job_id).all()
+    set_committed_value(job, 'materials', materials)
+    return job
+
+def archive_cutoff(years, today=None):
+    """Last day of the newest FY that closed more than `years` years ago"""
+    today = today or date.today()
+    cutoff = today.replace(year=today.year - years, day=min(today.day, 28))
+    return get_fy_dates(get_financial_year(cutoff) - 1)[1]
+
+def move_jobs(connection, jobs_from, materials_from, jobs_to, materials_to, condition):
+    """Move the jobs matching condition (a clause on jobs_from) and their materials; returns the job count"""
+    moving = db.select(jobs_from.c.id).where(condition)
+    connection.execute(materials_to.insert().from_select(
+        list(materials_from.c.keys()), db.select(*materials_from.c).where(materials_from.c.job_id.in_(moving))))
+    moved = connection.execute(jobs_to.insert().from_select(
+        list(jobs_from.c.keys()), db.select(*jobs_from.c).where(condition))).rowcount
+    connection.execute(materials_from.delete().where(materials_from.c.job_id.in_(moving)))
+    connection.execute(jobs_from.delete().where(condition))
+    return moved
+
+def archive_jobs(years):
+    """Move jobs from FYs closed more than `years` years ago into the archive; returns how many moved"""
+    path = archive_path(database_path())
+    with archive_lock():
+        if not os.path.exists(path):
+            sqlite3.connect(path).close()
+            # Pooled connections were opened before the archive existed, so they don't have it attached
+            db.session.remove()
+            current_engine().dispose()
+        connection = db.session.connection()
+        archive_metadata.create_all(connection)
+        
+        jobs, boundary = Job.__table__, archive_cutoff(years)
+        # The newest job always stays hot: new job ids and quote numbers carry on from it
+        newest = connection.execute(db.select(db.func.max(jobs.c.id))).scalar()
+        moved = move_jobs(connection, jobs, Material.__table__, archive_job_table, archive_material_table,
+                          db.and_(jobs.c.date <= boundary, jobs.c.id != newest))
+        db.session.commit()
+    return moved, boundary
+
+def unarchive_jobs():
+    """Move every archived job back into the hot tables and remove the archive"""
+    with archive_lock():
+        if not archive_exists():
+            return 0
+        connection = db.session.connection()
+        moved = move_jobs(connection, archive_job_table, archive_material_table, Job.__table__, Material.__table__,
+                          db.true())
+        db.session.commit()
+        db.session.remove()
+        current_engine().dispose()
+        os.remove(archive_path(database_path()))
+    return moved
+
+@app.cli.command('archive-jobs')
+@click.option('--years', type=int, default=7, help='Archive FYs closed more than this many years ago')
+@click.option('--restore', is_flag=True, help='Move every archived job back into the live tables')
+@click.option('--tenant', default=None, help='Only this workshop (multi-workshop mode)')
+def archive_jobs_command(years, restore, tenant):
+    """Move jobs from long-closed financial years into the archive database (or back)"""
+    if tenant and tenant not in load_tenants():
+        raise click.BadParameter(f'unknown tenant {tenant}', param_hint='--tenant')
+    for slug in [tenant] if tenant else tenant_slugs():
+        with tenant_context(slug):
+            label = f' ({slug})' if slug else ''
+            if restore:
+                print(f"✓ {unarchive_jobs()} jobs restored from the archive{label}")
+            else:
+                moved, boundary = archive_jobs(years)
+                print(f"✓ {moved} jobs up to {boundary:%d/%m/%Y} archived{label}")
+
+##############################################
+# ============== REPORT SNAPSHOTS ==============
+##############################################
+
+def is_closed_period(fy, date_end):
+    """A period is closed once it (and the FY it reports quarters for) ended before the current FY"""
+    current_fy = get_financial_year(date.today())
+    return fy < current_fy and date_end < get_fy_dates(current_fy)[0]
+
+def report_period_key(fy, date_start, date_end):
+    """Snapshot key for a report period: FY2022, FY2022-Q3 or FY2022-M2022-08"""
+    if (date_start, date_end) == get_fy_dates(fy):
+        return f'FY{fy}'
+    for q in range(1, 5):
+        if (date_start, date_end) == get_quarter_dates(fy, q):
+            return f'FY{fy}-Q{q}'
+    return f"FY{fy}-M{date_start.strftime('%Y-%m')}"
+
+def store_report_snapshot(fy, date_start, date_end):
+    """Compute a closed period's report figures and save them as a snapshot"""
+    data = compute_report_data(fy, date_start, date_end)
+    db.session.add(ReportSnapshot(
+        period_key=report_period_key(fy, date_start, date_end),
+        fy=fy,
+        date_start=date_start,
+        date_end=date_end,
+        payload=json.dumps(data)
+    ))
+    try:
+        db.session.commit()
+    except Exception:
+        # Another request stored the same period first
+        db.session.rollback()
+    return data
+
+@event.listens_for(db.session, 'after_flush')
+def invalidate_report_snapshots(session, flush_context):
+    """Drop snapshots for any period containing a job (or job's materials) written in this flush"""
+    touched_dates = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Job):
+            touched_dates.add(obj.date)
+            # A job moved between periods invalidates its old period too
+            touched_dates.update(db.inspect(obj).attrs.date.history.deleted or ())
+        elif isinstance(obj, Material):
+            job = obj.job or (session.get(Job, obj.job_id) if obj.job_id else None)
+            if job is not None:
+                touched_dates.add(job.date)
+    invalidate_snapshots_for_dates(session.connection(), touched_dates)
+
+def invalidate_snapshots_for_dates(connection, touched_dates):
+    """Delete snapshots covering any of the given job dates (also used after bulk updates, which skip flush events)"""
+    touched_dates = set(touched_dates)
+    touched_dates.discard(None)
+    if not touched_dates:
+        return
+    
+    # Snapshots carry their FY's quarterly figures, so the whole FY goes too
+    table = ReportSnapshot.__table__
+    touched_fys = {get_financial_year(d) for d in touched_dates}
+    conditions = [table.c.fy.in_(touched_fys)]
+    conditions += [db.and_(table.c.date_start <= d, table.c.date_end >= d) for d in touched_dates]
+    connection.execute(table.delete().where(db.or_(*conditions)))
+
+@monitored_job('report_snapshots')
+def rebuild_report_snapshots():
+    """Scheduler job: rebuild missing FY and quarter snapshots for closed financial years"""
+    existing = {key for (key,) in db.session.query(ReportSnapshot.period_key)}
+    rebuilt = 0
+    for fy in get_available_fys():
+        periods = [get_fy_dates(fy)] + [get_quarter_dates(fy, q) for q in range(1, 5)]
+        for date_start, date_end in periods:
+            if not is_closed_period(fy, date_end):
+                continue
+            if report_period_key(fy, date_start, date_end) not in existing:
+                store_report_snapshot(fy, date_start, date_end)
+                rebuilt += 1
+    if rebuilt:
+        print(f"[{datetime.now()}] Rebuilt {rebuilt} report snapshot(s)")
+
+##############################################
+# ============== CUSTOMER STATS ==============
+##############################################
+
+BALANCE_STATUSES = ['deposit_paid', 'in_progress']  # Jobs whose balance is still to be paid
+
+CUSTOMER_STATS_SQL = """
+    INSERT OR REPLACE INTO customer_stats
+        (customer_id, job_count, revenue, cogs, outstanding, first_job_date, last_job_date)
+    SELECT c.id,
+           COUNT(j.id),
+           COALESCE(SUM(CASE WHEN j.status IN :revenue_statuses THEN j.price END), 0),
+           COALESCE(SUM(CASE WHEN j.status IN :revenue_statuses THEN
+               (SELECT SUM(m.cost) FROM {materials} m WHERE m.job_id = j.id) END), 0),
+           COALESCE(SUM(CASE WHEN j.status IN :balance_statuses THEN
+               MAX(COALESCE(j.price, 0) * (1 + :gst_rate) - COALESCE(j.deposit, 0), 0) END), 0),
+           MIN(j.date),
+           MAX(j.date)
+    FROM customer c LEFT JOIN {jobs} j ON j.customer_id = c.id
+    {where}
+    GROUP BY c.id
+"""
+
+def refresh_customer_stats(connection, customer_ids=None):
+    """Recompute CustomerStats rows from jobs - for the given customers, or everyone"""
+    params = {'revenue_statuses': REVENUE_STATUSES, 'balance_statuses': BALANCE_STATUSES, 'gst_rate': GST_RATE}
+    expanding = [db.bindparam('revenue_statuses', expanding=True), db.bindparam('balance_statuses', expanding=True)]
+    # Lifetime figures count archived jobs too
+    tables = archive_union_sql() if archive_exists() else {'jobs': 'job', 'materials': 'material'}
+    if customer_ids is None:
+        connection.execute(text(CUSTOMER_STATS_SQL.format(where='', **tables)).bindparams(*expanding), params)
+        return
+    
+    customer_ids = sorted(set(customer_ids))
+    statement = text(CUSTOMER_STATS_SQL.format(where='WHERE c.id IN :ids', **tables)).bindparams(
+        *expanding, db.bindparam('ids', expanding=True))
+    for i in range(0, len(customer_ids), 500):
+        connection.execute(statement, dict(params, ids=customer_ids[i:i + 500]))
+    # Customers that no longer exist
+    table = CustomerStats.__table__
+    connection.execute(table.delete().where(
+        table.c.customer_id.in_(customer_ids),
+        ~table.c.customer_id.in_(db.select(Customer.id).where(Customer.id.in_(customer_ids)))
+    ))
+
+def rebuild_customer_stats():
+    """Rebuild every customer's stats if any customer is missing a row (e.g. after an import)"""
+    missing = db.session.execute(text(
+        "SELECT 1 FROM customer WHERE NOT EXISTS "
+        "(SELECT 1 FROM customer_stats s WHERE s.customer_id = customer.id) LIMIT 1"
+    )).first()
+    if not missing:
+        return
+    connection = db.session.connection()
+    connection.execute(CustomerStats.__table__.delete())
+    refresh_customer_stats(connection)
+    db.session.commit()
+    print(f"✓ Customer stats built ({Customer.query.count()} customers)")
+
+@event.listens_for(db.session, 'after_flush')
+def update_customer_stats(session, flush_context):
+    """Recompute stats for every customer whose jobs (or their materials) were written in this flush"""
+    customer_ids = {obj.id for obj in list(session.new) + list(session.deleted) if isinstance(obj, Customer)}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Job):
+            customer_ids.add(obj.customer_id)
+            # A job moved to another customer changes the old customer too
+            customer_ids.update(db.inspect(obj).attrs.customer_id.history.deleted or ())
+        elif isinstance(obj, Material):
+            job = obj.job or (session.get(Job, obj.job_id) if obj.job_id else None)
+            if job is not None:
+                customer_ids.add(job.customer_id)
+    customer_ids.discard(None)
+    if customer_ids:
+        refresh_customer_stats(session.connection(), customer_ids)
+
+def top_customers_lifetime(limit=10):
+    """[(Customer, CustomerStats)] with the highest lifetime revenue, straight off the revenue index"""
+    return (db.session.query(Customer, CustomerStats)
+            .join(CustomerStats, CustomerStats.customer_id == Customer.id)
+            .filter(CustomerStats.revenue > 0)
+            .order_by(CustomerStats.revenue.desc())
+            .limit(limit)
+            .all())
+
+##############################################
+# ============== CHANGE FEED ==============
+##############################################
+
+# Synced entities: name -> (model, columns sent besides id)
+CHANGE_FEED = {
+    'customer': (Customer, ('name', 'phone', 'email', 'address', 'created_at')),
+    'job': (Job, ('customer_id', 'quote_number', 'description', 'price', 'deposit', 'status', 'notes', 'date', 'created_at')),
+    'material': (Material, ('job_id', 'category', 'description', 'cost', 'created_at')),
+}
+CHANGE_FEED_BATCH = 1000  # Log entries per /api/changes response
+
+def record_changes(connection, entity, ids, deleted=False):
+    """Append change log entries (also used after bulk writes, which skip flush events)"""
+    ids = sorted(set(ids) - {None})
+    if ids:
+        connection.execute(ChangeLog.__table__.insert(),
+                           [{'entity': entity, 'entity_id': entity_id, 'deleted': deleted} for entity_id in ids])
+
+@event.listens_for(db.session, 'after_flush')
+def log_feed_changes(session, flush_context):
+    """Log every synced record written in this flush, inside the same transaction"""
+    entities = {model: name for name, (model, fields) in CHANGE_FEED.items()}
+    changed, deleted = defaultdict(set), defaultdict(set)
+    for obj in session.new:
+        if type(obj) in entities:
+            changed[entities[type(obj)]].add(obj.id)
+    for obj in session.dirty:
+        # Skip objects that are only dirty because a relationship collection changed
+        if type(obj) in entities and session.is_modified(obj, include_collections=False):
+            changed[entities[type(obj)]].add(obj.id)
+    for obj in session.deleted:
+        if type(obj) in entities:
+            deleted[entities[type(obj)]].add(obj.id)
+    connection = session.connection() if changed or deleted else None
+    for entity, ids in changed.items():
+        record_changes(connection, entity, ids)
+    for entity, ids in deleted.items():
+        record_changes(connection, entity, ids, deleted=True)
+
+def backfill_change_log():
+    """Log any record the change log has never seen (existing data, imports), so cursor 0 is a full sync"""
+    added = 0
+    for entity, (model, fields) in CHANGE_FEED.items():
+        result = db.session.execute(text(
+            f"INSERT INTO change_log (entity, entity_id, deleted, changed_at) "
+            f"SELECT :entity, t.id, 0, :now FROM {model.__tablename__} t WHERE NOT EXISTS "
+            f"(SELECT 1 FROM change_log c WHERE c.entity = :entity AND c.entity_id = t.id)"
+        ), {'entity': entity, 'now': datetime.utcnow()})
+        added += result.rowcount
+    db.session.commit()
+    if added:
+        print(f"✓ Change log backfilled ({added} records)")
+
+@monitored_job('change_log_compaction')
+def compact_change_log():
+    """Scheduler job: keep only the latest entry per record, so a sync costs one entry per changed record"""
+    result = db.session.execute(text(
+        "DELETE FROM change_log WHERE id NOT IN (SELECT MAX(id) FROM change_log GROUP BY entity, entity_id)"
+    ))
+    db.session.commit()
+    metric_inc('quoteforge_change_log_compacted_total', amount=result.rowcount)
+
+def change_feed_generation():
+    """This database's change log generation (created on first use, so a sync poll is normally a plain read)"""
+    row = db.session.get(ChangeFeedGeneration, 1)
+    if row is None:
+        db.session.execute(sqlite_insert(ChangeFeedGeneration.__table__)
+                           .values(id=1, generation=uuid.uuid4().hex).on_conflict_do_nothing())
+        db.session.commit()
+        row = db.session.get(ChangeFeedGeneration, 1)
+    return row.generation
+
+def start_change_feed_generation():
+    """After a restore: the log now tells a different history from the one clients' cursors point into"""
+    db.session.merge(ChangeFeedGeneration(id=1, generation=uuid.uuid4().hex))
+    db.session.commit()
+
+def feed_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def changes_since(cursor, limit=CHANGE_FEED_BATCH):
+    """The next batch of changes after `cursor`, each record collapsed to its current state.
+    
+    Returns (new cursor, more, {entity: {'columns', 'rows', 'deleted'}}).
+    """
+    entries = (db.session.query(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.deleted)
+               .filter(ChangeLog.id > cursor)
+               .order_by(ChangeLog.id)
+               .limit(limit + 1)
+               .all())
+    more = len(entries) > limit
+    entries = entries[:limit]
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.deleted
+    
+    changes = {}
+    archived = dict(zip((Job, Material), job_sources(True)))
+    for entity, (model, fields) in CHANGE_FEED.items():
+        model = archived.get(model, model)
+        upserted = sorted(entity_id for (name, entity_id), deleted in latest.items() if name == entity and not deleted)
+        removed = sorted(entity_id for (name, entity_id), deleted in latest.items() if name == entity and deleted)
+        columns = [model.id] + [getattr(model, field) for field in fields]
+        rows = []
+        for i in range(0, len(upserted), 500):
+            # A record deleted since its entry is simply missing here; its delete entry comes in a later batch
+            rows += db.session.query(*columns).filter(model.id.in_(upserted[i:i + 500])).order_by(model.id).all()
+        if rows or removed:
+            changes[entity] = {
+                'columns': ['id', *fields],
+                'rows': [[feed_value(value) for value in row] for row in rows],
+                'deleted': removed,
+            }
+    return (entries[-1].id if entries else cursor), more, changes
+
+##############################################
+# ============== JOB ANALYTICS ==============
+##############################################
+
+class JobAnalyticsCache:
+    """Job columns for analytics.py, reloaded only when committed job data has changed.
+    
+    The data version is bumped after any commit that wrote Jobs or Materials (and on restore).
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.loaded_version = -1
+        self.cols = None
+    
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+    
+    def load(self):
+        # Trends cover the whole history, archive included
+        job, material = job_sources(True)
+        cogs = db.session.query(
+            material.job_id.label('job_id'),
+            db.func.sum(material.cost).label('cogs')
+        ).group_by(material.job_id).subquery()
+        # Cached until the next commit, so it must not be loaded from a lagging replica
+        with primary_reads():
+            rows = db.session.query(job.date, job.price, job.status, db.func.coalesce(cogs.c.cogs, 0)) \
+                .outerjoin(cogs, cogs.c.job_id == job.id).all()
+        return analytics.JobColumns.from_rows(rows, STATUS_LABELS.keys(), REVENUE_STATUSES)
+    
+    def columns(self):
+        with self.lock:
+            version = self.version
+            if self.loaded_version == version:
+                return self.cols
+        cols = self.load()
+        with self.lock:
+            # Only keep it if nothing was committed while loading
+            if self.version == version:
+                self.cols, self.loaded_version = cols, version
+        return cols
+
+job_analytics = tenant_cache(JobAnalyticsCache)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_job_analytics_changes(session, flush_context):
+    if any(isinstance(obj, (Job, Material)) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['job_analytics_changed'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def apply_job_analytics_changes(session):
+    if session.info.pop('job_analytics_changed', False):
+        job_analytics.invalidate()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_job_analytics_changes(session):
+    session.info.pop('job_analytics_changed', None)
+
+def compute_trend_analytics(selected_fy, date_start, date_end):
+    """Rolling revenue, seasonality, average job value and margins for the reports page"""
+    cols = job_analytics.columns()
+    in_period = cols.period(date_start, date_end)
+    current_fy = get_financial_year(date.today())
+    return {
+        'rolling': analytics.rolling_revenue(cols, min(date_end, date.today())),
+        'seasonality': analytics.seasonality(cols, current_fy - 1),
+        'job_values': [(STATUS_LABELS.get(status, status), count, avg)
+                       for status, count, avg in analytics.average_job_value(cols, in_period)],
+        'margins': analytics.margin_distribution(cols, in_period),
+    }
+
+##############################################
+# ============== CUSTOMER AUTOCOMPLETE INDEX ==============
+##############################################
+
+PHONE_QUERY_RE = re.compile(r'[\d\s\-+()]+')
+AUTOCOMPLETE_STALE_CHECK = 10  # Seconds between checks for customers added or removed by the import scripts
+NAME_TOKEN_RE = re.compile(r"[\w']+")
+
+def autocomplete_keys(name, phone, email):
+    """Index keys for a customer: name tokens, phone digits (and each digit group onwards) and email"""
+    keys = set()
+    for token in NAME_TOKEN_RE.findall((name or '').lower()):
+        keys.add(token.replace("'", ''))
+    if phone:
+        keys.add(phone_digits(phone))
+        # "314081" should still find "0412 314081"
+        groups = re.split(r'[\s\-()]+', phone.strip())
+        for i in range(1, len(groups)):
+            keys.add(re.sub(r'\D', '', ''.join(groups[i:])))
+    if email:
+        keys.add(email.lower())
+    keys.discard('')
+    return keys
+
+def autocomplete_query_tokens(q):
+    """Split a search box value into prefix tokens (phone-looking input becomes one digit string)"""
+    if PHONE_QUERY_RE.fullmatch(q) and any(ch.isdigit() for ch in q):
+        return [phone_digits(q)]
+    if '@' in q:
+        return [q.lower()]
+    return [token.replace("'", '') for token in NAME_TOKEN_RE.findall(q.lower())]
+
+class CustomerAutocompleteIndex:
+    """In-process sorted prefix index answering /api/customers/search without touching the database.
+    
+    Built lazily (or at startup), and kept current from committed Customer changes. Writes from
+    other processes (add_recent.py, import_xlsx.py) are caught by a periodic count/max(id) check.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()  # One build at a time, so an older read never replaces a newer one
+        self.built = False
+        self.pending = None  # Changes committed while a build reads the table, replayed onto its result
+        self.checked_at = 0.0
+        self.keys = []       # sorted (key, customer_id)
+        self.customers = {}  # customer_id -> (sort_name, name, phone, email, address)
+    
+    def build(self):
+        with self.build_lock:
+            with self.lock:
+                self.pending = {}
+            self.checked_at = time.monotonic()
+            rows = db.session.query(Customer.id, Customer.name, Customer.phone, Customer.email, Customer.address).all()
+            keys, customers = [], {}
+            for customer_id, name, phone, email, address in rows:
+                customers[customer_id] = ((name or '').lower(), name, phone, email, address)
+                keys.extend((key, customer_id) for key in autocomplete_keys(name, phone, email))
+            keys.sort()
+            with self.lock:
+                self.keys, self.customers, self.built = keys, customers, True
+                pending, self.pending = self.pending, None
+                self._apply(pending)
+    
+    def is_stale(self):
+        """Customers added or removed outside this process since the index was built (checked now and then)"""
+        if time.monotonic() - self.checked_at < AUTOCOMPLETE_STALE_CHECK:
+            return False
+        self.checked_at = time.monotonic()
+        count, last_id = db.session.query(func.count(Customer.id), func.max(Customer.id)).one()
+        with self.lock:
+            return (count, last_id or 0) != (len(self.customers), max(self.customers, default=0))
+    
+    def invalidate(self):
+        """Force a rebuild on next use (e.g. after a database restore)"""
+        with self.lock:
+            self.built = False
+    
+    def _remove(self, customer_id):
+        record = self.customers.pop(customer_id, None)
+        if record:
+            for key in autocomplete_keys(record[1], record[2], record[3]):
+                i = bisect.bisect_left(self.keys, (key, customer_id))
+                if i < len(self.keys) and self.keys[i] == (key, customer_id):
+                    del self.keys[i]
+    
+    def apply(self, changes):
+        """Apply committed changes: {customer_id: (name, phone, email, address) or None if deleted}"""
+        with self.lock:
+            if self.pending is not None:
+                self.pending.update(changes)
+            if self.built:
+                self._apply(changes)
+    
+    def _apply(self, changes):
+        for customer_id, record in changes.items():
+            self._remove(customer_id)
+            if record is not None:
+                name, phone, email, address = record
+                self.customers[customer_id] = ((name or '').lower(), name, phone, email, address)
+                for key in autocomplete_keys(name, phone, email):
+                    bisect.insort(self.keys, (key, customer_id))
+    
+    def _scan(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self.keys, (prefix,))
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            ids.add(self.keys[i][1])
+            i += 1
+        return ids
+    
+    def search(self, q, limit=15):
+        """Customers whose keys start with every query token, in name order"""
+        tokens = sorted(set(autocomplete_query_tokens(q)), key=len, reverse=True)
+        if not tokens:
+            return []
+        if not self.built or self.is_stale():
+            self.build()
+        with self.lock:
+            # Longest token first - it has the fewest matches
+            candidates = self._scan(tokens[0])
+            for token in tokens[1:]:
+                if not candidates:
+                    break
+                candidates &= self._scan(token)
+            best = heapq.nsmallest(limit, candidates, key=lambda cid: (self.customers[cid][0], cid))
+            return [(cid,) + self.customers[cid][1:] for cid in best]
+
+customer_index = tenant_cache(CustomerAutocompleteIndex)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_customer_index_changes(session, flush_context):
+    """Remember flushed Customer writes; they reach the index only if the transaction commits"""
+    changes = session.info.setdefault('customer_index_changes', {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Customer):
+            changes[obj.id] = (obj.name, obj.phone, obj.email, obj.address)
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            changes[obj.id] = None
+
+@event.listens_for(db.session, 'after_commit')
+def apply_customer_index_changes(session):
+    changes = session.info.pop('customer_index_changes', None)
+    if changes:
+        customer_index.apply(changes)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_customer_index_changes(session):
+    session.info.pop('customer_index_changes', None)
+
+##############################################
+# ============== FUZZY CUSTOMER SEARCH ==============
+##############################################
+
+FUZZY_CANDIDATES = 100  # Customers pulled from the trigram table by shared-trigram count
+FUZZY_RESCORE = 40      # Best of those by trigram similarity, re-ranked with edit distance
+FUZZY_MIN_SCORE = 0.3
+
+def fuzzy_words(text):
+    """Lowercased alphanumeric words ("O'Brien" -> "obrien")"""
+    return [w.replace("'", '') for w in NAME_TOKEN_RE.findall((text or '').lower()) if w.replace("'", '')]
+
+def trigrams(text):
+    """Padded word trigrams, as in pg_trgm: "mcdonald" -> "  m", " mc", "mcd", ..., "ld " """
+    grams = set()
+    for word in fuzzy_words(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def edit_distance(a, b):
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)"""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = ca != cb
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        prev2, prev = prev, row
+    return prev[-1]
+
+def trigram_similarity(query_grams, text):
+    grams = trigrams(text)
+    if not query_grams or not grams:
+        return 0
+    return len(query_grams & grams) / len(query_grams | grams)
+
+def fuzzy_score(query, name, address):
+    """Rank a candidate: trigram similarity blended with per-word edit distance, names weighted over addresses"""
+    query_grams = trigrams(query)
+    query_words = fuzzy_words(query)
+    if not query_words:
+        return 0
+    
+    def similarity(text):
+        words = fuzzy_words(text)
+        if not words:
+            return 0
+        # Each query word against its closest word in the field
+        word_sims = []
+        for q_word in query_words:
+            best = min(edit_distance(q_word, w) / max(len(q_word), len(w)) for w in words)
+            word_sims.append(1 - best)
+        return 0.4 * trigram_similarity(query_grams, text) + 0.6 * (sum(word_sims) / len(word_sims))
+    
+    return max(similarity(name), 0.8 * similarity(address))
+
+def index_customer_trigrams(connection, customers):
+    """Replace the trigram postings for (id, name, address) rows"""
+    table = CustomerTrigram.__table__
+    ids = [customer_id for customer_id, _, _ in customers]
+    for i in range(0, len(ids), 500):
+        connection.execute(table.delete().where(table.c.customer_id.in_(ids[i:i + 500])))
+    postings = [{'gram': gram, 'customer_id': customer_id}
+                for customer_id, name, address in customers
+                for gram in trigrams(f'{name} {address or ""}')]
+    if postings:
+        connection.execute(table.insert(), postings)
+
+def rebuild_customer_trigrams():
+    """Rebuild the trigram table from scratch if any customer is missing from it"""
+    missing = db.session.execute(text(
+        "SELECT 1 FROM customer WHERE name != '' AND NOT EXISTS "
+        "(SELECT 1 FROM customer_trigram t WHERE t.customer_id = customer.id) LIMIT 1"
+    )).first()
+    if not missing:
+        return
+    customers = db.session.query(Customer.id, Customer.name, Customer.address).all()
+    connection = db.session.connection()
+    connection.execute(CustomerTrigram.__table__.delete())
+    index_customer_trigrams(connection, customers)
+    db.session.commit()
+    print(f"✓ Customer trigram index built ({len(customers)} customers)")
+
+@event.listens_for(db.session, 'after_flush')
+def update_customer_trigrams(session, flush_context):
+    """Keep trigram postings in step with Customer writes, inside the same transaction"""
+    changed, deleted = [], []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Customer):
+            state = db.inspect(obj)
+            if obj in session.new or state.attrs.name.history.has_changes() or state.attrs.address.history.has_changes():
+                changed.append((obj.id, obj.name, obj.address))
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            deleted.append((obj.id, '', None))
+    if changed or deleted:
+        index_customer_trigrams(session.connection(), changed + deleted)
+
+def fuzzy_customer_search(q, limit=15):
+    """Typo-tolerant customer search ranked by trigram similarity and edit distance.
+    
+    Returns [(CustomerRow, score)], best first.
+    """
+    grams = trigrams(q)
+    if not grams:
+        return []
+    table = CustomerTrigram.__table__
+    hits = db.func.count().label('hits')
+    candidate_ids = [customer_id for customer_id, _ in db.session.query(table.c.customer_id, hits)
+                     .filter(table.c.gram.in_(grams))
+                     .group_by(table.c.customer_id)
+                     .order_by(hits.desc())
+                     .limit(FUZZY_CANDIDATES)]
+    if not candidate_ids:
+        return []
+    
+    # Cheap trigram pass over plain columns, then edit distance only for the front runners
+    rows = db.session.query(Customer.id, Customer.name, Customer.address).filter(Customer.id.in_(candidate_ids)).all()
+    rows.sort(key=lambda row: -max(trigram_similarity(grams, row.name), trigram_similarity(grams, row.address)))
+    
+    scores = {}
+    for customer_id, name, address in rows[:FUZZY_RESCORE]:
+        score = fuzzy_score(q, name, address)
+        if score >= FUZZY_MIN_SCORE:
+            scores[customer_id] = score
+    if not scores:
+        return []
+    
+    customers = customer_rows(customer_row_query().filter(Customer.id.in_(scores)))
+    scored = [(customer, scores[customer.id]) for customer in customers]
+    scored.sort(key=lambda item: (-item[1], (item[0].name or '').lower()))
+    return scored[:limit]
+
+##############################################
+# ============== DUPLICATE CUSTOMERS ==============
+##############################################
+
+DEDUPE_MIN_SCORE = 0.65
+DEDUPE_NAME_ONLY = 0.6  # Most a pair can score on name similarity alone
+DEDUPE_MAX_BLOCK = 60  # Keys shared by more customers than this ("john") don't discriminate; skip them
+PLACEHOLDER_NAME_RE = re.compile(r'unknown(\s+\d{4})?', re.IGNORECASE)  # "Unknown 2014" from the spreadsheet imports
+ADDRESS_KEY_RE = re.compile(r'(\d+)\W+([a-z]{4})')
+SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for c in letters}
+
+def soundex(word):
+    """American Soundex ("Jarvis" -> "J612"), so "Jonhson"/"Johnson" and "julie"/"july" share a key"""
+    word = ''.join(c for c in word.lower() if c in SOUNDEX_CODES)
+    if not word:
+        return ''
+    code, last = word[0].upper(), SOUNDEX_CODES[word[0]]
+    for c in word[1:]:
+        digit = SOUNDEX_CODES[c]
+        if digit != '0' and digit != last:
+            code += digit
+        if c not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+def phone_key(phone):
+    """Last 8 digits - "0448 206200", "448206200" and "+61 448 206 200" all agree; so do "43 932281" and "4393 2281" """
+    digits = phone_digits(phone)
+    return digits[-8:] if len(digits) >= 8 else None
+
+def address_key(address):
+    """House number plus the first four letters of the street: "10 Japonica, Lakehaven" -> "10 japo" """
+    match = ADDRESS_KEY_RE.search((address or '').lower())
+    return f'{match.group(1)} {match.group(2)}' if match else None
+
+def is_placeholder_name(name):
+    return not name or bool(PLACEHOLDER_NAME_RE.fullmatch(name.strip()))
+
+def blocking_keys(name, phone, email, address):
+    """Keys a customer is filed under; only customers sharing a key are ever compared"""
+    keys = set()
+    if phone_key(phone):
+        keys.add('p:' + phone_key(phone))
+    if address_key(address):
+        keys.add('a:' + address_key(address))
+    if email:
+        keys.add('e:' + email.strip().lower())
+    if not is_placeholder_name(name):
+        codes = sorted({soundex(w) for w in fuzzy_words(name)} - {''})
+        if codes:
+            # Whole name in any word order ("Jarvis, Neil" / "neil jarvis"), plus each longer word alone
+            # so "pearsall john" can meet "Pearsall, J"
+            keys.add('n:' + ' '.join(codes))
+            keys.update('w:' + soundex(w) for w in fuzzy_words(name) if len(w) >= 4)
+    return keys
+
+DedupeRecord = namedtuple('DedupeRecord', 'id name phone email address phone_key email_key address_grams')
+
+def dedupe_record(customer_id, name, phone, email, address):
+    """A customer row plus the comparison keys, computed once per customer rather than once per pair"""
+    return DedupeRecord(customer_id, name, phone, email, address,
+                        phone_key(phone), (email or '').strip().lower() or None,
+                        # Only street addresses are compared - not "cancelled" or "star of the sea"
+                        trigrams(address) if address_key(address) else set())
+
+def field_similarity(a, b):
+    """Symmetric fuzzy_score(): the shorter value matched against the longer"""
+    if len(fuzzy_words(a)) > len(fuzzy_words(b)):
+        a, b = b, a
+    return fuzzy_score(a, b, None)
+
+def address_similarity(a, b):
+    if not a.address_grams or not b.address_grams:
+        return None
+    return len(a.address_grams & b.address_grams) / len(a.address_grams | b.address_grams)
+
+def contact_match(a, b):
+    """Same phone, same email or a near-identical address"""
+    return ((a.phone_key is not None and a.phone_key == b.phone_key)
+            or (a.email_key is not None and a.email_key == b.email_key)
+            or (address_similarity(a, b) or 0) >= 0.5)
+
+def duplicate_score(a, b):
+    """Score two DedupeRecords as the same customer, 0-1.
+    
+    Weighted average over the fields both have, with differing phones and emails counting
+    against. Without a contact_match() the name alone caps the score at DEDUPE_NAME_ONLY,
+    so the many unrelated "Peter"s never qualify.
+    """
+    names = not is_placeholder_name(a.name) and not is_placeholder_name(b.name)
+    if not contact_match(a, b):
+        return DEDUPE_NAME_ONLY * field_similarity(a.name, b.name) if names else 0
+    
+    fields = []  # (weight, similarity)
+    if names:
+        fields.append((0.45, field_similarity(a.name, b.name)))
+    if a.phone_key and b.phone_key:
+        fields.append((0.4, 1.0 if a.phone_key == b.phone_key else 0.0))
+    if a.email_key and b.email_key:
+        fields.append((0.4, 1.0 if a.email_key == b.email_key else 0.0))
+    if address_similarity(a, b) is not None:
+        fields.append((0.3, address_similarity(a, b)))
+    return sum(w * s for w, s in fields) / sum(w for w, s in fields)
+
+def find_duplicate_customers(min_score=DEDUPE_MIN_SCORE):
+    """Candidate duplicate pairs via blocking keys rather than comparing every pair.
+    
+    Returns [(score, record_a, record_b)] best first.
+    """
+    records = {row[0]: dedupe_record(*row) for row in
+               db.session.query(Customer.id, Customer.name, Customer.phone, Customer.email, Customer.address)}
+    blocks = {}
+    for r in records.values():
+        for key in blocking_keys(r.name, r.phone, r.email, r.address):
+            blocks.setdefault(key, []).append(r.id)
+    
+    pairs = set()
+    for ids in blocks.values():
+        if 1 < len(ids) <= DEDUPE_MAX_BLOCK:
+            pairs.update((a, b) for i, a in enumerate(ids) for b in ids[i + 1:])
+    
+    found = []
+    for a, b in pairs:
+        a, b = records[a], records[b]
+        # Most pairs come from first-name blocks; skip the edit distances when they can't reach min_score
+        if min_score > DEDUPE_NAME_ONLY and not contact_match(a, b):
+            continue
+        score = duplicate_score(a, b)
+        if score >= min_score:
+            found.append((score, a, b))
+    found.sort(key=lambda item: (-item[0], item[1].id, item[2].id))
+    return found
+
+def merge_customers(keep, merge):
+    """Fold customer `merge` into `keep`: move its jobs in one UPDATE, fill keep's blank contact fields, delete it"""
+    moved_jobs = db.session.query(Job.id, Job.date).filter(Job.customer_id == merge.id).all()
+    Job.query.filter(Job.customer_id == merge.id).update({Job.customer_id: keep.id}, synchronize_session=False)
+    if archive_exists():
+        moved_jobs += db.session.execute(db.select(archive_job_table.c.id, archive_job_table.c.date)
+                                         .where(archive_job_table.c.customer_id == merge.id)).all()
+        db.session.execute(archive_job_table.update().where(archive_job_table.c.customer_id == merge.id)
+                           .values(customer_id=keep.id))
+    # The bulk UPDATEs skip flush events, so drop affected report snapshots, refresh stats and log the moves here
+    invalidate_snapshots_for_dates(db.session.connection(), [job_date for job_id, job_date in moved_jobs])
+    refresh_customer_stats(db.session.connection(), [keep.id])
+    record_changes(db.session.connection(), 'job', [job_id for job_id, job_date in moved_jobs])
+    
+    for field in ('phone', 'email', 'address'):
+        if not getattr(keep, field) and getattr(merge, field):
+            setattr(keep, field, getattr(merge, field))
+    db.session.expire(merge, ['jobs'])
+    db.session.delete(merge)
+    db.session.commit()
+    # Jobs already in the session still point at the old customer
+    db.session.expire_all()
+    return len(moved_jobs)
+
 # ============== TEMPLATE FILTERS ==============
 
 @app.template_filter('currency')
@@ -386,49 +1875,717 @@ def fy_label_filter(fy_year):
 # ============== HELPER FUNCTIONS ==============
 
 def generate_quote_number():
-    last_job = Job.query.order_by(Job.id.desc()).first()
-    if last_job and last_job.quote_number:
+    """The number after the last job's, as SQL evaluated inside the job's INSERT - reading it
+    beforehand let two saves at the same moment take the same number"""
+    # CAST keeps the leading digits, so 'Q00123-2' counts as 123 and a blank or odd number as 0
+    last = db.select(db.cast(func.replace(Job.quote_number, 'Q', ''), db.Integer)) \
+        .order_by(Job.id.desc()).limit(1).scalar_subquery()
+    return func.printf('Q%05d', func.coalesce(last, 0) + 1)
+
+def get_month_dates(year, month):
+    """Get start and end dates for a calendar month"""
+    month_start = date(year, month, 1)
+    if month == 12:
+        month_end = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        month_end = date(year, month + 1, 1) - timedelta(days=1)
+    return month_start, month_end
+
+def get_job_filters():
+    """Read and sanitize the /jobs filter query string"""
+    return {
+        'status': sanitize_input(request.args.get('status', ''), max_length=50),
+        'search': sanitize_input(request.args.get('search', ''), max_length=200),
+        'fy': sanitize_input(request.args.get('fy', ''), max_length=10),
+        'month': sanitize_input(request.args.get('month', ''), max_length=10),
+        'quarter': sanitize_input(request.args.get('quarter', ''), max_length=10),
+        'archive': request.args.get('archive') == '1',
+    }
+
+def job_filter_criteria(filters, job=Job):
+    """Build SQL filter criteria for the /jobs filters.
+    
+    Search criteria reference Customer columns, so callers must join
+    Customer when filters['search'] is set. `job` is Job or the archive-inclusive
+    entity from job_sources().
+    """
+    criteria = []
+    
+    if filters['status']:
+        criteria.append(job.status == filters['status'])
+    
+    # Financial year filter
+    if filters['fy']:
         try:
-            num = int(last_job.quote_number.replace('Q', '').split('-')[0])
-            return f"Q{num + 1:05d}"
+            fy_start, fy_end = get_fy_dates(int(filters['fy']))
+            criteria += [job.date >= fy_start, job.date <= fy_end]
         except:
             pass
-    return "Q00001"
-
-def parse_aus_date(date_str):
-    """Parse Australian date format DD/MM/YYYY or ISO format"""
-    if not date_str:
-        return None
-    date_str = str(date_str).strip()
-    formats = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']
-    for fmt in formats:
+    
+    # Month filter (format: YYYY-MM)
+    if filters['month']:
         try:
-            parsed_date = datetime.strptime(date_str, fmt).date()
-            return parsed_date
-        except (ValueError, AttributeError):
-            continue
+            year, month = map(int, filters['month'].split('-'))
+            month_start, month_end = get_month_dates(year, month)
+            criteria += [job.date >= month_start, job.date <= month_end]
+        except:
+            pass
+    
+    # Quarter filter (format: FY-Q, e.g., 2024-Q1)
+    if filters['quarter'] and filters['fy']:
+        try:
+            q = int(filters['quarter'].replace('Q', ''))
+            q_start, q_end = get_quarter_dates(int(filters['fy']), q)
+            criteria += [job.date >= q_start, job.date <= q_end]
+        except:
+            pass
+    
+    # Search - use indexed LIKE queries for fuzzy search
+    search = filters['search']
+    if search:
+        # Normalize search for phone matching (remove spaces/dashes)
+        search_normalized = search.replace(' ', '').replace('-', '')
+        
+        # Search across key fields with phone normalization
+        criteria.append(db.or_(
+            Customer.name.ilike(f'%{search}%'),
+            Customer.phone.ilike(f'%{search}%'),
+            # Also match phone with spaces/dashes removed
+            func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{search_normalized}%'),
+            Customer.email.ilike(f'%{search}%'),
+            job.quote_number.ilike(f'%{search}%'),
+            job.description.ilike(f'%{search}%'),
+            job.notes.ilike(f'%{search}%'),
+        ))
+    
+    return criteria
+
+def filters_start_date(filters):
+    """First date the /jobs date filters allow, or None when they don't restrict dates"""
+    try:
+        if filters['month']:
+            year, month = map(int, filters['month'].split('-'))
+            return get_month_dates(year, month)[0]
+        if filters['fy']:
+            return get_fy_dates(int(filters['fy']))[0]
+    except ValueError:
+        pass
     return None
 
+def filters_include_archive(filters):
+    """Archived jobs are listed only when asked for, or when a date filter reaches back into them"""
+    start = filters_start_date(filters)
+    return filters['archive'] or (start is not None and reaches_archive(start))
+
+def customer_search_criteria(search, include_address=True):
+    """Build the OR filter used by the customer searches"""
+    # Normalize search for phone matching (remove spaces/dashes)
+    search_normalized = search.replace(' ', '').replace('-', '')
+    fields = [
+        Customer.name.ilike(f'%{search}%'),
+        Customer.phone.ilike(f'%{search}%'),
+        # Also match phone with spaces/dashes removed
+        func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{search_normalized}%'),
+        Customer.email.ilike(f'%{search}%'),
+    ]
+    if include_address:
+        fields.append(Customer.address.ilike(f'%{search}%'))
+    return db.or_(*fields)
+
+# ============== LIST ROWS ==============
+# Read-only lists and APIs load plain column tuples rather than ORM entities: nothing is
+# tracked in the identity map and GST/COGS come out of SQL. Edit flows still load Job/Customer.
+
+JobRow = namedtuple('JobRow', 'id quote_number description date status price deposit gst price_inc_gst '
+                              'total_cogs gross_profit customer_id customer_name customer_phone')
+CustomerRow = namedtuple('CustomerRow', 'id name phone email address job_count revenue last_job_date')
+
+def job_row_query(job=Job, material=Material):
+    """Query yielding JobRow columns, customer joined; `job`/`material` as returned by job_sources()"""
+    price = db.func.coalesce(job.price, 0)
+    cogs = (db.select(db.func.coalesce(db.func.sum(material.cost), 0))
+            .where(material.job_id == job.id)
+            .scalar_subquery())
+    return (db.session.query(job.id, job.quote_number, job.description, job.date, job.status, price,
+                             db.func.coalesce(job.deposit, 0), price * GST_RATE, price * (1 + GST_RATE),
+                             cogs, price - cogs, job.customer_id, Customer.name, Customer.phone)
+            .join(Customer, job.customer_id == Customer.id))
+
+def job_rows(rows):
+    return [JobRow._make(row) for row in rows]
+
+def customer_row_query():
+    """Query yielding CustomerRow columns, with lifetime stats from customer_stats"""
+    return (db.session.query(Customer.id, Customer.name, Customer.phone, Customer.email, Customer.address,
+                             db.func.coalesce(CustomerStats.job_count, 0), db.func.coalesce(CustomerStats.revenue, 0),
+                             CustomerStats.last_job_date)
+            .outerjoin(CustomerStats, CustomerStats.customer_id == Customer.id))
+
+def customer_rows(rows):
+    return [CustomerRow._make(row) for row in rows]
+
+def stream_rows(query, row_type):
+    """Rows of a column query as row_type, read through the cursor a batch at a time"""
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        yield row_type._make(row)
+
+def stream_page(template_name, **context):
+    """Render a list page as it is sent, so the header and first rows go out before the query finishes.
+    
+    Jinja yields a fragment per template tag; they are gathered into STREAM_CHUNK_SIZE writes.
+    """
+    # The session cookie is sent before the body renders, so consume flashed messages now
+    # (Flask caches them for the request) or they would be shown again on the next page
+    get_flashed_messages()
+    fragments = stream_template(template_name, **context)
+    
+    def chunks():
+        buffer, size = [], 0
+        for fragment in fragments:
+            buffer.append(fragment)
+            size += len(fragment)
+            if size >= STREAM_CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    return Response(chunks(), mimetype='text/html')
+
+def get_report_period(fy_filter, quarter_filter, month_filter):
+    """Resolve the reports filters into (selected_fy, date_start, date_end)"""
+    current_fy = get_financial_year(date.today())
+    
+    # Default to current FY
+    selected_fy = int(fy_filter) if fy_filter else current_fy
+    date_start, date_end = get_fy_dates(selected_fy)
+    
+    if quarter_filter:
+        try:
+            q = int(quarter_filter.replace('Q', ''))
+            date_start, date_end = get_quarter_dates(selected_fy, q)
+        except:
+            pass
+    elif month_filter:
+        try:
+            year, month = map(int, month_filter.split('-'))
+            date_start, date_end = get_month_dates(year, month)
+        except:
+            pass
+    
+    return selected_fy, date_start, date_end
+
 def get_backup_dir():
-    backup_dir = os.path.join(os.path.dirname(__file__), 'backups')
+    backup_dir = tenant_storage_dir(os.path.join(os.path.dirname(__file__), 'backups'))
     os.makedirs(backup_dir, exist_ok=True)
     return backup_dir
 
-def create_backup(prefix='backup'):
+def database_path():
+    """SQLite file behind the current tenant (or the single-shop database)"""
+    slug = current_tenant_slug()
+    return tenant_database_path(slug) if slug else db.engine.url.database
+
+BACKUP_COPY_PAGES = 1024  # Pages per online-backup step (progress is reported between steps)
+
+def copy_database(src, dst, progress=None):
+    """Copy one SQLite database into another with the online backup API (consistent while src is in use)"""
+    def report(status, remaining, total):
+        progress(1 - remaining / total if total else 1)
+    
+    source = sqlite3.connect(src)
+    target = sqlite3.connect(dst)
+    try:
+        source.backup(target, pages=BACKUP_COPY_PAGES, progress=report if progress else None)
+    finally:
+        target.close()
+        source.close()
+
+def create_backup(prefix='backup', progress=None):
     backup_dir = get_backup_dir()
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     backup_name = f'quoteforge_{prefix}_{timestamp}.db'
-    src = os.path.join(os.path.dirname(__file__), 'instance', 'quoteforge.db')
+    src = database_path()
     dst = os.path.join(backup_dir, backup_name)
     if os.path.exists(src):
-        shutil.copy2(src, dst)
+        # Archived jobs travel with the backup as <backup>.archive, copied with no archive-jobs run in between
+        with archive_lock():
+            copy_database(src, dst, progress)
+            if os.path.exists(archive_path(src)):
+                copy_database(archive_path(src), dst + ARCHIVE_BACKUP_SUFFIX)
         return backup_name
     return None
 
+@monitored_job('backup')
 def scheduled_backup():
-    with app.app_context():
-        create_backup('auto')
-        print(f"[{datetime.now()}] Automatic backup created")
+    backup_name = create_backup('auto')
+    if not backup_name:
+        raise RuntimeError('Automatic backup failed: database file not found')
+    size = os.path.getsize(os.path.join(get_backup_dir(), backup_name))
+    metric_set('quoteforge_backup_size_bytes', size)
+    print(f"[{datetime.now()}] Automatic backup created")
+
+# ============== DATABASE MAINTENANCE ==============
+
+MAINTENANCE_ANALYSIS_LIMIT = 1000  # Rows ANALYZE samples per index - keeps it quick however large the tables get
+MAINTENANCE_VACUUM_PAGES = 256  # Free pages handed back to the filesystem per incremental_vacuum step
+MAINTENANCE_MAX_CONVERT_MB = 500  # Largest database given the one-off full VACUUM that enables incremental vacuum
+MAINTENANCE_FTS_MERGE_PAGES = 500  # Pages merged per FTS5 'merge' command
+
+def database_bytes(conn):
+    return conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+
+def maintain_statistics(conn, deadline):
+    """Planner statistics: a sampled ANALYZE, then PRAGMA optimize for anything it flags"""
+    conn.execute(f'PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}')
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+
+def maintain_free_space(conn, deadline):
+    """Return free pages (deleted login attempts, jobs, imports) to the filesystem a step at a time"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        # Incremental vacuum has to be switched on by one full VACUUM
+        if database_bytes(conn) > MAINTENANCE_MAX_CONVERT_MB * 1024 * 1024:
+            print("[WARN] Database too large to convert to incremental vacuum during maintenance")
+            return
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return
+    while conn.execute('PRAGMA freelist_count').fetchone()[0] and time.monotonic() < deadline:
+        conn.execute(f'PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES})').fetchall()
+
+def maintain_fts(conn, deadline):
+    """Merge the b-tree segments of any FTS5 tables so searches read fewer of them"""
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND lower(sql) LIKE '%using fts5%'")]
+    for table in tables:
+        while time.monotonic() < deadline:
+            before = conn.total_changes
+            conn.execute(f'INSERT INTO "{table}"("{table}", rank) VALUES (\'merge\', ?)', (MAINTENANCE_FTS_MERGE_PAGES,))
+            if conn.total_changes - before < 2:  # Nothing left to merge
+                break
+
+def maintain_wal(conn, deadline):
+    """Fold the write-ahead log back into the database and truncate it"""
+    if conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+
+MAINTENANCE_STEPS = [
+    ('statistics', maintain_statistics),
+    ('free_space', maintain_free_space),
+    ('fts_merge', maintain_fts),
+    ('wal_checkpoint', maintain_wal),  # Last, so the pages vacuum wrote to the WAL are folded back too
+]
+
+@monitored_job('db_maintenance')
+def run_db_maintenance():
+    """Scheduler job: the MAINTENANCE_STEPS in order, skipping whatever is left once the time budget is spent"""
+    path = database_path()
+    if not os.path.exists(path):
+        return
+    tenant = (('tenant', current_tenant_slug() or 'default'),)
+    deadline = time.monotonic() + app.config['MAINTENANCE_BUDGET']
+    durations = {}
+    conn = sqlite3.connect(path, isolation_level=None, timeout=10)
+    try:
+        size_before = database_bytes(conn)
+        for name, step in MAINTENANCE_STEPS:
+            if time.monotonic() >= deadline:
+                print(f"[WARN] Maintenance out of time before {name}")
+                break
+            started = time.perf_counter()
+            try:
+                step(conn, deadline)
+            except sqlite3.OperationalError as e:
+                # Someone is writing after all - the step runs again tomorrow night
+                print(f"[WARN] Maintenance step {name} skipped: {e}")
+                continue
+            durations[name] = time.perf_counter() - started
+            metric_set('quoteforge_maintenance_step_seconds', durations[name], tenant + (('step', name),))
+        size_after = database_bytes(conn)
+    finally:
+        conn.close()
+    
+    reclaimed = max(size_before - size_after, 0)
+    metric_inc('quoteforge_maintenance_reclaimed_bytes_total', tenant, reclaimed)
+    metric_set('quoteforge_database_size_bytes', size_after, tenant)
+    timings = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in durations.items()) or 'no steps run'
+    print(f"✓ Database maintenance ({tenant[0][1]}): {timings}; {reclaimed / 1024:.0f} KB reclaimed")
+    return durations, reclaimed
+
+# ============== READ REPLICA ==============
+
+REPLICA_COPY_PAGES = 256  # Pages per online-backup step; the primary is only read-locked for one step at a time
+_replica_state = {}  # primary path -> {'signature': file stat when last copied, 'verified_at': time}
+_replica_engines = {}
+_replica_lock = threading.Lock()
+
+def replica_path(primary):
+    return os.path.splitext(primary)[0] + '.replica.db'
+
+def primary_signature(primary):
+    """Changes whenever the database (or its WAL) is written"""
+    signature = []
+    for path in (primary, primary + '-wal'):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def replica_engine(primary):
+    """Read-only engine on the replica; NullPool so each request opens the latest copy"""
+    with _replica_lock:
+        engine = _replica_engines.get(primary)
+        if engine is None:
+            engine = create_engine(f'sqlite:///file:{replica_path(primary)}?mode=ro&uri=true', poolclass=NullPool)
+            _replica_engines[primary] = engine
+        return engine
+
+def replica_is_fresh(primary):
+    state = _replica_state.get(primary)
+    return bool(state) and time.time() - state['verified_at'] <= app.config['REPLICA_MAX_LAG'] \
+        and os.path.exists(replica_path(primary))
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside this block, even on a replica-routed request (for results that get cached)"""
+    previous = g.get('read_replica')
+    g.read_replica = False
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+@monitored_job('replica_refresh')
+def refresh_replica():
+    """Scheduler job: copy the database to its replica if it has been written since the last copy.
+    
+    Uses SQLite's online backup into a temp file (restarting if the primary is written mid-copy),
+    then swaps it in with os.replace so replica readers never see a half-written file.
+    """
+    primary = database_path()
+    started = time.time()
+    signature = primary_signature(primary)
+    target = replica_path(primary)
+    state = _replica_state.get(primary)
+    if state and state['signature'] == signature and os.path.exists(target):
+        state['verified_at'] = started
+        return
+    
+    tmp_path = target + '.tmp'
+    source = sqlite3.connect(primary)
+    copy = sqlite3.connect(tmp_path)
+    try:
+        source.backup(copy, pages=REPLICA_COPY_PAGES, sleep=0.005)
+    finally:
+        copy.close()
+        source.close()
+    os.replace(tmp_path, target)
+    _replica_state[primary] = {'signature': signature, 'verified_at': started}
+    metric_set('quoteforge_replica_copy_seconds', time.time() - started, (('tenant', current_tenant_slug() or 'default'),))
+
+@app.before_request
+def route_reads_to_replica():
+    if app.config['REPLICA_ENABLED'] and request.endpoint in app.config['REPLICA_ENDPOINTS']:
+        g.read_replica = replica_is_fresh(database_path())
+
+# ============== BACKGROUND TASKS ==============
+
+TASK_RETENTION_DAYS = 7
+TASK_PROGRESS_INTERVAL = 0.5  # Seconds between progress writes for the same message
+
+task_metadata = db.MetaData()
+task_table = db.Table(
+    'task', task_metadata,
+    db.Column('id', db.String(32), primary_key=True),
+    db.Column('tenant', db.String(50)),
+    db.Column('kind', db.String(30), nullable=False),
+    db.Column('status', db.String(20), nullable=False),  # queued, running, succeeded, failed
+    db.Column('progress', db.Float, nullable=False, default=0),
+    db.Column('message', db.String(200)),
+    db.Column('result', db.Text),  # JSON returned by the task function
+    db.Column('error', db.Text),
+    db.Column('created_at', db.DateTime, nullable=False),
+    db.Column('started_at', db.DateTime),
+    db.Column('finished_at', db.DateTime),
+)
+
+class TaskProgress:
+    """Handed to a task function as progress(fraction, message=None); throttled writes to the task row"""
+    def __init__(self, runner, task_id):
+        self.runner = runner
+        self.task_id = task_id
+        self.message = None
+        self.written = 0
+    
+    def __call__(self, fraction, message=None):
+        message = message or self.message
+        now = time.time()
+        if message == self.message and now - self.written < TASK_PROGRESS_INTERVAL:
+            return
+        self.message, self.written = message, now
+        self.runner.update(self.task_id, progress=min(max(fraction, 0), 1), message=message)
+
+class TaskRunner:
+    """Runs slow operations (backup, restore) off the request thread.
+    
+    At most TASK_WORKERS tasks run at once, and tasks for the same workshop run one
+    at a time since they act on the same database file. Task functions take the
+    progress callable first and return a JSON-serialisable result.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engine = None
+        self.executor = None
+        self.tenant_locks = defaultdict(threading.Lock)
+    
+    def get_engine(self):
+        with self.lock:
+            if self.engine is None:
+                path = app.config['TASKS_DATABASE']
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.engine = create_engine(f'sqlite:///{path}')
+                task_metadata.create_all(self.engine)
+            return self.engine
+    
+    def submit(self, kind, func, *args):
+        """Queue func(progress, *args) for the current workshop; returns the task id"""
+        task_id = uuid.uuid4().hex
+        tenant = current_tenant_slug()
+        with self.get_engine().begin() as conn:
+            conn.execute(task_table.insert().values(
+                id=task_id, tenant=tenant, kind=kind, status='queued', progress=0, created_at=datetime.utcnow()))
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=app.config['TASK_WORKERS'], thread_name_prefix='task')
+        self.executor.submit(self.run, task_id, tenant, kind, func, args)
+        return task_id
+    
+    def update(self, task_id, **values):
+        with self.get_engine().begin() as conn:
+            conn.execute(task_table.update().where(task_table.c.id == task_id).values(**values))
+    
+    def run(self, task_id, tenant, kind, func, args):
+        with self.tenant_locks[tenant]:
+            self.update(task_id, status='running', started_at=datetime.utcnow())
+            try:
+                with tenant_context(tenant):
+                    result = func(TaskProgress(self, task_id), *args)
+            except Exception as e:
+                print(f"[WARN] Task {kind} {task_id} failed: {e}")
+                self.update(task_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+                metric_inc('quoteforge_tasks_total', (('kind', kind), ('outcome', 'failure')))
+                return
+            self.update(task_id, status='succeeded', progress=1, message=None, result=json.dumps(result),
+                        finished_at=datetime.utcnow())
+            metric_inc('quoteforge_tasks_total', (('kind', kind), ('outcome', 'success')))
+    
+    def get(self, task_id, tenant):
+        """The task as a dict, or None if it doesn't exist for this workshop"""
+        with self.get_engine().connect() as conn:
+            row = conn.execute(task_table.select().where(
+                task_table.c.id == task_id, task_table.c.tenant.is_not_distinct_from(tenant))).mappings().first()
+        if row is None:
+            return None
+        task = dict(row)
+        task['result'] = json.loads(task['result']) if task['result'] else None
+        return task
+    
+    def recover(self):
+        """On startup: fail tasks a previous process never finished, and forget old ones"""
+        now = datetime.utcnow()
+        with self.get_engine().begin() as conn:
+            conn.execute(task_table.update().where(task_table.c.status.in_(['queued', 'running']))
+                         .values(status='failed', error='Interrupted by a restart', finished_at=now))
+            conn.execute(task_table.delete().where(
+                task_table.c.finished_at < now - timedelta(days=TASK_RETENTION_DAYS)))
+
+task_runner = TaskRunner()
+
+def backup_task(progress):
+    progress(0, 'Copying database')
+    backup_name = create_backup('manual', progress)
+    if not backup_name:
+        raise RuntimeError('Database file not found')
+    return {'filename': backup_name, 'size': os.path.getsize(os.path.join(get_backup_dir(), backup_name))}
+
+def restore_task(progress, filename):
+    """Restore the current workshop's database from one of its backups, after a safety backup"""
+    backup_path = os.path.join(get_backup_dir(), filename)
+    progress(0, 'Creating safety backup')
+    safety_backup = create_backup('pre_restore_safety', lambda fraction: progress(fraction * 0.4))
+    
+    progress(0.4, 'Restoring')
+    db.session.remove()
+    if g.get('tenant'):
+        tenant_engines.dispose(g.tenant)
+    else:
+        db.engine.dispose()
+    with archive_lock():
+        copy_database(backup_path, database_path(), lambda fraction: progress(0.4 + fraction * 0.5))
+        # The archive must match the restored jobs: the backup's own, or none if it predates archiving
+        if os.path.exists(backup_path + ARCHIVE_BACKUP_SUFFIX):
+            copy_database(backup_path + ARCHIVE_BACKUP_SUFFIX, archive_path(database_path()))
+        elif os.path.exists(archive_path(database_path())):
+            os.remove(archive_path(database_path()))
+    current_engine().dispose()
+    customer_index.invalidate()
+    job_analytics.invalidate()
+    
+    # Older backups may predate the derived tables, or hold ones built from other data
+    progress(0.9, 'Rebuilding indexes')
+    try:
+        db.metadata.create_all(current_engine())
+        rebuild_customer_trigrams()
+        rebuild_customer_stats()
+    except Exception as e:
+        print(f"[WARN] Failed to rebuild derived tables after restore: {e}")
+    # Sync clients' cursors point into the history the restore just replaced
+    start_change_feed_generation()
+    return {'filename': filename, 'safety_backup': safety_backup}
+
+def task_accepted(task_id):
+    """202 with the task id for API clients; forms go back to the backup page, which follows the task"""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'task_id': task_id, 'url': url_for('api_task', task_id=task_id)}), 202
+    return redirect(url_for('backup_page', task=task_id))
+
+# ============== DOCUMENT STORAGE ==============
+
+UPLOAD_CHUNK_SIZE = 256 * 1024
+ALLOWED_DOCUMENT_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.txt'}
+THUMBNAIL_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+THUMBNAIL_SIZE = 320
+DOCUMENT_MAX_AGE = 365 * 24 * 3600  # A document id always serves the same bytes
+
+def document_blob_path(digest):
+    """uploads/objects/ab/abcdef... - content-addressed, so identical files are stored once"""
+    return os.path.join(tenant_storage_dir(app.config['UPLOAD_DIR']), 'objects', digest[:2], digest)
+
+def store_document_blob(stream):
+    """Copy an upload stream to disk in chunks while hashing it; returns the SHA-256 hex digest.
+    
+    The stream is never read into memory whole, and content already on disk is not stored twice.
+    """
+    tmp_dir = os.path.join(tenant_storage_dir(app.config['UPLOAD_DIR']), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    
+    digest = sha256.hexdigest()
+    path = document_blob_path(digest)
+    if os.path.exists(path):
+        os.remove(tmp.name)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp.name, path)
+    return digest
+
+def remove_unused_blobs(digests):
+    """Delete stored files (and their thumbnails) no Document refers to any more"""
+    for digest in set(digests):
+        if Document.query.filter(Document.filename == digest).first():
+            continue
+        thumb_dir = os.path.join(tenant_storage_dir(app.config['UPLOAD_DIR']), 'thumbs')
+        for path in [document_blob_path(digest), os.path.join(thumb_dir, f'{digest}_{THUMBNAIL_SIZE}.jpg')]:
+            if os.path.exists(path):
+                os.remove(path)
+
+def document_thumbnail(document):
+    """Path to a cached JPEG thumbnail, generated on first request; None if the image can't be read"""
+    thumb_dir = os.path.join(tenant_storage_dir(app.config['UPLOAD_DIR']), 'thumbs')
+    thumb_path = os.path.join(thumb_dir, f'{document.filename}_{THUMBNAIL_SIZE}.jpg')
+    if os.path.exists(thumb_path):
+        return thumb_path
+    
+    os.makedirs(thumb_dir, exist_ok=True)
+    tmp_path = None
+    try:
+        with Image.open(document.path) as image:
+            # Let the JPEG decoder scale down while decoding, so a 12MP phone photo is never fully unpacked
+            image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            fd, tmp_path = tempfile.mkstemp(dir=thumb_dir, suffix='.jpg')
+            with os.fdopen(fd, 'wb') as tmp:
+                image.convert('RGB').save(tmp, 'JPEG', quality=80)
+        # Atomic, so concurrent first requests never see a half-written thumbnail
+        os.replace(tmp_path, thumb_path)
+    except (OSError, Image.DecompressionBombError) as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"[WARN] Thumbnail failed for document {document.id}: {e}")
+        return None
+    return thumb_path
+
+# ============== QUOTE DOCUMENTS ==============
+
+INVOICE_STATUSES = {'completed'}  # Printed as a tax invoice rather than a quote
+QUOTE_BATCH_LIMIT = 500  # Jobs per /jobs/quotes.zip; larger runs go through `flask render-quotes`
+
+def quote_context(job):
+    """Everything printed on a job's quote, as plain data (hashed for the cache key, pickled to workers).
+    
+    Internal notes and material costs stay off the document; materials are listed by description only.
+    """
+    price = round(job.price or 0, 2)
+    gst = round(price * GST_RATE, 2)
+    deposit = round(job.deposit or 0, 2)
+    customer = job.customer
+    return {
+        'title': 'TAX INVOICE' if job.status in INVOICE_STATUSES else 'QUOTE',
+        'business_name': current_tenant().name if current_tenant() else app.config['QUOTE_BUSINESS_NAME'],
+        'business_details': app.config['QUOTE_BUSINESS_DETAILS'],
+        'footer': app.config['QUOTE_FOOTER'],
+        'gst_percent': round(GST_RATE * 100),
+        'job': {
+            'quote_number': job.quote_number or str(job.id),
+            'date': job.date.isoformat() if job.date else '',
+            'status': STATUS_LABELS.get(job.status, job.status or ''),
+            'description': job.description or '',
+        },
+        'customer': {
+            'name': customer.name or '',
+            'address': customer.address or '',
+            'phone': customer.phone or '',
+            'email': customer.email or '',
+        },
+        'items': [{'category': m.category or 'Materials', 'description': m.description}
+                  for m in sorted(job.materials, key=lambda m: m.id) if m.description],
+        'totals': {
+            'price': price,
+            'gst': gst,
+            'price_inc_gst': round(price + gst, 2),
+            'deposit': deposit,
+            'balance': round(price + gst - deposit, 2),
+        },
+    }
+
+def quote_documents(jobs, workers=None):
+    """[(html_path, pdf_path, digest)] per job, rendering only jobs whose content hash has no cached files"""
+    cache_dir = tenant_storage_dir(app.config['QUOTE_CACHE_DIR'])
+    results, misses = [], []
+    for job in jobs:
+        context = quote_context(job)
+        digest = quotes.quote_digest(context)
+        html_path, pdf_path = quotes.cached_paths(cache_dir, job.id, digest)
+        if not (os.path.exists(pdf_path) and os.path.exists(html_path)):
+            misses.append((job.id, digest, context))
+        results.append((html_path, pdf_path, digest))
+    if misses:
+        quotes.render_batch(cache_dir, misses, workers=workers)
+    return results
+
+def quote_jobs_query():
+    return Job.query.options(db.joinedload(Job.customer), db.selectinload(Job.materials))
 
 # ============== STATUS HELPERS ==============
 
@@ -455,18 +2612,56 @@ def utility_processor():
         'STATUS_COLORS': STATUS_COLORS,
         'GST_RATE': GST_RATE,
         'today': date.today(),
-        'current_fy': get_financial_year(date.today())
+        'current_fy': get_financial_year(date.today()),
+        'asset_url': asset_url,
     }
 
-# ============== ROUTES ==============
+# ============== STATIC ASSETS ==============
 
-@app.route('/')
-@login_required
-def index():
-    total_jobs = Job.query.count()
-    total_customers = Customer.query.count()
-    
-    # Current financial year
+ASSET_MAX_AGE = 365 * 24 * 3600
+_asset_hashes = {}  # filename -> (mtime, content hash)
+
+def asset_hash(filename):
+    """Short content hash of a file under static/, re-read only when its mtime changes"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _asset_hashes.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _asset_hashes[filename] = (mtime, digest)
+    return digest
+
+def asset_url(filename):
+    """Fingerprinted static URL (/static/css/app.css?v=<hash>) - a new hash whenever the file changes"""
+    return url_for('static', filename=filename, v=asset_hash(filename))
+
+@app.after_request
+def cache_static_assets(response):
+    """Fingerprinted assets never change under the same URL, so browsers can keep them for a year"""
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        version = request.args.get('v')
+        if version and version == asset_hash(request.view_args.get('filename', '')):
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+    return response
+
+# ============== DASHBOARD PUSH ==============
+
+DASHBOARD_MAX_STREAMS = 50  # Open dashboard streams across all tenants (each holds a server thread)
+DASHBOARD_QUEUE_SIZE = 20  # Updates buffered per stream before the oldest is dropped
+DASHBOARD_KEEPALIVE = 25  # Seconds between keepalive comments, under typical proxy idle timeouts
+DASHBOARD_DEBOUNCE = 0.25  # Seconds to let a burst of commits collapse into one update
+DASHBOARD_RETRY_MS = 5000  # Browser reconnect delay after a dropped stream
+
+def dashboard_summary():
+    """Headline figures shown on both dashboards"""
     current_fy = get_financial_year(date.today())
     fy_start, fy_end = get_fy_dates(current_fy)
     
@@ -482,74 +2677,158 @@ def index():
         Job.date <= fy_end
     ).scalar() or 0
     
-    # Pending jobs count
-    pending_jobs = Job.query.filter(
-        Job.status.in_(['quoted', 'deposit_paid', 'in_progress'])
-    ).count()
+    # Jobs by status
+    status_counts = dict.fromkeys(STATUS_LABELS, 0)
+    status_counts.update(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
     
-    # Recent jobs
-    recent_jobs = Job.query.order_by(Job.date.desc()).limit(10).all()
+    # Archived jobs never change, so their totals come from the cached archive summary
+    summary = archive_summary()
+    if summary:
+        total_revenue += summary['revenue']
+        for status, count in summary['status_counts'].items():
+            status_counts[status] = status_counts.get(status, 0) + count
     
-    # Jobs by status
-    status_counts = {}
-    for status in STATUS_LABELS.keys():
-        status_counts[status] = Job.query.filter(Job.status == status).count()
-    
-    return render_template('index.html', 
-                         total_jobs=total_jobs,
-                         total_customers=total_customers, 
-                         total_revenue=total_revenue,
-                         fy_revenue=fy_revenue,
-                         pending_jobs=pending_jobs,
-                         recent_jobs=recent_jobs,
-                         status_counts=status_counts,
-                         current_fy=current_fy)
+    return {
+        'total_jobs': sum(status_counts.values()),
+        'total_customers': Customer.query.count(),
+        'total_revenue': total_revenue,
+        'fy_revenue': fy_revenue,
+        'pending_jobs': sum(status_counts.get(status, 0) for status in ['quoted', 'deposit_paid', 'in_progress']),
+        'status_counts': status_counts,
+        'current_fy': current_fy,
+    }
 
-@app.route('/index/lcars')
-@login_required
-def lcars_dashboard():
-    """LCARS-style alternate dashboard"""
-    total_jobs = Job.query.count()
-    total_customers = Customer.query.count()
+def dashboard_update(job_ids):
+    """Payload pushed after commits: fresh figures plus the written jobs (ids gone from the database were deleted)"""
+    rows = (db.session.query(Job.id, Job.quote_number, Job.date, Job.status, Job.price, Customer.name)
+            .join(Customer, Customer.id == Job.customer_id)
+            .filter(Job.id.in_(sorted(job_ids)))
+            .all()) if job_ids else []
+    jobs = [{
+        'id': row.id,
+        'quote_number': row.quote_number,
+        'customer': row.name,
+        'date': row.date.isoformat() if row.date else None,
+        'date_display': row.date.strftime('%d/%m/%Y') if row.date else '',
+        'status': row.status,
+        'status_label': STATUS_LABELS.get(row.status, row.status),
+        'status_color': STATUS_COLORS.get(row.status, ''),
+        'price': row.price or 0,
+    } for row in rows]
+    return {
+        'summary': dashboard_summary(),
+        'jobs': jobs,
+        'removed': sorted(set(job_ids) - {job['id'] for job in jobs}),
+    }
+
+class DashboardBroadcaster:
+    """Fans dashboard updates out to every open Server-Sent Events stream.
     
-    # Current financial year
-    current_fy = get_financial_year(date.today())
-    fy_start, fy_end = get_fy_dates(current_fy)
+    Commits only report which jobs they wrote; one worker thread computes the
+    update once per tenant and hands the same message to all of its streams.
+    """
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.streams = defaultdict(set)  # tenant -> {Queue}
+        self.pending = {}  # tenant -> job ids written since the last update
+        self.worker = None
     
-    # Total revenue (ex GST)
-    total_revenue = db.session.query(db.func.sum(Job.price)).filter(
-        Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
-    ).scalar() or 0
+    def subscribe(self, tenant):
+        """A new stream's queue, or None when DASHBOARD_MAX_STREAMS are already open"""
+        with self.lock:
+            if sum(len(streams) for streams in self.streams.values()) >= DASHBOARD_MAX_STREAMS:
+                return None
+            stream = queue.Queue(maxsize=DASHBOARD_QUEUE_SIZE)
+            self.streams[tenant].add(stream)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name='dashboard-push', daemon=True)
+                self.worker.start()
+            return stream
     
-    # FY revenue
-    fy_revenue = db.session.query(db.func.sum(Job.price)).filter(
-        Job.status.in_(['completed', 'deposit_paid', 'in_progress']),
-        Job.date >= fy_start,
-        Job.date <= fy_end
-    ).scalar() or 0
+    def unsubscribe(self, tenant, stream):
+        with self.lock:
+            self.streams[tenant].discard(stream)
+            if not self.streams[tenant]:
+                del self.streams[tenant]
     
-    # Pending jobs count
-    pending_jobs = Job.query.filter(
-        Job.status.in_(['quoted', 'deposit_paid', 'in_progress'])
-    ).count()
+    def notify(self, tenant, job_ids):
+        with self.lock:
+            if tenant not in self.streams:
+                return  # Nobody watching, nothing to compute
+            self.pending.setdefault(tenant, set()).update(job_ids)
+            self.lock.notify()
+    
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.lock.wait()
+            time.sleep(DASHBOARD_DEBOUNCE)
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            for tenant, job_ids in pending.items():
+                try:
+                    with tenant_context(tenant):
+                        payload = dashboard_update(job_ids)
+                except Exception as e:
+                    print(f"[WARN] Dashboard update failed: {e}")
+                    continue
+                self.publish(tenant, f"event: dashboard\ndata: {json.dumps(payload)}\n\n")
+    
+    def publish(self, tenant, message):
+        with self.lock:
+            streams = list(self.streams.get(tenant, ()))
+        for stream in streams:
+            try:
+                stream.put_nowait(message)
+            except queue.Full:
+                # A stalled client: drop its oldest update - every update carries the full figures
+                try:
+                    stream.get_nowait()
+                except queue.Empty:
+                    pass
+                stream.put_nowait(message)
+
+dashboard_broadcaster = DashboardBroadcaster()
+
+@event.listens_for(db.session, 'after_flush')
+def collect_dashboard_changes(session, flush_context):
+    """Note jobs (and customer adds/removals) written in this flush, for the next dashboard push"""
+    job_ids = {obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted) if isinstance(obj, Job)}
+    customers = any(isinstance(obj, Customer) for obj in list(session.new) + list(session.deleted))
+    if job_ids or customers:
+        session.info.setdefault('dashboard_jobs', set()).update(job_ids)
+
+@event.listens_for(db.session, 'after_commit')
+def push_dashboard_changes(session):
+    job_ids = session.info.pop('dashboard_jobs', None)
+    if job_ids is not None:
+        dashboard_broadcaster.notify(current_tenant_slug(), job_ids)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_dashboard_changes(session):
+    session.info.pop('dashboard_jobs', None)
+
+# ============== ROUTES ==============
+
+@app.route('/')
+@login_required
+def index():
+    # Recent jobs
+    recent_jobs = job_rows(job_row_query().order_by(Job.date.desc()).limit(10))
     
+    # Later changes arrive over /api/dashboard/stream
+    return render_template('index.html', recent_jobs=recent_jobs, **dashboard_summary())
+
+@app.route('/index/lcars')
+@login_required
+def lcars_dashboard():
+    """LCARS-style alternate dashboard"""
     # Recent jobs
-    recent_jobs = Job.query.order_by(Job.date.desc()).limit(10).all()
+    recent_jobs = job_rows(job_row_query().order_by(Job.date.desc()).limit(10))
     
-    # Jobs by status
-    status_counts = {}
-    for status in STATUS_LABELS.keys():
-        status_counts[status] = Job.query.filter(Job.status == status).count()
-    
-    return render_template('lcars_dashboard.html', 
-                         total_jobs=total_jobs,
-                         total_customers=total_customers, 
-                         total_revenue=total_revenue,
-                         fy_revenue=fy_revenue,
-                         pending_jobs=pending_jobs,
-                         recent_jobs=recent_jobs,
-                         status_counts=status_counts,
-                         current_fy=current_fy)
+    # Later changes arrive over /api/dashboard/stream
+    return render_template('lcars_dashboard.html', recent_jobs=recent_jobs, **dashboard_summary())
 
 @app.route('/index/lcars/jobs')
 @login_required
@@ -557,7 +2836,7 @@ def lcars_jobs():
     """LCARS Jobs List"""
     status = request.args.get('status')
     search = request.args.get('q', '')
-    query = Job.query.order_by(Job.date.desc())
+    query = job_row_query().order_by(Job.date.desc())
     
     if status:
         query = query.filter(Job.status == status)
@@ -568,7 +2847,7 @@ def lcars_jobs():
         search_normalized = search.replace(' ', '').replace('-', '')
         
         # Build multiple search patterns
-        query = query.join(Customer).filter(
+        query = query.filter(
             db.or_(
                 Customer.name.ilike(f'%{search}%'),
                 Customer.phone.ilike(f'%{search}%'),
@@ -579,7 +2858,7 @@ def lcars_jobs():
             )
         )
         
-    jobs = query.limit(50).all()
+    jobs = job_rows(query.limit(50))
     return render_template('lcars_jobs.html', jobs=jobs, search_query=search)
 
 @app.route('/index/lcars/job/new')
@@ -592,7 +2871,7 @@ def lcars_new_job():
 @login_required
 def lcars_customers():
     """LCARS Customers List"""
-    customers = Customer.query.order_by(Customer.name).limit(50).all()
+    customers = customer_rows(customer_row_query().order_by(Customer.name).limit(50))
     return render_template('lcars_customers.html', customers=customers)
 
 @app.route('/index/lcars/reports')
@@ -612,82 +2891,24 @@ def lcars_backup():
 @app.route('/jobs')
 @login_required
 def jobs():
-    # Sanitize all inputs
-    status_filter = sanitize_input(request.args.get('status', ''), max_length=50)
-    search = sanitize_input(request.args.get('search', ''), max_length=200)
-    fy_filter = sanitize_input(request.args.get('fy', ''), max_length=10)
-    month_filter = sanitize_input(request.args.get('month', ''), max_length=10)
-    quarter_filter = sanitize_input(request.args.get('quarter', ''), max_length=10)
-    
-    query = Job.query
-    
-    if status_filter:
-        query = query.filter(Job.status == status_filter)
-    
-    # Financial year filter
-    if fy_filter:
-        try:
-            fy = int(fy_filter)
-            fy_start, fy_end = get_fy_dates(fy)
-            query = query.filter(Job.date >= fy_start, Job.date <= fy_end)
-        except:
-            pass
-    
-    # Month filter (format: YYYY-MM)
-    if month_filter:
-        try:
-            year, month = map(int, month_filter.split('-'))
-            month_start = date(year, month, 1)
-            if month == 12:
-                month_end = date(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                month_end = date(year, month + 1, 1) - timedelta(days=1)
-            query = query.filter(Job.date >= month_start, Job.date <= month_end)
-        except:
-            pass
-    
-    # Quarter filter (format: FY-Q, e.g., 2024-Q1)
-    if quarter_filter and fy_filter:
-        try:
-            q = int(quarter_filter.replace('Q', ''))
-            fy = int(fy_filter)
-            q_start, q_end = get_quarter_dates(fy, q)
-            query = query.filter(Job.date >= q_start, Job.date <= q_end)
-        except:
-            pass
-    
-    # Search - use indexed LIKE queries for fuzzy search
-    if search:
-        search = search.strip()
-        if search:
-            # Normalize search for phone matching (remove spaces/dashes)
-            search_normalized = search.replace(' ', '').replace('-', '')
-            
-            # Search across key fields with phone normalization
-            query = query.join(Customer).filter(
-                db.or_(
-                    Customer.name.ilike(f'%{search}%'),
-                    Customer.phone.ilike(f'%{search}%'),
-                    # Also match phone with spaces/dashes removed
-                    func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{search_normalized}%'),
-                    Customer.email.ilike(f'%{search}%'),
-                    Job.quote_number.ilike(f'%{search}%'),
-                    Job.description.ilike(f'%{search}%'),
-                    Job.notes.ilike(f'%{search}%'),
-                )
-            )
+    filters = get_job_filters()
+    include_archive = filters_include_archive(filters)
+    job, material = job_sources(include_archive)
     
-    jobs_list = query.order_by(Job.date.desc()).all()
+    query = job_row_query(job, material).filter(*job_filter_criteria(filters, job))
     available_fys = get_available_fys()
     
-    return render_template('jobs.html', 
-                         jobs=jobs_list, 
-                         status_filter=status_filter, 
-                         search=search,
-                         fy_filter=fy_filter,
-                         month_filter=month_filter,
-                         quarter_filter=quarter_filter,
-                         available_fys=available_fys)
+    # Every job in history when unfiltered - streamed rather than built up in memory
+    return stream_page('jobs.html',
+                       jobs=stream_rows(query.order_by(job.date.desc()), JobRow),
+                       status_filter=filters['status'],
+                       search=filters['search'],
+                       fy_filter=filters['fy'],
+                       month_filter=filters['month'],
+                       quarter_filter=filters['quarter'],
+                       include_archive=include_archive,
+                       archive_summary=archive_summary(),
+                       available_fys=available_fys)
 
 @app.route('/jobs/new', methods=['GET', 'POST'])
 @login_required
@@ -736,7 +2957,7 @@ def job_new():
         
         # Parse date - default to today
         date_str = request.form.get('date', '').strip()
-        parsed_date = parse_aus_date(date_str)
+        parsed_date = parse_date(date_str)
         job.date = parsed_date if parsed_date else date.today()
         
         db.session.add(job)
@@ -765,8 +2986,11 @@ def job_new():
 @app.route('/jobs/<int:job_id>')
 @login_required
 def job_detail(job_id):
-    job = Job.query.get_or_404(job_id)
-    return render_template('job_detail.html', job=job)
+    job = Job.query.get(job_id)
+    archived = job is None
+    if archived:
+        job = archived_job_or_404(job_id)
+    return render_template('job_detail.html', job=job, archived=archived)
 
 @app.route('/jobs/<int:job_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -787,12 +3011,14 @@ def job_edit(job_id):
         
         date_str = request.form.get('date', '').strip()
         if date_str:
-            parsed_date = parse_aus_date(date_str)
+            parsed_date = parse_date(date_str)
             if parsed_date:
                 job.date = parsed_date
         
         # Update materials - delete existing and add new
+        old_material_ids = [material_id for (material_id,) in db.session.query(Material.id).filter_by(job_id=job.id)]
         Material.query.filter_by(job_id=job.id).delete()
+        record_changes(db.session.connection(), 'material', old_material_ids, deleted=True)
         material_descs = request.form.getlist('material_desc[]')
         material_costs = request.form.getlist('material_cost[]')
         material_categories = request.form.getlist('material_category[]')
@@ -817,47 +3043,254 @@ def job_edit(job_id):
 def job_delete(job_id):
     job = Job.query.get_or_404(job_id)
     quote_num = job.quote_number
+    digests = [d.filename for d in job.documents]
     db.session.delete(job)
     db.session.commit()
+    remove_unused_blobs(digests)
     flash(f'Job {quote_num} deleted.', 'success')
     return redirect(url_for('jobs'))
 
+# ============== DOCUMENT ROUTES ==============
+
+@app.route('/jobs/<int:job_id>/documents', methods=['POST'])
+@login_required
+def document_upload(job_id):
+    job = Job.query.get_or_404(job_id)
+    try:
+        uploads = request.files.getlist('files')
+    except RequestEntityTooLarge:
+        flash(f"Upload too large (limit {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB)", 'error')
+        return redirect(url_for('job_detail', job_id=job.id))
+    
+    uploaded, skipped = 0, []
+    for upload in uploads:
+        original_name = secure_filename(upload.filename or '')
+        if not original_name:
+            continue
+        if os.path.splitext(original_name)[1].lower() not in ALLOWED_DOCUMENT_EXTENSIONS:
+            skipped.append(original_name)
+            continue
+        # Werkzeug has already spooled large parts to a temp file; copy that across in chunks
+        digest = store_document_blob(upload.stream)
+        db.session.add(Document(job_id=job.id, filename=digest, original_name=original_name))
+        uploaded += 1
+    db.session.commit()
+    
+    if uploaded:
+        flash(f'{uploaded} file{"s" if uploaded != 1 else ""} attached', 'success')
+    if skipped:
+        flash(f'Skipped unsupported file type: {", ".join(skipped)}', 'error')
+    return redirect(url_for('job_detail', job_id=job.id))
+
+@app.route('/api/jobs/<int:job_id>/documents')
+@login_required
+def api_job_documents(job_id):
+    job = Job.query.get_or_404(job_id)
+    return jsonify([{
+        'id': d.id,
+        'name': d.original_name,
+        'size': d.size,
+        'mimetype': d.mimetype,
+        'sha256': d.filename,
+        'created_at': d.created_at.isoformat() if d.created_at else None,
+        'url': url_for('document_download', document_id=d.id),
+        'thumbnail_url': url_for('document_thumb', document_id=d.id) if d.is_image else None,
+    } for d in job.documents])
+
+def send_document_file(path, etag, **kwargs):
+    """send_file with a content-hash ETag, so unchanged files get a 304 and Range requests work"""
+    response = send_file(path, conditional=True, etag=etag, max_age=DOCUMENT_MAX_AGE, **kwargs)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+@app.route('/documents/<int:document_id>')
+@login_required
+def document_download(document_id):
+    document = Document.query.get_or_404(document_id)
+    if not os.path.exists(document.path):
+        abort(404)
+    # Photos and PDFs open in the browser; everything else downloads
+    inline = document.mimetype in THUMBNAIL_TYPES or document.mimetype == 'application/pdf'
+    return send_document_file(document.path, document.filename, mimetype=document.mimetype,
+                              as_attachment=not inline or request.args.get('download') == '1',
+                              download_name=document.original_name)
+
+@app.route('/documents/<int:document_id>/thumb')
+@login_required
+def document_thumb(document_id):
+    document = Document.query.get_or_404(document_id)
+    if not document.is_image or not os.path.exists(document.path):
+        abort(404)
+    thumb_path = document_thumbnail(document)
+    if not thumb_path:
+        abort(404)
+    return send_document_file(thumb_path, f'{document.filename}-{THUMBNAIL_SIZE}', mimetype='image/jpeg')
+
+@app.route('/documents/<int:document_id>/delete', methods=['POST'])
+@login_required
+def document_delete(document_id):
+    document = Document.query.get_or_404(document_id)
+    job_id, digest, name = document.job_id, document.filename, document.original_name
+    db.session.delete(document)
+    db.session.commit()
+    remove_unused_blobs([digest])
+    flash(f'{name} removed', 'success')
+    return redirect(url_for('job_detail', job_id=job_id))
+
+# ============== QUOTE ROUTES ==============
+
+@app.route('/jobs/<int:job_id>/quote.<fmt>')
+@login_required
+def job_quote(job_id, fmt):
+    """Printable quote/invoice; unchanged jobs are served straight from the cache (or a 304)"""
+    if fmt not in ('html', 'pdf'):
+        abort(404)
+    job = quote_jobs_query().filter(Job.id == job_id).first() or archived_job_or_404(job_id)
+    [(html_path, pdf_path, digest)] = quote_documents([job])
+    response = send_file(pdf_path if fmt == 'pdf' else html_path, conditional=True, etag=digest, max_age=0,
+                         as_attachment=request.args.get('download') == '1',
+                         download_name=f'{secure_filename(job.quote_number or str(job.id))}.{fmt}')
+    # Revalidate every time - the ETag changes whenever the job does
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/jobs/quotes.zip')
+@login_required
+def jobs_quotes_export():
+    """PDFs for the current /jobs filter, rendered in a process pool where not already cached"""
+    filters = get_job_filters()
+    query = quote_jobs_query()
+    if filters['search']:
+        query = query.join(Customer)
+    jobs = query.filter(*job_filter_criteria(filters)) \
+        .order_by(Job.date.desc(), Job.id.desc()).limit(QUOTE_BATCH_LIMIT + 1).all()
+    if len(jobs) > QUOTE_BATCH_LIMIT:
+        flash(f'More than {QUOTE_BATCH_LIMIT} jobs match - narrow the filter to download quotes.', 'error')
+        return redirect(url_for('jobs', **request.args))
+    
+    output = tempfile.TemporaryFile()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:  # PDFs are already compressed
+        for job, (_, pdf_path, _) in zip(jobs, quote_documents(jobs)):
+            archive.write(pdf_path, f'{secure_filename(job.quote_number or str(job.id))}.pdf')
+    output.seek(0)
+    return send_file(output, as_attachment=True, mimetype='application/zip',
+                     download_name=f"quoteforge_quotes_{date.today().strftime('%Y%m%d')}.zip")
+
+@app.cli.command('render-quotes')
+@click.option('--fy', default='', help='Financial year (start year), e.g. 2025')
+@click.option('--status', default='', help='Only jobs with this status')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+@click.option('--tenant', default=None, help='Workshop to render for (multi-workshop mode)')
+def render_quotes_command(fy, status, workers, tenant):
+    """Pre-render quote documents for every matching job into the quote cache"""
+    if tenant and tenant not in load_tenants():
+        raise click.BadParameter(f'unknown tenant {tenant}', param_hint='--tenant')
+    g.tenant = tenant
+    filters = {'status': status, 'search': '', 'fy': fy, 'month': '', 'quarter': '', 'archive': False}
+    ids = [job_id for (job_id,) in db.session.query(Job.id).filter(*job_filter_criteria(filters)).order_by(Job.id)]
+    started = time.perf_counter()
+    for i in range(0, len(ids), EXPORT_BATCH_SIZE):
+        batch = quote_jobs_query().filter(Job.id.in_(ids[i:i + EXPORT_BATCH_SIZE])).all()
+        quote_documents(batch, workers=workers)
+        db.session.expunge_all()
+    print(f"✓ {len(ids)} quote documents up to date in {time.perf_counter() - started:.1f}s")
+
 # ============== CUSTOMERS ROUTES ==============
 
+CUSTOMER_SORTS = {
+    'name': 'Name',
+    'revenue': 'Lifetime value',
+    'last_job': 'Last job',
+    'jobs': 'Most jobs',
+}
+CUSTOMER_HISTORY_PER_PAGE = 25
+
+def customer_list_query(search='', sort='name'):
+    """CustomerRow query filtered by search and ordered by a CUSTOMER_SORTS key"""
+    query = customer_row_query()
+    if search:
+        # Search across key fields, with phone normalization
+        query = query.filter(customer_search_criteria(search))
+    
+    order = {
+        'revenue': [CustomerStats.revenue.desc()],
+        'last_job': [CustomerStats.last_job_date.desc().nulls_last()],
+        'jobs': [CustomerStats.job_count.desc()],
+    }.get(sort, [])
+    return query.order_by(*order, Customer.name, Customer.id)
+
 @app.route('/customers')
 @login_required
 def customers():
     # Sanitize search input
     search = sanitize_input(request.args.get('search', ''), max_length=200)
-    query = Customer.query
+    sort = request.args.get('sort', 'name')
+    if sort not in CUSTOMER_SORTS:
+        sort = 'name'
     
-    if search:
-        search = search.strip()
-        if search:
-            # Normalize search for phone matching (remove spaces)
-            search_normalized = search.replace(' ', '').replace('-', '')
-            
-            # Search across key fields, with phone normalization
-            query = query.filter(
-                db.or_(
-                    Customer.name.ilike(f'%{search}%'),
-                    Customer.phone.ilike(f'%{search}%'),
-                    # Also match phone with spaces removed
-                    func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{search_normalized}%'),
-                    Customer.email.ilike(f'%{search}%'),
-                    Customer.address.ilike(f'%{search}%'),
-                )
-            )
+    if not search:
+        # The whole customer base - streamed rather than built up in memory
+        return stream_page('customers.html', customers=stream_rows(customer_list_query(sort=sort), CustomerRow),
+                           search=search, fuzzy=False, sort=sort, sorts=CUSTOMER_SORTS)
+    
+    customers_list = customer_rows(customer_list_query(search, sort))
+    
+    # Nothing matched exactly - offer close spellings instead ("Jonhson" -> "Johnson")
+    fuzzy = False
+    if not customers_list:
+        customers_list = [customer for customer, score in fuzzy_customer_search(search, limit=50)]
+        fuzzy = bool(customers_list)
+    return render_template('customers.html', customers=customers_list, search=search, fuzzy=fuzzy,
+                           sort=sort, sorts=CUSTOMER_SORTS)
+
+@app.route('/customers/duplicates')
+@login_required
+def customer_duplicates():
+    """Likely duplicate customers, best matches first"""
+    min_score = request.args.get('min_score', DEDUPE_MIN_SCORE, type=float)
+    started = time.perf_counter()
+    pairs = find_duplicate_customers(min_score)[:500]
+    elapsed_ms = (time.perf_counter() - started) * 1000
     
-    customers_list = query.order_by(Customer.name).all()
-    return render_template('customers.html', customers=customers_list, search=search)
+    ids = list({record.id for _, a, b in pairs for record in (a, b)})
+    job_counts = {}
+    for i in range(0, len(ids), 500):
+        job_counts.update(db.session.query(Job.customer_id, db.func.count(Job.id))
+                          .filter(Job.customer_id.in_(ids[i:i + 500])).group_by(Job.customer_id))
+    return render_template('customer_duplicates.html', pairs=pairs, job_counts=job_counts,
+                           min_score=min_score, elapsed_ms=elapsed_ms)
+
+@app.route('/customers/merge', methods=['POST'])
+@login_required
+def customer_merge():
+    keep = Customer.query.get_or_404(request.form.get('keep_id', type=int))
+    merge = Customer.query.get_or_404(request.form.get('merge_id', type=int))
+    if keep.id == merge.id:
+        flash('Cannot merge a customer into itself', 'error')
+        return redirect(url_for('customer_duplicates'))
+    
+    merge_name = merge.name
+    moved = merge_customers(keep, merge)
+    flash(f'Merged "{merge_name}" into "{keep.name}" ({moved} job{"s" if moved != 1 else ""} moved)', 'success')
+    return redirect(url_for('customer_duplicates'))
 
 @app.route('/customers/<int:customer_id>')
 @login_required
 def customer_detail(customer_id):
     customer = Customer.query.get_or_404(customer_id)
-    total_spent = sum(j.price for j in customer.jobs if j.status in ['completed', 'deposit_paid', 'in_progress'])
-    return render_template('customer_detail.html', customer=customer, total_spent=total_spent)
+    stats = customer.stats or CustomerStats(job_count=0, revenue=0, cogs=0, outstanding=0)
+    include_archive = request.args.get('archive') == '1'
+    job, material = job_sources(include_archive)
+    jobs_page = (job_row_query(job, material).filter(job.customer_id == customer.id)
+                 .order_by(job.date.desc(), job.id.desc())
+                 .paginate(page=request.args.get('page', 1, type=int), per_page=CUSTOMER_HISTORY_PER_PAGE,
+                           error_out=False))
+    jobs_page.items = job_rows(jobs_page.items)
+    return render_template('customer_detail.html', customer=customer, stats=stats, jobs_page=jobs_page,
+                           include_archive=include_archive, has_archive=archive_exists())
 
 @app.route('/customers/<int:customer_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -885,32 +3318,20 @@ def api_customer_search():
     if len(q) < 1:
         return jsonify([])
 
-    # Normalize for phone matching (remove spaces/dashes)
-    q_normalized = q.replace(' ', '').replace('-', '')
-    
-    # Search for autocomplete with phone normalization
-    customers = (
-        Customer.query.filter(
-            db.or_(
-                Customer.name.ilike(f'%{q}%'),
-                Customer.phone.ilike(f'%{q}%'),
-                # Also match phone with spaces/dashes removed
-                func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{q_normalized}%'),
-                Customer.email.ilike(f'%{q}%'),
-            )
-        )
-        .order_by(Customer.name)
-        .limit(15)
-        .all()
-    )
+    # Autocomplete is answered from the in-memory prefix index; the chosen
+    # customer is only loaded from the database when the job is saved
+    customers = customer_index.search(q, limit=15)
+    if not customers and len(q) >= 3 and not PHONE_QUERY_RE.fullmatch(q):
+        # Probably a misspelling - fall back to the trigram index so staff find the existing customer
+        customers = [(c.id, c.name, c.phone, c.email, c.address) for c, score in fuzzy_customer_search(q)]
     
     return jsonify([{
-        'id': c.id,
-        'name': c.name,
-        'phone': c.phone or '',
-        'email': c.email or '',
-        'address': c.address or ''
-    } for c in customers])
+        'id': customer_id,
+        'name': name,
+        'phone': phone or '',
+        'email': email or '',
+        'address': address or ''
+    } for customer_id, name, phone, email, address in customers])
 
 @app.route('/api/customers/search/full')
 @login_required
@@ -918,24 +3339,13 @@ def api_customer_search_full():
     """Full customer search for AJAX - returns all matches with job count"""
     # Sanitize search query
     q = sanitize_input(request.args.get('q', ''), max_length=200)
+    sort = request.args.get('sort', 'name')
     
-    query = Customer.query
-    
-    if q:
-        # Normalize for phone matching
-        q_normalized = q.replace(' ', '').replace('-', '')
-        
-        query = query.filter(
-            db.or_(
-                Customer.name.ilike(f'%{q}%'),
-                Customer.phone.ilike(f'%{q}%'),
-                func.replace(func.replace(Customer.phone, ' ', ''), '-', '').ilike(f'%{q_normalized}%'),
-                Customer.email.ilike(f'%{q}%'),
-                Customer.address.ilike(f'%{q}%'),
-            )
-        )
-    
-    customers = query.order_by(Customer.name).limit(500).all()
+    customers = customer_rows(customer_list_query(q, sort).limit(500))
+    fuzzy = False
+    if q and not customers:
+        customers = [customer for customer, score in fuzzy_customer_search(q, limit=50)]
+        fuzzy = True
     
     return jsonify([{
         'id': c.id,
@@ -943,56 +3353,88 @@ def api_customer_search_full():
         'phone': c.phone or '',
         'email': c.email or '',
         'address': c.address or '',
-        'job_count': len(c.jobs)
+        'job_count': c.job_count,
+        'revenue': c.revenue,
+        'last_job_date': c.last_job_date.isoformat() if c.last_job_date else None,
+        'fuzzy': fuzzy
     } for c in customers])
 
-# ============== REPORTS ROUTES ==============
-
-@app.route('/reports')
+@app.route('/api/customers/search/fuzzy')
 @login_required
-def reports():
-    fy_filter = request.args.get('fy', '')
-    quarter_filter = request.args.get('quarter', '')
-    month_filter = request.args.get('month', '')
+def api_customer_search_fuzzy():
+    """Typo-tolerant customer search ranked by similarity"""
+    q = sanitize_input(request.args.get('q', ''), max_length=200)
+    limit = min(request.args.get('limit', 15, type=int) or 15, 100)
     
-    available_fys = get_available_fys()
-    current_fy = get_financial_year(date.today())
+    return jsonify([{
+        'id': c.id,
+        'name': c.name,
+        'phone': c.phone or '',
+        'email': c.email or '',
+        'address': c.address or '',
+        'score': round(score, 3)
+    } for c, score in fuzzy_customer_search(q, limit=limit)])
+
+@app.route('/api/changes')
+@login_required
+def api_changes():
+    """Incremental sync: records written since ?since=<cursor>, plus the cursor to ask with next"""
+    since = request.args.get('since', '') or '0'
+    limit = max(1, min(request.args.get('limit', CHANGE_FEED_BATCH, type=int) or CHANGE_FEED_BATCH, CHANGE_FEED_BATCH))
+    generation = change_feed_generation()
+    # Cursors are <generation>-<change log id>; 0 asks for a full copy
+    since_generation, _, position = since.rpartition('-')
+    position = int(position) if position.isdigit() else 0
+    head = db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+    # A cursor from another history (before a restore, or an older cursor format) or from the future: start over
+    reset = since != '0' and (since_generation != generation or position > head)
+    cursor, more, changes = changes_since(0 if reset else position, limit)
+    return jsonify({'cursor': f'{generation}-{cursor}', 'more': more, 'reset': reset, 'changes': changes})
+
+@app.route('/api/dashboard/stream')
+@login_required
+def dashboard_stream():
+    """Server-Sent Events: new dashboard figures after every commit that changes them"""
+    tenant = g.get('tenant')
+    stream = dashboard_broadcaster.subscribe(tenant)
+    if stream is None:
+        return jsonify({'error': 'Too many open dashboards'}), 503
     
-    # Default to current FY
-    selected_fy = int(fy_filter) if fy_filter else current_fy
-    fy_start, fy_end = get_fy_dates(selected_fy)
+    def events():
+        try:
+            yield f"retry: {DASHBOARD_RETRY_MS}\n\n"
+            while True:
+                try:
+                    yield stream.get(timeout=DASHBOARD_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            dashboard_broadcaster.unsubscribe(tenant, stream)
     
-    # Build date filter
-    date_start, date_end = fy_start, fy_end
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ============== REPORTS ROUTES ==============
+
+def compute_report_data(selected_fy, date_start, date_end):
+    """Aggregate the reports() figures for a period from raw jobs.
     
-    if quarter_filter:
-        try:
-            q = int(quarter_filter.replace('Q', ''))
-            date_start, date_end = get_quarter_dates(selected_fy, q)
-        except:
-            pass
-    elif month_filter:
-        try:
-            year, month = map(int, month_filter.split('-'))
-            date_start = date(year, month, 1)
-            if month == 12:
-                date_end = date(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                date_end = date(year, month + 1, 1) - timedelta(days=1)
-        except:
-            pass
+    Returns plain JSON-serialisable data so closed periods can be snapshotted.
+    """
+    # Archived jobs only take part when the period reaches back into the archive
+    job, material = job_sources(reaches_archive(date_start))
     
     # Revenue data
-    total_revenue = db.session.query(db.func.sum(Job.price)).filter(
-        Job.date >= date_start,
-        Job.date <= date_end,
-        Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+    total_revenue = db.session.query(db.func.sum(job.price)).filter(
+        job.date >= date_start,
+        job.date <= date_end,
+        job.status.in_(['completed', 'deposit_paid', 'in_progress'])
     ).scalar() or 0
     
-    total_cogs = db.session.query(db.func.sum(Material.cost)).join(Job).filter(
-        Job.date >= date_start,
-        Job.date <= date_end,
-        Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+    total_cogs = db.session.query(db.func.sum(material.cost)).join(job, job.id == material.job_id).filter(
+        job.date >= date_start,
+        job.date <= date_end,
+        job.status.in_(['completed', 'deposit_paid', 'in_progress'])
     ).scalar() or 0
     
     gross_profit = total_revenue - total_cogs
@@ -1008,16 +3450,16 @@ def reports():
         else:
             month_end = date(current.year, current.month + 1, 1) - timedelta(days=1)
         
-        revenue = db.session.query(db.func.sum(Job.price)).filter(
-            Job.date >= month_start,
-            Job.date <= month_end,
-            Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+        revenue = db.session.query(db.func.sum(job.price)).filter(
+            job.date >= month_start,
+            job.date <= month_end,
+            job.status.in_(['completed', 'deposit_paid', 'in_progress'])
         ).scalar() or 0
         
-        cogs = db.session.query(db.func.sum(Material.cost)).join(Job).filter(
-            Job.date >= month_start,
-            Job.date <= month_end,
-            Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+        cogs = db.session.query(db.func.sum(material.cost)).join(job, job.id == material.job_id).filter(
+            job.date >= month_start,
+            job.date <= month_end,
+            job.status.in_(['completed', 'deposit_paid', 'in_progress'])
         ).scalar() or 0
         
         # Format month in Australian style (DD MMM YYYY)
@@ -1039,10 +3481,10 @@ def reports():
     quarterly_data = []
     for q in range(1, 5):
         q_start, q_end = get_quarter_dates(selected_fy, q)
-        revenue = db.session.query(db.func.sum(Job.price)).filter(
-            Job.date >= q_start,
-            Job.date <= q_end,
-            Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+        revenue = db.session.query(db.func.sum(job.price)).filter(
+            job.date >= q_start,
+            job.date <= q_end,
+            job.status.in_(['completed', 'deposit_paid', 'in_progress'])
         ).scalar() or 0
         
         # Format quarter period in Australian style
@@ -1055,48 +3497,98 @@ def reports():
     
     # Revenue by status
     revenue_by_status = db.session.query(
-        Job.status,
-        db.func.sum(Job.price).label('revenue')
+        job.status,
+        db.func.sum(job.price).label('revenue')
     ).filter(
-        Job.date >= date_start,
-        Job.date <= date_end
-    ).group_by(Job.status).all()
+        job.date >= date_start,
+        job.date <= date_end
+    ).group_by(job.status).all()
     
-    # Top customers
+    # Top customers (ids only - names are looked up when rendering)
     top_customers = db.session.query(
-        Customer,
-        db.func.sum(Job.price).label('total')
-    ).join(Job).filter(
-        Job.date >= date_start,
-        Job.date <= date_end,
-        Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+        Customer.id,
+        db.func.sum(job.price).label('total')
+    ).join(job, job.customer_id == Customer.id).filter(
+        job.date >= date_start,
+        job.date <= date_end,
+        job.status.in_(['completed', 'deposit_paid', 'in_progress'])
     ).group_by(Customer.id).order_by(db.desc('total')).limit(10).all()
     
+    return {
+        'total_revenue': total_revenue,
+        'total_cogs': total_cogs,
+        'gross_profit': gross_profit,
+        'total_gst': total_gst,
+        'monthly_data': monthly_data,
+        'quarterly_data': quarterly_data,
+        'revenue_by_status': [[status, revenue] for status, revenue in revenue_by_status],
+        'top_customers': [[customer_id, total] for customer_id, total in top_customers],
+    }
+
+def get_report_data(selected_fy, date_start, date_end):
+    """Report figures for a period, served from a snapshot when the period is closed"""
+    if not is_closed_period(selected_fy, date_end):
+        return compute_report_data(selected_fy, date_start, date_end)
+    
+    period_key = report_period_key(selected_fy, date_start, date_end)
+    snapshot = ReportSnapshot.query.filter_by(period_key=period_key).first()
+    if snapshot:
+        return json.loads(snapshot.payload)
+    if g.get('read_replica'):
+        # Figures read from the replica are never persisted; the scheduler snapshots from the primary
+        return compute_report_data(selected_fy, date_start, date_end)
+    return store_report_snapshot(selected_fy, date_start, date_end)
+
+@app.route('/reports')
+@login_required
+def reports():
+    fy_filter = request.args.get('fy', '')
+    quarter_filter = request.args.get('quarter', '')
+    month_filter = request.args.get('month', '')
+    
+    available_fys = get_available_fys()
+    selected_fy, date_start, date_end = get_report_period(fy_filter, quarter_filter, month_filter)
+    report = get_report_data(selected_fy, date_start, date_end)
+    
+    # Top customers are snapshotted by id; look up current names/phones
+    customer_ids = [customer_id for customer_id, total in report['top_customers']]
+    customers_by_id = {c.id: c for c in Customer.query.filter(Customer.id.in_(customer_ids))} if customer_ids else {}
+    top_customers = [(customers_by_id[customer_id], total) for customer_id, total in report['top_customers']
+                     if customer_id in customers_by_id]
+    # All-time ranking comes straight from the maintained customer stats
+    lifetime_customers = top_customers_lifetime(10)
+    trends = compute_trend_analytics(selected_fy, date_start, date_end)
+    
     # Year-over-year comparison (if multiple years available)
     year_comparison = []
     if len(available_fys) > 1:
         for fy in sorted(available_fys)[-5:]:  # Last 5 years
             fy_s, fy_e = get_fy_dates(fy)
-            fy_revenue = db.session.query(db.func.sum(Job.price)).filter(
-                Job.date >= fy_s,
-                Job.date <= fy_e,
-                Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
-            ).scalar() or 0
+            if is_closed_period(fy, fy_e):
+                fy_revenue = get_report_data(fy, fy_s, fy_e)['total_revenue']
+            else:
+                fy_revenue = db.session.query(db.func.sum(Job.price)).filter(
+                    Job.date >= fy_s,
+                    Job.date <= fy_e,
+                    Job.status.in_(['completed', 'deposit_paid', 'in_progress'])
+                ).scalar() or 0
             year_comparison.append({
                 'year': fy,
                 'revenue': fy_revenue
             })
     
     return render_template('reports.html', 
-                         monthly_data=monthly_data,
-                         quarterly_data=quarterly_data,
+                         monthly_data=report['monthly_data'],
+                         quarterly_data=report['quarterly_data'],
                          top_customers=top_customers,
-                         revenue_by_status=revenue_by_status,
+                         lifetime_customers=lifetime_customers,
+                         trends=trends,
+                         revenue_by_status=report['revenue_by_status'],
                          year_comparison=year_comparison,
-                         total_revenue=total_revenue,
-                         total_cogs=total_cogs,
-                         gross_profit=gross_profit,
-                         total_gst=total_gst,
+                         total_revenue=report['total_revenue'],
+                         total_cogs=report['total_cogs'],
+                         gross_profit=report['gross_profit'],
+                         total_gst=report['total_gst'],
                          available_fys=available_fys,
                          selected_fy=selected_fy,
                          fy_filter=fy_filter,
@@ -1105,6 +3597,156 @@ def reports():
                          date_start=date_start,
                          date_end=date_end)
 
+# ============== EXPORT ROUTES ==============
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+JOB_EXPORT_HEADER = ['Quote #', 'Date', 'Customer', 'Phone', 'Email', 'Description', 'Status',
+                     'Price (ex GST)', 'GST', 'Price (inc GST)', 'Deposit', 'COGS', 'Gross Profit', 'Notes']
+
+CUSTOMER_EXPORT_HEADER = ['ID', 'Name', 'Phone', 'Email', 'Address', 'Jobs', 'Revenue (ex GST)', 'Last Job', 'Created']
+
+def job_export_query(job=Job, material=Material):
+    """Column-only query for job exports (no ORM entities, COGS summed per job in SQL)"""
+    cogs = db.session.query(
+        material.job_id.label('job_id'),
+        db.func.sum(material.cost).label('cogs')
+    ).group_by(material.job_id).subquery()
+    
+    return db.session.query(
+        job.quote_number, job.date, Customer.name, Customer.phone, Customer.email,
+        job.description, job.status, job.price, job.deposit,
+        db.func.coalesce(cogs.c.cogs, 0), job.notes
+    ).join(Customer, job.customer_id == Customer.id).outerjoin(cogs, cogs.c.job_id == job.id)
+
+def job_export_rows(query, for_excel=False):
+    """Yield job export rows, fetching EXPORT_BATCH_SIZE rows per round trip"""
+    for quote_number, job_date, name, phone, email, description, status, price, deposit, cogs, notes \
+            in query.yield_per(EXPORT_BATCH_SIZE):
+        price = price or 0
+        yield [
+            quote_number,
+            job_date if for_excel else ausdate_filter(job_date),
+            name, phone or '', email or '', description or '',
+            STATUS_LABELS.get(status, status),
+            round(price, 2),
+            round(price * GST_RATE, 2),
+            round(price * (1 + GST_RATE), 2),
+            round(deposit or 0, 2),
+            round(cogs, 2),
+            round(price - cogs, 2),
+            notes or '',
+        ]
+
+def with_totals_row(rows):
+    """Pass rows through, then append a TOTAL row summing the money columns"""
+    money_cols = range(7, 13)
+    totals = dict.fromkeys(money_cols, 0)
+    for row in rows:
+        for i in money_cols:
+            totals[i] += row[i]
+        yield row
+    yield ['TOTAL', '', '', '', '', '', ''] + [round(totals[i], 2) for i in money_cols] + ['']
+
+def stream_csv(header, rows):
+    """Generate CSV text in chunks of EXPORT_BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_response(fmt, filename, header, rows, sheet_title):
+    """Send rows as a streamed CSV download or a write-only XLSX workbook"""
+    if fmt == 'csv':
+        response = Response(stream_with_context(stream_csv(header, rows)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}.csv'
+        return response
+    
+    # Write-only mode flushes each row to a temp file instead of building the sheet in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return send_file(output, as_attachment=True, download_name=f'{filename}.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+@app.route('/jobs/export.<fmt>')
+@login_required
+def jobs_export(fmt):
+    """Export the current /jobs filter"""
+    if fmt not in EXPORT_FORMATS:
+        return 'Unsupported export format', 404
+    filters = get_job_filters()
+    job, material = job_sources(filters_include_archive(filters))
+    query = job_export_query(job, material).filter(*job_filter_criteria(filters, job)).order_by(job.date.desc(), job.id.desc())
+    rows = job_export_rows(query, for_excel=(fmt == 'xlsx'))
+    filename = f"quoteforge_jobs_{date.today().strftime('%Y%m%d')}"
+    return export_response(fmt, filename, JOB_EXPORT_HEADER, rows, 'Jobs')
+
+@app.route('/customers/export.<fmt>')
+@login_required
+def customers_export(fmt):
+    """Export the current /customers search"""
+    if fmt not in EXPORT_FORMATS:
+        return 'Unsupported export format', 404
+    search = sanitize_input(request.args.get('search', ''), max_length=200)
+    sort = request.args.get('sort', 'name')
+    
+    query = customer_list_query(search, sort).with_entities(
+        Customer.id, Customer.name, Customer.phone, Customer.email, Customer.address,
+        db.func.coalesce(CustomerStats.job_count, 0), db.func.coalesce(CustomerStats.revenue, 0),
+        CustomerStats.last_job_date, Customer.created_at
+    )
+    
+    def rows():
+        for customer_id, name, phone, email, address, job_count, revenue, last_job_date, created_at in query.yield_per(EXPORT_BATCH_SIZE):
+            for_excel = fmt == 'xlsx'
+            yield [customer_id, name, phone or '', email or '', address or '', job_count, round(revenue, 2),
+                   last_job_date if for_excel else ausdate_filter(last_job_date),
+                   created_at if for_excel else datetime_filter(created_at)]
+    
+    filename = f"quoteforge_customers_{date.today().strftime('%Y%m%d')}"
+    return export_response(fmt, filename, CUSTOMER_EXPORT_HEADER, rows(), 'Customers')
+
+@app.route('/reports/export.<fmt>')
+@login_required
+def reports_export(fmt):
+    """Export the revenue jobs behind a reports() period, with GST and COGS columns and a totals row"""
+    if fmt not in EXPORT_FORMATS:
+        return 'Unsupported export format', 404
+    fy_filter = sanitize_input(request.args.get('fy', ''), max_length=10)
+    quarter_filter = sanitize_input(request.args.get('quarter', ''), max_length=10)
+    month_filter = sanitize_input(request.args.get('month', ''), max_length=10)
+    try:
+        selected_fy, date_start, date_end = get_report_period(fy_filter, quarter_filter, month_filter)
+    except ValueError:
+        return 'Invalid financial year', 400
+    
+    job, material = job_sources(reaches_archive(date_start))
+    query = job_export_query(job, material).filter(
+        job.date >= date_start,
+        job.date <= date_end,
+        job.status.in_(REVENUE_STATUSES)
+    ).order_by(job.date, job.id)
+    rows = with_totals_row(job_export_rows(query, for_excel=(fmt == 'xlsx')))
+    
+    period = fy_label_filter(selected_fy).replace('/', '-')
+    if quarter_filter:
+        period += f'_{quarter_filter}'
+    elif month_filter:
+        period += f'_{month_filter}'
+    return export_response(fmt, f'quoteforge_report_{period}', JOB_EXPORT_HEADER, rows, 'Report')
+
 # ============== BACKUP ROUTES ==============
 
 @app.route('/backup')
@@ -1117,23 +3759,33 @@ def backup_page():
         for f in sorted(os.listdir(backup_dir), reverse=True):
             if f.endswith('.db'):
                 path = os.path.join(backup_dir, f)
+                archived = os.path.exists(path + ARCHIVE_BACKUP_SUFFIX)
                 backups.append({
                     'filename': f,
-                    'size': os.path.getsize(path),
+                    'size': os.path.getsize(path) + (os.path.getsize(path + ARCHIVE_BACKUP_SUFFIX) if archived else 0),
+                    'archived': archived,
                     'date': datetime.fromtimestamp(os.path.getmtime(path))
                 })
     
-    return render_template('backup.html', backups=backups)
+    # A backup or restore just submitted from this page, whose progress the page follows
+    task = task_runner.get(request.args.get('task', ''), g.get('tenant'))
+    return render_template('backup.html', backups=backups, task=task)
+
+@app.route('/api/tasks/<task_id>')
+@login_required
+def api_task(task_id):
+    """Status, progress and result of a background task"""
+    task = task_runner.get(task_id, g.get('tenant'))
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    for field in ('created_at', 'started_at', 'finished_at'):
+        task[field] = task[field].isoformat() if task[field] else None
+    return jsonify(task)
 
 @app.route('/backup/create', methods=['POST'])
 @login_required
 def backup_create():
-    backup_name = create_backup('manual')
-    if backup_name:
-        flash(f'Backup created: {backup_name}', 'success')
-    else:
-        flash('Backup failed!', 'error')
-    return redirect(url_for('backup_page'))
+    return task_accepted(task_runner.submit('backup', backup_task))
 
 @app.route('/backup/download/<filename>')
 @login_required
@@ -1151,10 +3803,18 @@ def backup_download(filename):
         flash('Invalid file path', 'error')
         return redirect(url_for('backup_page'))
     
-    if os.path.exists(filepath):
+    if not os.path.exists(filepath):
+        flash('Backup file not found', 'error')
+        return redirect(url_for('backup_page'))
+    if not os.path.exists(filepath + ARCHIVE_BACKUP_SUFFIX):
         return send_file(filepath, as_attachment=True)
-    flash('Backup file not found', 'error')
-    return redirect(url_for('backup_page'))
+    # Without its archive an off-site copy would lose every archived FY, so the pair goes as one zip
+    bundle = tempfile.TemporaryFile()
+    with zipfile.ZipFile(bundle, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.write(filepath, filename)
+        zf.write(filepath + ARCHIVE_BACKUP_SUFFIX, filename + ARCHIVE_BACKUP_SUFFIX)
+    bundle.seek(0)
+    return send_file(bundle, as_attachment=True, download_name=filename + '.zip', mimetype='application/zip')
 
 @app.route('/backup/restore/<filename>', methods=['POST'])
 @login_required
@@ -1172,19 +3832,11 @@ def backup_restore(filename):
         flash('Invalid file path', 'error')
         return redirect(url_for('backup_page'))
     
-    db_path = os.path.join(os.path.dirname(__file__), 'instance', 'quoteforge.db')
-    
     if not os.path.exists(backup_path):
         flash('Backup file not found', 'error')
         return redirect(url_for('backup_page'))
     
-    safety_backup = create_backup('pre_restore_safety')
-    db.session.remove()
-    db.engine.dispose()
-    shutil.copy2(backup_path, db_path)
-    
-    flash(f'Database restored from {filename}. Safety backup: {safety_backup}', 'success')
-    return redirect(url_for('backup_page'))
+    return task_accepted(task_runner.submit('restore', restore_task, filename))
 
 @app.route('/backup/delete/<filename>', methods=['POST'])
 @login_required
@@ -1204,13 +3856,168 @@ def backup_delete(filename):
     
     if os.path.exists(filepath):
         os.remove(filepath)
+        if os.path.exists(filepath + ARCHIVE_BACKUP_SUFFIX):
+            os.remove(filepath + ARCHIVE_BACKUP_SUFFIX)
         flash(f'Backup {filename} deleted', 'success')
     else:
         flash('Backup file not found', 'error')
     return redirect(url_for('backup_page'))
 
+# ============== REQUEST INSTRUMENTATION ==============
+
+slow_query_logger = logging.getLogger('quoteforge.slow_query')
+
+def get_slow_query_logger():
+    """File logger for slow statements, attached on first use"""
+    if not slow_query_logger.handlers:
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+    return slow_query_logger
+
+def log_slow_query(cursor, statement, parameters, elapsed_ms, executemany):
+    """Write a slow statement, its bound parameters and EXPLAIN QUERY PLAN output to the slow-query log"""
+    plan = []
+    if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        try:
+            # Separate DBAPI cursor, so it neither re-enters these hooks nor disturbs the pending result
+            rows = cursor.connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ()).fetchall()
+            plan = [row[-1] for row in rows]
+        except Exception as e:
+            plan = [f'(plan unavailable: {e})']
+    
+    where = f'{request.method} {request.path}' if has_request_context() else 'background'
+    lines = [f'{elapsed_ms:.1f}ms [{where}]', f'  SQL: {" ".join(statement.split())}', f'  PARAMS: {parameters!r}']
+    lines += [f'  PLAN: {detail}' for detail in plan]
+    get_slow_query_logger().info('\n'.join(lines))
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'sql_count' in g:
+        # Per-request totals; metrics are recorded once per request in record_request_metrics()
+        g.sql_count += 1
+        g.sql_time += elapsed
+    elif app.config['METRICS_ENABLED']:
+        metric_inc('quoteforge_db_statements_total', (('endpoint', 'background'),))
+        metric_inc('quoteforge_db_statement_seconds_total', (('endpoint', 'background'),), elapsed)
+    slow_ms = app.config['SLOW_QUERY_MS']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        log_slow_query(cursor, statement, parameters, elapsed * 1000, executemany)
+
+def template_render_started(sender, template, context, **extra):
+    if 'sql_count' in g:
+        g.render_start = (time.perf_counter(), g.sql_time)
+
+def template_render_finished(sender, template, context, **extra):
+    if 'render_start' in g:
+        started, sql_before = g.pop('render_start')
+        # Lazy loads fired from templates are counted as db time, not render time
+        g.render_time += (time.perf_counter() - started) - (g.sql_time - sql_before)
+
+# Hooks are only installed when enabled, so disabled environments pay nothing
+if app.config['SQL_TIMING_ENABLED'] or app.config['SLOW_QUERY_MS'] or app.config['METRICS_ENABLED']:
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+if app.config['SQL_TIMING_ENABLED']:
+    before_render_template.connect(template_render_started, app)
+    template_rendered.connect(template_render_finished, app)
+
+@app.before_request
+def start_request_timing():
+    if app.config['SQL_TIMING_ENABLED'] or app.config['METRICS_ENABLED']:
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.render_time = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    """Record latency, response size and SQL totals for the request"""
+    if app.config['METRICS_ENABLED'] and 'request_start' in g:
+        # Endpoint names (not paths) keep label cardinality bounded
+        endpoint = request.endpoint or 'unmatched'
+        labels = (('endpoint', endpoint),)
+        metric_inc('quoteforge_http_requests_total',
+                   labels + (('method', request.method), ('status', str(response.status_code))))
+        metric_observe('quoteforge_http_request_duration_seconds', time.perf_counter() - g.request_start, labels)
+        if response.content_length is not None:
+            metric_observe('quoteforge_http_response_size_bytes', response.content_length, labels)
+        metric_inc('quoteforge_db_statements_total', labels, g.sql_count)
+        metric_inc('quoteforge_db_statement_seconds_total', labels, g.sql_time)
+    return response
+
+@app.errorhandler(OperationalError)
+def database_locked(error):
+    """A write lock held past the busy timeout (backup, import) is transient - 503 so clients retry"""
+    if 'database is locked' not in str(error.orig):
+        raise error
+    db.session.rollback()
+    metric_inc('quoteforge_database_locked_total', (('endpoint', request.endpoint or 'unmatched'),))
+    print(f"[WARN] Database locked: {request.method} {request.path}")
+    response = jsonify({'error': 'Database busy, try again'}) if request.accept_mimetypes.best == 'application/json' \
+        else Response('Database busy, try again in a moment.', mimetype='text/plain')
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def collect_scrape_gauges():
+    """Gauges that are cheap to read at scrape time but not worth tracking per request"""
+    gauges = {('quoteforge_login_lockout_duration_seconds', ()): LOCKOUT_DURATION.total_seconds()}
+    
+    if load_tenants():
+        # Only shops with an open engine - a scrape should not open (and LRU-evict) every database
+        gauges[('quoteforge_tenants_open', ())] = len(tenant_engines.engines)
+        return gauges
+    
+    pool = db.engine.pool
+    for state in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, state):
+            gauges[('quoteforge_db_pool_connections', (('state', state),))] = getattr(pool, state)()
+    
+    gauges[('quoteforge_login_locked_ips', ())] = LoginAttempt.query.filter(
+        LoginAttempt.locked_until > datetime.now(timezone.utc)
+    ).count()
+    return gauges
+
+def is_local_scrape():
+    """Direct loopback connection (tunnel traffic also arrives from localhost, but with forwarding headers)"""
+    try:
+        loopback = ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+    return loopback and not request.headers.get('X-Forwarded-For') and not request.headers.get('CF-Connecting-IP')
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint - open to local scrapers, login required otherwise"""
+    if not app.config['METRICS_ENABLED']:
+        return 'Metrics disabled', 404
+    if not is_local_scrape() and not session.get('logged_in'):
+        return redirect(url_for('login', next=request.url))
+    return Response(render_metrics(collect_scrape_gauges()), mimetype='text/plain; version=0.0.4')
+
 # ============== SECURITY MIDDLEWARE ==============
 
+@app.after_request
+def set_server_timing(response):
+    """Break the request time down into db / render / app (ORM hydration and Python) / total"""
+    if app.config['SQL_TIMING_ENABLED'] and 'request_start' in g:
+        total = (time.perf_counter() - g.request_start) * 1000
+        db_ms = g.sql_time * 1000
+        render_ms = g.render_time * 1000
+        app_ms = max(total - db_ms - render_ms, 0)
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{g.sql_count} queries", '
+            f'render;dur={render_ms:.1f}, app;dur={app_ms:.1f}, total;dur={total:.1f}'
+        )
+    return response
+
 @app.after_request
 def set_security_headers(response):
     """Add security headers to all responses"""
@@ -1222,34 +4029,72 @@ def set_security_headers(response):
     response.headers.pop('Server', None)
     return response
 
+@monitored_job('login_cleanup')
 def cleanup_old_login_attempts():
     """Clean up login attempts older than 24 hours"""
     cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
-    LoginAttempt.query.filter(LoginAttempt.last_attempt < cutoff).delete()
+    deleted = LoginAttempt.query.filter(LoginAttempt.last_attempt < cutoff).delete()
     db.session.commit()
+    metric_inc('quoteforge_login_attempts_cleaned_total', amount=deleted)
 
 # ============== MAIN ==============
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # Setup indexes and FTS for fast fuzzy search
-        try:
-            setup_indexes_and_fts()
-        except Exception as e:
-            # Do not crash app if FTS is not available; log to console instead
-            print(f"[WARN] Failed to setup indexes/FTS: {e}")
-        
-        # Clean up old login attempts on startup
-        try:
-            cleanup_old_login_attempts()
-        except Exception as e:
-            print(f"[WARN] Failed to cleanup login attempts: {e}")
+    # Every workshop's database (or the single-shop one) is prepared the same way
+    for slug in tenant_slugs():
+        with tenant_context(slug):
+            if slug is None:
+                db.create_all()
+                # Setup indexes and FTS for fast fuzzy search
+                try:
+                    setup_indexes_and_fts()
+                except Exception as e:
+                    # Do not crash app if FTS is not available; log to console instead
+                    print(f"[WARN] Failed to setup indexes/FTS: {e}")
+            else:
+                current_engine()  # Tenant engines create their schema and indexes on first open
+            
+            # Build the customer autocomplete index up front so the first keystroke is fast
+            customer_index.build()
+            
+            # Trigram index and customer stats (rebuilt if customers were imported outside the app)
+            try:
+                rebuild_customer_trigrams()
+            except Exception as e:
+                print(f"[WARN] Failed to build customer trigram index: {e}")
+            try:
+                rebuild_customer_stats()
+            except Exception as e:
+                print(f"[WARN] Failed to build customer stats: {e}")
+            try:
+                backfill_change_log()
+            except Exception as e:
+                print(f"[WARN] Failed to backfill change log: {e}")
+    
+    # Tasks left queued or running by the last process will never finish
+    task_runner.recover()
+    
+    # Clean up old login attempts on startup (runs per tenant)
+    try:
+        cleanup_old_login_attempts()
+    except Exception as e:
+        print(f"[WARN] Failed to cleanup login attempts: {e}")
     
     scheduler = BackgroundScheduler()
     scheduler.add_job(func=scheduled_backup, trigger='cron', hour=2, minute=0)
     # Clean up old login attempts every hour
     scheduler.add_job(func=cleanup_old_login_attempts, trigger='cron', hour='*', minute=0)
+    # Rebuild invalidated closed-FY report snapshots (and warm them on startup)
+    scheduler.add_job(func=rebuild_report_snapshots, trigger='interval', minutes=15, next_run_time=datetime.now())
+    # Drop superseded change log entries
+    scheduler.add_job(func=compact_change_log, trigger='cron', hour='*', minute=30)
+    # Statistics, space reclaim and checkpoint in the quiet hours (after the 2am backup)
+    scheduler.add_job(func=run_db_maintenance, trigger='cron', hour=app.config['MAINTENANCE_HOUR'], minute=15,
+                      max_instances=1, coalesce=True)
+    if app.config['REPLICA_ENABLED']:
+        # Three refreshes per staleness window, so one slow or failed copy doesn't breach it
+        scheduler.add_job(func=refresh_replica, trigger='interval', seconds=app.config['REPLICA_MAX_LAG'] / 3,
+                          next_run_time=datetime.now(), max_instances=1, coalesce=True)
     scheduler.start()
     
-    app.run(host='0.0.0.0', port=8001, debug=False)
+    app.run(host='0.0.0.0', port=app.config['PORT'], debug=False)
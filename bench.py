@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for QuoteForge hot routes.
+
+Generates a deterministic synthetic database (customers with realistic AU
+phone formats, jobs across many financial years, materials per job), then
+drives the Flask test client through each hot route and records latency
+percentiles, SQL statement counts and peak Python memory.
+
+Usage:
+    python3 bench.py --scale 10                     # run against 10x today's data
+    python3 bench.py --scale 10 --save-baseline     # record bench_data/baseline_10x.json
+    python3 bench.py --scale 10 --compare           # fail (exit 1) on regressions
+    python3 bench.py --scale 10 --analytics         # per-month SQL vs NumPy analytics
+    python3 bench.py --plans                        # EXPLAIN QUERY PLAN every route's SQL, suggest indexes
+    python3 bench.py --plans --compare              # fail (exit 1) when a route picks up a new scan
+                                                    # (no baseline: when a hot route scans job/material)
+    python3 bench.py --parsing                      # parsing.py property corpus and rows/second
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Roughly today's production volume; --scale multiplies these
+BASE_CUSTOMERS = 2500
+BASE_JOBS = 3100
+
+FIRST_NAMES = ['David', 'Janet', 'Neil', 'Hazel', 'Alison', 'Brad', 'Kieth', 'Lachlin', 'Sarah', 'Michael',
+               'Jenny', 'Peter', 'Karen', 'Steve', 'Michelle', 'Graham', 'Lisa', 'Robert', 'Tracey', 'Wayne',
+               'Kylie', 'Darren', 'Leanne', 'Craig', 'Natalie', 'Shane', 'Debbie', 'Glenn', 'Bronwyn', 'Trent']
+SURNAMES = ['Smith', 'Jones', 'Williams', 'Brown', 'Wilson', 'Taylor', 'Johnson', 'White', 'Martin', 'Anderson',
+            'Thompson', 'Nguyen', 'Thomas', 'Walker', 'Harris', 'Lee', 'Ryan', 'Robinson', 'Kelly', 'King',
+            'McDonald', 'Macdonald', 'Doland', 'Jarvis', "O'Brien", 'Campbell', 'Mitchell', 'Young', 'Clarke', 'Hall']
+SUBURBS = ['Budgewoi', 'Toukley', 'Gorokan', 'Wyong', 'The Entrance', 'Bateau Bay', 'Lake Haven', 'San Remo',
+           'Noraville', 'Norah Head', 'Charmhaven', 'Kanwal', 'Tuggerah', 'Gosford', 'Erina']
+STREETS = ['Main Rd', 'Pacific Hwy', 'Scenic Dr', 'Lakeside Pde', 'Wallarah Rd', 'Budgewoi Rd', 'Elizabeth Bay Dr']
+ITEMS = ['3 piece lounge', 'Recover boat seats', 'Recover wing chair', 'reco recliner arm and seat', 'reco bike seat',
+         'Dining chairs x6', 'Caravan cushions', 'Car seat repair', 'Ottoman', 'Bedhead', 'new zipper in jacket',
+         'Outdoor cushions', 'Church pews', 'Bar stools x4', 'Landrover seats', 'Boat clears', 'Chaise lounge']
+MATERIAL_CATEGORIES = ['Labour', 'Materials', 'Freight', 'Equipment', 'Other']
+MATERIALS = ['Vinyl 3m', 'Fabric 5m', 'Foam 50mm', 'Dacron', 'Webbing', 'Staples', 'Zips', 'Thread', 'Courier']
+
+
+def au_phone(rng):
+    """A phone number in one of the formats seen in the real customer table"""
+    mobile = '04' + ''.join(rng.choice('0123456789') for _ in range(8))
+    landline = ''.join(rng.choice('0123456789') for _ in range(8))
+    fmt = rng.random()
+    if fmt < 0.35:
+        return f'{mobile[:4]} {mobile[4:]}'              # 0412 314081
+    if fmt < 0.55:
+        return mobile                                     # 0412314081
+    if fmt < 0.70:
+        return f'{mobile[:4]} {mobile[4:7]} {mobile[7:]}'  # 0412 314 081
+    if fmt < 0.80:
+        return f'+61 {mobile[1:4]} {mobile[4:7]} {mobile[7:]}'  # +61 412 314 081
+    if fmt < 0.90:
+        return f'{landline[:4]} {landline[4:]}'          # 4399 1630
+    if fmt < 0.97:
+        return f'(02) {landline[:4]} {landline[4:]}'     # (02) 4399 1630
+    return mobile[1:]                                     # 412314081 (leading zero lost in Excel)
+
+
+def au_name(rng):
+    style = rng.random()
+    first, last = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+    if style < 0.45:
+        return f'{last}, {first}'
+    if style < 0.85:
+        return f'{first} {last}'
+    if style < 0.97:
+        return first.lower() if rng.random() < 0.5 else first
+    return f'Unknown {rng.randint(2014, 2022)}'
+
+
+def generate_dataset(db_path, scale, seed, years):
+    """Create a synthetic QuoteForge database at db_path"""
+    from app import (app, db, Customer, Job, Material, setup_indexes_and_fts, get_financial_year, get_fy_dates,
+                     rebuild_customer_trigrams, rebuild_customer_stats)
+
+    rng = random.Random(seed)
+    n_customers = int(BASE_CUSTOMERS * scale)
+    n_jobs = int(BASE_JOBS * scale)
+
+    # Spread jobs over the last `years` FYs up to today, so the current FY is populated
+    current_fy = get_financial_year(date.today())
+    first_day = get_fy_dates(current_fy - years + 1)[0]
+    span_days = (date.today() - first_day).days
+    created = datetime(2025, 12, 9, 10, 0, 0)
+
+    with app.app_context():
+        db.create_all()
+        setup_indexes_and_fts()
+
+        customers = []
+        for i in range(1, n_customers + 1):
+            has_address = rng.random() < 0.4
+            name = au_name(rng)
+            customers.append({
+                'id': i,
+                'name': name,
+                'phone': au_phone(rng) if rng.random() < 0.9 else None,
+                'email': (f"{name.split()[-1].strip(',').lower()}{rng.randint(1, 99)}@example.com"
+                          if rng.random() < 0.25 else None),
+                'address': (f'{rng.randint(1, 250)} {rng.choice(STREETS)}, {rng.choice(SUBURBS)} NSW 226{rng.randint(0, 9)}'
+                            if has_address else None),
+                'created_at': created,
+            })
+        db.session.execute(Customer.__table__.insert(), customers)
+
+        jobs, materials = [], []
+        for i in range(1, n_jobs + 1):
+            # Later years are busier, as in the real data
+            offset = int(span_days * (rng.random() ** 0.7))
+            job_date = first_day + timedelta(days=min(offset, span_days))
+            age = (date.today() - job_date).days
+            if age > 120:
+                status = 'completed' if rng.random() < 0.93 else 'cancelled'
+            else:
+                status = rng.choice(['quoted', 'deposit_paid', 'in_progress', 'completed', 'completed'])
+            price = round(rng.choice([50, 120, 250, 440, 700, 1200, 2596]) * rng.uniform(0.6, 1.6), 2)
+            jobs.append({
+                'id': i,
+                'customer_id': rng.randint(1, n_customers),
+                'quote_number': f'Q{i:05d}',
+                'description': rng.choice(ITEMS),
+                'price': price,
+                'deposit': round(price * 0.3, 2) if status in ('deposit_paid', 'in_progress') else 0,
+                'status': status,
+                'notes': 'Customer to supply fabric' if rng.random() < 0.1 else None,
+                'date': job_date,
+                'created_at': created,
+            })
+            for _ in range(rng.choice([0, 0, 1, 2, 3, 4])):
+                materials.append({
+                    'job_id': i,
+                    'category': rng.choice(MATERIAL_CATEGORIES),
+                    'description': rng.choice(MATERIALS),
+                    'cost': round(price * rng.uniform(0.02, 0.2), 2),
+                    'created_at': created,
+                })
+            if len(jobs) >= 5000:
+                db.session.execute(Job.__table__.insert(), jobs)
+                db.session.execute(Material.__table__.insert(), materials)
+                jobs, materials = [], []
+        if jobs:
+            db.session.execute(Job.__table__.insert(), jobs)
+        if materials:
+            db.session.execute(Material.__table__.insert(), materials)
+        db.session.commit()
+        # Derived tables, as the app builds them at startup
+        rebuild_customer_trigrams()
+        rebuild_customer_stats()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    print(f"✓ Generated {n_customers} customers and {n_jobs} jobs ({years} FYs) at {db_path}")
+
+
+def bench_routes(fys):
+    """(name, url) pairs for the hot routes"""
+    current_fy, closed_fy = fys[0], fys[min(3, len(fys) - 1)]
+    return [
+        ('dashboard', '/'),
+        ('lcars_dashboard', '/index/lcars'),
+        ('jobs', '/jobs'),
+        ('jobs_search', '/jobs?search=smith'),
+        ('jobs_phone_search', '/jobs?search=0412'),
+        ('jobs_fy', f'/jobs?fy={current_fy}'),
+        ('jobs_status_fy', f'/jobs?status=completed&fy={closed_fy}'),
+        ('customers', '/customers'),
+        ('customers_search', '/customers?search=jones'),
+        ('customers_by_revenue', '/customers?sort=revenue'),
+        ('customer_detail', '/customers/1'),
+        ('api_customer_search', '/api/customers/search?q=ma'),
+        ('api_customer_search_phone', '/api/customers/search?q=0412 3'),
+        ('api_customer_search_full', '/api/customers/search/full?q=wil'),
+        ('reports_current_fy', '/reports'),
+        ('reports_closed_fy', f'/reports?fy={closed_fy}'),
+        ('reports_closed_quarter', f'/reports?fy={closed_fy}&quarter=Q2'),
+    ]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def logged_in_client():
+    """(test client, available FYs, engine) for driving the routes"""
+    from app import app, db, get_available_fys
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        fys = get_available_fys()
+        engine = db.engine
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+    return client, fys, engine
+
+
+def run_benchmarks(repeat, only=None):
+    """Drive the test client through each route; returns {name: metrics}"""
+    from sqlalchemy import event
+
+    statements = []
+    client, fys, engine = logged_in_client()
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+
+    results = {}
+    for name, url in bench_routes(fys):
+        if only and name not in only:
+            continue
+        # Warm-up request (template compilation, snapshot/caches fill)
+        response = client.get(url)
+        if response.status_code != 200:
+            print(f"  ! {name}: HTTP {response.status_code}")
+            continue
+
+        timings, queries = [], []
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(statements))
+
+        # Separate pass for memory: tracemalloc slows allocation-heavy code down
+        tracemalloc.start()
+        client.get(url).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'url': url,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+            'bytes': len(response.get_data()),
+        }
+        r = results[name]
+        print(f"  {name:<28} p50 {r['p50_ms']:>8.1f}ms  p95 {r['p95_ms']:>8.1f}ms  p99 {r['p99_ms']:>8.1f}ms  "
+              f"{r['queries']:>4} queries  {r['peak_kb']:>9.1f} KB peak")
+
+    event.remove(engine, 'before_cursor_execute', count_statement)
+    return results
+
+
+def bench_analytics(repeat):
+    """Monthly revenue/COGS for every FY: per-month SQL aggregates (as reports() does) vs analytics.py"""
+    import analytics
+    from app import app, db, Job, Material, REVENUE_STATUSES, get_available_fys, get_fy_dates, get_month_dates, \
+        job_analytics, compute_trend_analytics
+
+    def sql_series(fys):
+        series = {}
+        for fy in fys:
+            fy_start = get_fy_dates(fy)[0]
+            months = []
+            for i in range(12):
+                month_start, month_end = get_month_dates(fy_start.year + (fy_start.month + i - 1) // 12,
+                                                         (fy_start.month + i - 1) % 12 + 1)
+                revenue = db.session.query(db.func.sum(Job.price)).filter(
+                    Job.date >= month_start, Job.date <= month_end, Job.status.in_(REVENUE_STATUSES)
+                ).scalar() or 0
+                cogs = db.session.query(db.func.sum(Material.cost)).join(Job).filter(
+                    Job.date >= month_start, Job.date <= month_end, Job.status.in_(REVENUE_STATUSES)
+                ).scalar() or 0
+                months.append((revenue, cogs))
+            series[fy] = months
+        return series
+
+    def numpy_series(fys):
+        cols = job_analytics.columns()
+        series = {}
+        for fy in fys:
+            first = analytics.month_index(get_fy_dates(fy)[0])
+            revenue, cogs = analytics.monthly_totals(cols, first, first + 11)
+            series[fy] = list(zip(revenue.tolist(), cogs.tolist()))
+        return series
+
+    def cold_numpy_series(fys):
+        job_analytics.invalidate()
+        return numpy_series(fys)
+
+    def trends(fys):
+        fy_start, fy_end = get_fy_dates(fys[0])
+        return compute_trend_analytics(fys[0], fy_start, fy_end)
+
+    results = {}
+    with app.app_context():
+        fys = get_available_fys()
+        expected = sql_series(fys)
+        got = numpy_series(fys)
+        worst = max(abs(a - b) for fy in fys for pair_a, pair_b in zip(expected[fy], got[fy])
+                    for a, b in zip(pair_a, pair_b))
+        print(f"  {len(fys)} FYs; largest SQL/NumPy difference ${worst:.6f}")
+
+        for name, fn in [('sql_per_month', sql_series), ('numpy_cold', cold_numpy_series),
+                         ('numpy_warm', numpy_series), ('trends_warm', trends)]:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(fys)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {'p50_ms': round(percentile(timings, 50), 2), 'p95_ms': round(percentile(timings, 95), 2)}
+            print(f"  {name:<28} p50 {results[name]['p50_ms']:>8.1f}ms  p95 {results[name]['p95_ms']:>8.1f}ms")
+    return results
+
+
+PLAN_SCAN = re.compile(r'^SCAN (\w+)$')  # No index at all - every row is read
+PLAN_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+PLAN_HOT_ROUTES = re.compile(r'^(?:dashboard|lcars_dashboard|jobs|reports)')  # Must never scan the big tables
+PLAN_HOT_SCANS = {'SCAN job', 'SCAN material'}
+SQL_TABLES = re.compile(r'(?:FROM|JOIN)\s+(?:\w+\.)?(\w+)(?:\s+AS\s+(\w+))?', re.IGNORECASE)
+
+
+def capture_statements(only=None):
+    """Run each route once with cold caches; returns {name: [(sql, parameters)]} of distinct SELECTs"""
+    from sqlalchemy import event
+    from app import app, db, ReportSnapshot, job_analytics, setup_indexes_and_fts
+
+    client, fys, engine = logged_in_client()
+    with app.app_context():
+        # The index set as the app would create it at startup
+        setup_indexes_and_fts()
+        # Snapshots would hide the report queries; the bench database is disposable
+        ReportSnapshot.query.delete()
+        db.session.commit()
+    captured = {}
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip()[:6].upper() in ('SELECT', 'WITH ('):
+            statements.append((statement, tuple(parameters)))
+
+    event.listen(engine, 'before_cursor_execute', record_statement)
+    for name, url in bench_routes(fys):
+        if only and name not in only:
+            continue
+        with app.app_context():
+            job_analytics.invalidate()
+        statements.clear()
+        response = client.get(url)
+        response.get_data()
+        if response.status_code != 200:
+            print(f"  ! {name}: HTTP {response.status_code}")
+            continue
+        captured[name] = list(dict.fromkeys(statements))
+    event.remove(engine, 'before_cursor_execute', record_statement)
+    return captured, engine
+
+
+def explain(cursor, statement, parameters):
+    return [row[3] for row in cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()]
+
+
+def plan_issues(details, aliases, tables):
+    """Full table scans and temp B-trees in one plan, as 'SCAN job' / 'USE TEMP B-TREE FOR ORDER BY'"""
+    issues = []
+    for detail in details:
+        scan = PLAN_SCAN.match(detail)
+        if scan and aliases.get(scan.group(1), scan.group(1)) in tables:
+            issues.append(f'SCAN {aliases.get(scan.group(1), scan.group(1))}')
+        elif detail.startswith('USE TEMP B-TREE'):
+            issues.append(detail)
+    return issues
+
+
+def suggest_index(statement, table, name):
+    """Columns for an index on `table` serving this statement: equality, then range/order, then aggregated"""
+    ref = re.escape(name)
+    # Only comparisons with parameters - join conditions are served by the other table's key
+    equality = re.findall(rf'\b{ref}\.(\w+) (?:= \?|IN \(\?)', statement)
+    ranged = re.findall(rf'\b{ref}\.(\w+) (?:>=|<=|>|<|BETWEEN) \?', statement)
+    ordered = re.findall(rf'ORDER BY {ref}\.(\w+)', statement)
+    summed = re.findall(rf'\b(?:sum|total|avg|min|max)\({ref}\.(\w+)\)', statement, re.IGNORECASE)
+    columns = list(dict.fromkeys(equality + ranged + ordered + summed))
+    if not columns or not (equality or ranged):
+        return None
+    return f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table}({', '.join(columns)})"
+
+
+def advise(cursor, statement, parameters, table, name):
+    """Suggested index for a scan of `table` and whether it removes the scan (tried inside a savepoint)"""
+    create = suggest_index(statement, table, name)
+    if not create:
+        return None, False
+    cursor.execute('SAVEPOINT plan_advisor')
+    try:
+        cursor.execute(create)
+        fixed = not any(PLAN_SCAN.match(detail) and detail.split()[1] == name
+                        for detail in explain(cursor, statement, parameters))
+    finally:
+        cursor.execute('ROLLBACK TO plan_advisor')
+        cursor.execute('RELEASE plan_advisor')
+    return create, fixed
+
+
+def run_plans(only=None):
+    """EXPLAIN QUERY PLAN every statement the routes issue; returns ({name: issues}, suggestions, unused indexes)"""
+    captured, engine = capture_statements(only)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        tables = {name for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        indexes = dict(cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' "
+                                      "AND sql IS NOT NULL").fetchall())
+        used, queried, results, suggestions = set(), set(), {}, {}
+        for name, statements in captured.items():
+            issues = []
+            for statement, parameters in statements:
+                aliases = {alias or table: table for table, alias in SQL_TABLES.findall(statement)}
+                queried.update(aliases.values())
+                details = explain(cursor, statement, parameters)
+                used.update(index for detail in details for index in PLAN_INDEX.findall(detail))
+                for issue in plan_issues(details, aliases, tables):
+                    issues.append(issue)
+                    if not issue.startswith('SCAN '):
+                        continue
+                    table = issue.split()[1]
+                    for alias in [a for a, t in aliases.items() if t == table]:
+                        create, fixed = advise(cursor, statement, parameters, table, alias)
+                        if create:
+                            suggestions.setdefault(create, {'routes': set(), 'fixes': fixed})['routes'].add(name)
+            results[name] = sorted(set(issues))
+            flagged = ', '.join(f'{issue} x{issues.count(issue)}' for issue in results[name]) or 'ok'
+            print(f"  {name:<28} {len(statements):>4} statements  {flagged}")
+        unused = sorted(index for index, table in indexes.items() if table in queried and index not in used)
+    finally:
+        raw.close()
+
+    if suggestions:
+        print("\nSuggested indexes:")
+        for create, info in suggestions.items():
+            verdict = 'removes the scan' if info['fixes'] else 'does not remove the scan'
+            print(f"  {create};  -- {verdict} ({', '.join(sorted(info['routes']))})")
+    if unused:
+        print("\nIndexes no benchmarked route uses (candidates to drop if writes matter more):")
+        for index in unused:
+            print(f"  DROP INDEX {index};  -- on {indexes[index]}")
+    return results
+
+
+def strptime_date(value):
+    """The strptime loop parsing.py replaced, with its 20YY rule - the reference for the corpus"""
+    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+        return parsed.replace(year=2000 + parsed.year % 100) if fmt.endswith('y') else parsed
+    return None
+
+
+def strptime_price(value):
+    try:
+        return float(value.replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return 0.0
+
+
+def date_cell(rng, d):
+    """d written the ways it turns up in the spreadsheets"""
+    day, month = (f'{d.day:02d}', f'{d.month:02d}') if rng.random() < 0.5 else (str(d.day), str(d.month))
+    year = str(d.year) if rng.random() < 0.7 else f'{d.year % 100:02d}'
+    style = rng.random()
+    if style < 0.2:
+        text = d.isoformat()
+    else:
+        sep = '/' if style < 0.8 else '-'
+        text = f'{day}{sep}{month}{sep}{year}'
+    return ' ' * rng.randint(0, 2) + text + ' ' * rng.randint(0, 2)
+
+
+def price_cell(rng, amount):
+    text = f'{amount:,.2f}' if rng.random() < 0.5 else f'{amount:.2f}'
+    return ('$' if rng.random() < 0.6 else '') + text
+
+
+def parsing_corpus(rng, size):
+    """Property checks for parsing.py; returns a list of failure messages"""
+    import parsing
+
+    failures = []
+    noise = '0123456789/-x. $,aZ'
+    for _ in range(size):
+        # Every written form of a real date reads back as that date
+        d = date(2000, 1, 1) + timedelta(days=rng.randint(0, 36500))
+        cell = date_cell(rng, d)
+        if parsing.parse_date(cell) != d:
+            failures.append(f'date {cell!r}: {parsing.parse_date(cell)} != {d}')
+
+        # Arbitrary text never raises, and any date it yields is one the strptime loop agrees with
+        junk = ''.join(rng.choice(noise) for _ in range(rng.randint(0, 12)))
+        got = parsing.parse_date(junk)
+        if got is not None and got != strptime_date(junk):
+            failures.append(f'date {junk!r}: {got} but strptime says {strptime_date(junk)}')
+        if 'x' in junk.lower() and got is not None:
+            failures.append(f'date {junk!r}: placeholder parsed as {got}')
+
+        # Prices round-trip to the cent; junk is 0.0 or what float() made of it
+        amount = round(rng.uniform(-500, 50000), 2)
+        cell = price_cell(rng, amount)
+        if abs(parsing.parse_price(cell) - amount) > 0.001:
+            failures.append(f'price {cell!r}: {parsing.parse_price(cell)} != {amount}')
+        got = parsing.parse_price(junk)
+        if got != 0.0 and got != strptime_price(junk):
+            failures.append(f'price {junk!r}: {got} but float() says {strptime_price(junk)}')
+    return failures
+
+
+def bench_parsing(repeat, rows=20000, seed=2014):
+    """parsing.py property corpus, then rows/second against the strptime loops on a synthetic sheet"""
+    import parsing
+
+    rng = random.Random(seed)
+    failures = parsing_corpus(rng, 5000)
+    print(f"  corpus: 5000 cases x 4 properties, {len(failures)} failures")
+    for line in failures[:20]:
+        print(f"  ✗ {line}")
+
+    # A sheet's worth of cells: dates repeat (many jobs a day), prices repeat more
+    days = [date(2014, 7, 1) + timedelta(days=rng.randint(0, 4000)) for _ in range(rows // 4)]
+    amounts = [round(rng.choice([50, 120, 250, 440, 700, 1200, 2596]) * rng.uniform(0.6, 1.6), 0) for _ in range(300)]
+    sheet = [(date_cell(rng, rng.choice(days)).strip(), price_cell(rng, rng.choice(amounts)), au_phone(rng))
+             for _ in range(rows)]
+
+    def legacy():
+        for day, price, phone in sheet:
+            strptime_date(day), strptime_price(price), phone.strip() or None
+
+    def shared():
+        parsing._parse_date_text.cache_clear()
+        parsing._parse_price_text.cache_clear()
+        for day, price, phone in sheet:
+            parsing.parse_date(day), parsing.parse_price(price), parsing.parse_phone(phone)
+
+    for name, fn in [('strptime_loops', legacy), ('parsing_module', shared)]:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"  {name:<28} {rows / best:>12,.0f} rows/s  ({best * 1000:.1f}ms for {rows} rows)")
+    return 1 if failures else 0
+
+
+def compare_plans(results, baseline=None):
+    """Return a list of plan regressions: scans or temp B-trees a route didn't have in the baseline.
+
+    Without a baseline, any full scan of job or material on the dashboard, /jobs or reports routes fails.
+    """
+    regressions = []
+    for name, issues in results.items():
+        if baseline is None:
+            if PLAN_HOT_ROUTES.match(name):
+                regressions.extend(f"{name}: {issue}" for issue in issues if issue in PLAN_HOT_SCANS)
+            continue
+        if name not in baseline.get('plans', {}):
+            continue
+        for issue in sorted(set(issues) - set(baseline['plans'][name])):
+            regressions.append(f"{name}: {issue}")
+    return regressions
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('routes', {}).get(name)
+        if not base:
+            continue
+        # Small absolute slack so sub-millisecond routes don't flap
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance) + 2:
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {current['queries']}")
+        if current['peak_kb'] > base['peak_kb'] * (1 + tolerance) + 64:
+            regressions.append(f"{name}: peak memory {base['peak_kb']}KB -> {current['peak_kb']}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark QuoteForge hot routes on synthetic data')
+    parser.add_argument('--scale', type=float, default=1, help="multiple of today's data volume (default 1)")
+    parser.add_argument('--seed', type=int, default=2014)
+    parser.add_argument('--years', type=int, default=12, help='financial years of history to generate')
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per route')
+    parser.add_argument('--route', action='append', help='only run the named route (repeatable)')
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'bench_data'))
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the synthetic database')
+    parser.add_argument('--baseline', help='baseline JSON path (default bench_data/baseline_<scale>x.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='save these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before flagging (0.25 = 25%%)')
+    parser.add_argument('--analytics', action='store_true',
+                        help='compare per-month SQL aggregates with the NumPy analytics instead of timing routes')
+    parser.add_argument('--plans', action='store_true',
+                        help='check the query plans of every route instead of timing them (baseline plans_<scale>x.json)')
+    parser.add_argument('--parsing', action='store_true',
+                        help='check parsing.py against a property corpus and time it (no database needed)')
+    args = parser.parse_args()
+
+    if args.parsing:
+        sys.path.insert(0, BASE_DIR)
+        print(f"Parsing ({args.repeat} runs each)...")
+        return bench_parsing(args.repeat)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    scale_label = f'{args.scale:g}x'
+    db_path = os.path.join(args.data_dir, f'bench_{scale_label}_seed{args.seed}.db')
+    baseline_name = f'plans_{scale_label}.json' if args.plans else f'baseline_{scale_label}.json'
+    baseline_path = args.baseline or os.path.join(args.data_dir, baseline_name)
+
+    if args.regenerate and os.path.exists(db_path):
+        os.remove(db_path)
+    needs_data = not os.path.exists(db_path)
+
+    # Must be set before app is imported - the engine is bound at import time
+    os.environ['QUOTEFORGE_DATABASE_URI'] = f'sqlite:///{db_path}'
+    sys.path.insert(0, BASE_DIR)
+    if needs_data:
+        generate_dataset(db_path, args.scale, args.seed, args.years)
+
+    if args.analytics:
+        print(f"Analytics {scale_label} ({args.repeat} runs each)...")
+        bench_analytics(args.repeat)
+        return 0
+
+    if args.plans:
+        print(f"Query plans {scale_label}...")
+        results = run_plans(only=args.route)
+        report = {'scale': args.scale, 'seed': args.seed,
+                  'recorded_at': datetime.now().isoformat(timespec='seconds'), 'plans': results}
+    else:
+        print(f"Benchmarking {scale_label} ({args.repeat} requests per route)...")
+        results = run_benchmarks(args.repeat, only=args.route)
+        report = {
+            'scale': args.scale,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'routes': results,
+        }
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline saved to {baseline_path}")
+
+    if args.compare:
+        if args.plans and not os.path.exists(baseline_path):
+            print(f"No baseline at {baseline_path}; checking hot routes for SCAN job / SCAN material")
+            baseline = None
+        elif not os.path.exists(baseline_path):
+            print(f"No baseline at {baseline_path}; run with --save-baseline first")
+            return 2
+        else:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        if args.plans:
+            regressions = compare_plans(results, baseline)
+        else:
+            regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n=== REGRESSIONS ===")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            return 1
+        print("✓ No regressions against baseline" if baseline is not None else "✓ No hot route scans job or material")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
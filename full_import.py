@@ -9,6 +9,8 @@ import sqlite3
 import os
 import sys
 
+from parsing import parse_date, parse_price, parse_phone
+
 # Configuration
 XLSX_PATH = "/home/bad/Desktop/David/quotes (version 1) (Autosaved) (Autosaved).xlsx"
 DB_PATH = "/home/bad/Desktop/David/quoteforge/instance/quoteforge.db"
@@ -44,27 +46,6 @@ CREATE TABLE IF NOT EXISTS backup (
 );
 """
 
-def parse_date(value):
-    if value is None: return None
-    if isinstance(value, (datetime, date)): 
-        return value if isinstance(value, date) else value.date()
-    if isinstance(value, str):
-        value = value.strip()
-        if not value or 'x' in value.lower(): return None
-        for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']:
-            try: return datetime.strptime(value, fmt).date()
-            except: continue
-    return None
-
-def parse_price(value):
-    if value is None: return 0.0
-    if isinstance(value, (int, float)): return float(value)
-    if isinstance(value, str):
-        val = value.replace('$', '').replace(',', '').strip()
-        try: return float(val)
-        except: return 0.0
-    return 0.0
-
 def main():
     print(f"Starting FULL IMPORT from: {XLSX_PATH}")
     
@@ -101,7 +82,7 @@ def main():
         if not job_date: job_date = date(2014, 1, 1) # Default fallback
         
         name = str(row[2]).strip() if row[2] else "Unknown"
-        phone = str(row[4]).strip() if row[4] and str(row[4]) != '0' else None
+        phone = parse_phone(row[4])
         address = str(row[3]).strip() if row[3] else None
         desc = str(row[7]).strip() if row[7] else "No description"
         price = parse_price(row[9])
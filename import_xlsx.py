@@ -6,41 +6,9 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from openpyxl import load_workbook
-from datetime import datetime, date
+from datetime import date
 from app import app, db, Customer, Job
-
-def parse_date(value):
-    """Parse date from various formats"""
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value.date()
-    if isinstance(value, date):
-        return value
-    if isinstance(value, str):
-        value = value.strip()
-        formats = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y']
-        for fmt in formats:
-            try:
-                return datetime.strptime(value, fmt).date()
-            except:
-                continue
-    return None
-
-def parse_price(value):
-    """Parse price from various formats"""
-    if value is None:
-        return 0.0
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        # Remove $ and commas
-        value = value.replace('$', '').replace(',', '').strip()
-        try:
-            return float(value)
-        except:
-            return 0.0
-    return 0.0
+from parsing import parse_date, parse_price, parse_phone
 
 def import_sheet(ws, year, start_row=6, total_imported=0):
     """Import a single sheet"""
@@ -63,9 +31,7 @@ def import_sheet(ws, year, start_row=6, total_imported=0):
         
         # Clean up values
         name = str(name).strip() if name else f"Unknown {year}"
-        phone = str(phone).strip() if phone else None
-        if phone == '0' or phone == 'None':
-            phone = None
+        phone = parse_phone(phone)
         address = str(address).strip() if address else None
         if address == 'None':
             address = None
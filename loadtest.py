@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Load test for QuoteForge: replays a realistic traffic mix against a real server.
+
+Starts `python3 app.py` on a fresh copy of bench.py's synthetic database, then runs
+N concurrent clients, each logged in with its own session and looping through a
+weighted mix of logins, dashboard loads, search-as-you-type bursts, job saves and
+report views until the time is up. A backup can be started part-way through to see
+what the 2am backup does to anyone still working. Reports throughput, p50/p95/p99
+latency and error / lock-timeout rates per endpoint, so serving-mode and database
+tuning changes can be compared run against run.
+
+Usage:
+    python3 loadtest.py --clients 8 --duration 60                   # 8 staff, one minute
+    python3 loadtest.py --clients 8 --backup-at 20                  # backup starts 20s in
+    python3 loadtest.py --mix search=50,save=30,dashboard=20        # only these actions
+    python3 loadtest.py --env QUOTEFORGE_REPLICA=1 --compare        # fail (exit 1) on regressions
+    python3 loadtest.py --url http://127.0.0.1:8001 --password ...  # an already running server
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from http.cookies import SimpleCookie
+from urllib.parse import quote, urlencode, urlsplit
+
+import bench
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PASSWORD = 'davidbudgewoijanet'
+
+# Share of actions per client; a morning in the workshop is mostly quoting and looking customers up
+DEFAULT_MIX = {'dashboard': 25, 'search': 35, 'save': 20, 'report': 15, 'login': 5}
+KEYSTROKE_DELAY = (0.05, 0.3)  # Seconds between keys while typing a customer name (the slow end is a pause)
+SEARCH_DEBOUNCE = 0.2  # The job form only searches once typing pauses this long (job_form.html)
+SERVER_START_TIMEOUT = 180
+REQUEST_TIMEOUT = 60
+
+
+class Client:
+    """One member of staff: a keep-alive connection, a session cookie and a list of timings"""
+
+    def __init__(self, base_url, password, rng):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.password = password
+        self.rng = rng
+        self.cookie = None
+        self.conn = None
+        self.samples = []  # (endpoint, seconds, outcome)
+
+    def request(self, endpoint, method, path, form=None, accept='text/html'):
+        """Send one request and read the whole body; returns (status, headers, body)"""
+        headers = {'Accept': accept}
+        body = None
+        if self.cookie:
+            headers['Cookie'] = f'session={self.cookie}'
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.samples.append((endpoint, time.perf_counter() - start, 'error'))
+            self.close()
+            return 0, {}, b''
+        elapsed = time.perf_counter() - start
+
+        if response.status == 503:
+            outcome = 'locked'  # The app's answer to a lock held past the busy timeout
+        elif response.status >= 400:
+            outcome = 'error'
+        else:
+            outcome = 'ok'
+        self.samples.append((endpoint, elapsed, outcome))
+        cookie = SimpleCookie(response.getheader('Set-Cookie') or '')
+        if 'session' in cookie:
+            self.cookie = cookie['session'].value
+        return response.status, dict(response.getheaders()), data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    # ---- actions ----
+
+    def login(self):
+        """A fresh session, as when someone opens the app on another machine"""
+        self.cookie = None
+        status, headers, _ = self.request('login', 'POST', '/login', form={'password': self.password})
+        return status == 302 and not headers.get('Location', '').endswith('/login')
+
+    def dashboard(self):
+        self.request('dashboard', 'GET', '/')
+
+    def search(self):
+        """Type a customer's name into the job form, searching whenever typing pauses"""
+        name = bench.au_name(self.rng)
+        typed = ''
+        for i, char in enumerate(name):
+            typed += char
+            pause = self.rng.uniform(*KEYSTROKE_DELAY)
+            if pause >= SEARCH_DEBOUNCE or i == len(name) - 1:
+                self.request('search', 'GET', f'/api/customers/search?q={quote(typed)}', accept='application/json')
+            time.sleep(pause)
+
+    def save(self):
+        """Open the new-job form and save a job (common names often match a returning customer)"""
+        self.request('job_form', 'GET', '/jobs/new')
+        price = round(self.rng.uniform(80, 2500), 2)
+        self.request('job_save', 'POST', '/jobs/new', form={
+            'customer_name': bench.au_name(self.rng),
+            'customer_phone': bench.au_phone(self.rng) if self.rng.random() < 0.9 else '',
+            'customer_email': '',
+            'customer_address': '',
+            'description': self.rng.choice(bench.ITEMS),
+            'price': f'{price:.2f}',
+            'deposit': f'{price / 2:.2f}' if self.rng.random() < 0.3 else '0',
+            'status': self.rng.choice(['quoted', 'quoted', 'accepted', 'completed']),
+            'notes': 'load test',
+            'date': date.today().isoformat(),
+        })
+
+    def report(self, fys):
+        fy = self.rng.choice(fys)
+        self.request('report', 'GET', f'/reports?fy={fy}' if fy else '/reports')
+
+
+def run_client(client, mix, fys, deadline, think):
+    actions, weights = zip(*mix.items())
+    client.login()
+    while time.monotonic() < deadline:
+        action = client.rng.choices(actions, weights)[0]
+        if action == 'report':
+            client.report(fys)
+        else:
+            getattr(client, action)()
+        if think:
+            time.sleep(client.rng.expovariate(1 / think))
+    client.close()
+
+
+def run_backup(client, delay, start, log):
+    """Start a backup `delay` seconds in and follow it to the end, deleting the file afterwards"""
+    time.sleep(max(start + delay - time.monotonic(), 0))
+    began = time.monotonic()
+    client.login()
+    status, _, body = client.request('backup', 'POST', '/backup/create', accept='application/json')
+    if status != 202:
+        log.append(f'backup not started (HTTP {status})')
+        return
+    task_url = json.loads(body)['url']
+    while True:
+        time.sleep(0.25)
+        status, _, body = client.request('backup_poll', 'GET', task_url, accept='application/json')
+        task = json.loads(body) if status == 200 else {'status': 'failed', 'error': f'HTTP {status}'}
+        if task['status'] in ('succeeded', 'failed'):
+            break
+    log.append(f"backup {task['status']} after {time.monotonic() - began:.1f}s "
+               f"(started {delay:g}s in){': ' + task['error'] if task.get('error') else ''}")
+    if task['status'] == 'succeeded':
+        # Load-test backups would otherwise pile up next to the real ones
+        client.request('backup_delete', 'POST', f"/backup/delete/{task['result']['filename']}")
+    client.close()
+
+
+def summarise(samples, duration):
+    """{endpoint: metrics} from (endpoint, seconds, outcome) samples"""
+    by_endpoint = {}
+    for endpoint, seconds, outcome in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, outcome))
+    # Staff traffic only - the backup's own requests are listed but not counted in the total
+    by_endpoint['all'] = [(seconds, outcome) for endpoint, seconds, outcome in samples
+                          if not endpoint.startswith('backup')]
+
+    results = {}
+    for endpoint, rows in by_endpoint.items():
+        if not rows:
+            continue
+        latencies = [seconds * 1000 for seconds, _ in rows]
+        outcomes = [outcome for _, outcome in rows]
+        results[endpoint] = {
+            'requests': len(rows),
+            'rps': round(len(rows) / duration, 2),
+            'p50_ms': round(bench.percentile(latencies, 50), 1),
+            'p95_ms': round(bench.percentile(latencies, 95), 1),
+            'p99_ms': round(bench.percentile(latencies, 99), 1),
+            'error_pct': round(100 * outcomes.count('error') / len(rows), 2),
+            'locked_pct': round(100 * outcomes.count('locked') / len(rows), 2),
+        }
+    return results
+
+
+def print_results(results):
+    print(f"\n{'endpoint':<14} {'requests':>8} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7} {'locked':>7}")
+    for endpoint, r in sorted(results.items(), key=lambda item: (item[0] == 'all', item[0])):
+        print(f"{endpoint:<14} {r['requests']:>8} {r['rps']:>8.1f} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+              f"{r['p99_ms']:>7.1f}ms {r['error_pct']:>6.2f}% {r['locked_pct']:>6.2f}%")
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline"""
+    regressions = []
+    for endpoint, current in results.items():
+        base = baseline.get('endpoints', {}).get(endpoint)
+        if not base:
+            continue
+        # Small absolute slack so fast endpoints don't flap
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance) + 5:
+            regressions.append(f"{endpoint}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {base['rps']} -> {current['rps']} req/s")
+        for rate in ('error_pct', 'locked_pct'):
+            if current[rate] > base[rate] + 0.5:
+                regressions.append(f"{endpoint}: {rate[:-4]} rate {base[rate]}% -> {current[rate]}%")
+    return regressions
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        action, _, weight = part.partition('=')
+        if action.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown action '{action.strip()}' in --mix (choose from {', '.join(DEFAULT_MIX)})")
+        mix[action.strip()] = float(weight or 1)
+    return {action: weight for action, weight in mix.items() if weight > 0}
+
+
+def start_server(db_source, work_dir, port, extra_env):
+    """`python3 app.py` on a copy of db_source, with its side files kept in work_dir"""
+    db_path = os.path.join(work_dir, 'loadtest.db')
+    shutil.copyfile(db_source, db_path)
+    env = dict(os.environ)
+    env.update({
+        'QUOTEFORGE_DATABASE_URI': f'sqlite:///{db_path}',
+        'QUOTEFORGE_PORT': str(port),
+        'QUOTEFORGE_TASKS_DB': os.path.join(work_dir, 'tasks.db'),
+        'QUOTEFORGE_TENANTS_FILE': os.path.join(work_dir, 'tenants.json'),  # Absent: single-shop
+        'QUOTEFORGE_UPLOAD_DIR': os.path.join(work_dir, 'uploads'),
+        'QUOTEFORGE_QUOTE_CACHE_DIR': os.path.join(work_dir, 'quote_cache'),
+        'QUOTEFORGE_SLOW_QUERY_LOG': os.path.join(work_dir, 'slow_query.log'),
+    })
+    env.update(extra_env)
+    log = open(os.path.join(work_dir, 'server.log'), 'w')
+    server = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'app.py')], cwd=BASE_DIR, env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+
+    # Startup builds the search indexes and customer stats before it listens
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    with open(log.name) as f:
+        tail = f.read()[-2000:]
+    raise SystemExit(f"Server did not start on port {port}:\n{tail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test QuoteForge with a realistic traffic mix')
+    parser.add_argument('--clients', type=int, default=4, help='concurrent staff sessions (default 4)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load (default 30)')
+    parser.add_argument('--think', type=float, default=0.2,
+                        help='mean pause between actions in seconds, 0 for flat out (default 0.2)')
+    parser.add_argument('--mix', help='action weights, e.g. dashboard=25,search=35,save=20,report=15,login=5')
+    parser.add_argument('--backup-at', type=float, help='start a backup this many seconds into the run')
+    parser.add_argument('--seed', type=int, default=2014)
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='login password (default: the built-in one)')
+    parser.add_argument('--port', type=int, default=8011, help='port for the started server (default 8011)')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra environment for the started server, e.g. QUOTEFORGE_REPLICA=1 (repeatable)')
+    parser.add_argument('--scale', type=float, default=1, help="bench.py dataset: multiple of today's data")
+    parser.add_argument('--years', type=int, default=12, help='bench.py dataset: financial years of history')
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'bench_data'))
+    parser.add_argument('--baseline', help='baseline JSON path (default bench_data/loadtest_<scale>x_<clients>c.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='save these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before flagging (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    scale_label = f'{args.scale:g}x'
+    baseline_path = args.baseline or os.path.join(args.data_dir, f'loadtest_{scale_label}_{args.clients}c.json')
+    current_fy = date.today().year if date.today().month >= 7 else date.today().year - 1
+    fys = [None] + list(range(current_fy - args.years + 1, current_fy + 1))
+
+    server = None
+    work_dir = None
+    if args.url:
+        base_url = args.url
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        db_source = os.path.join(args.data_dir, f'bench_{scale_label}_seed{args.seed}.db')
+        if not os.path.exists(db_source):
+            # Must be set before app is imported - the engine is bound at import time
+            os.environ['QUOTEFORGE_DATABASE_URI'] = f'sqlite:///{db_source}'
+            sys.path.insert(0, BASE_DIR)
+            bench.generate_dataset(db_source, args.scale, args.seed, args.years)
+        work_dir = tempfile.mkdtemp(prefix='quoteforge-loadtest-')
+        extra_env = dict(item.split('=', 1) for item in args.env)
+        print(f"Starting server on port {args.port} ({scale_label} data)...")
+        server = start_server(db_source, work_dir, args.port, extra_env)
+        base_url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        print(f"Load testing {base_url}: {args.clients} clients for {args.duration:g}s, mix "
+              + ', '.join(f'{action}={weight:g}' for action, weight in mix.items()))
+        # One wrong password per client would lock this IP out, so check it once first
+        if not Client(base_url, args.password, random.Random()).login():
+            raise SystemExit('Login failed - check --password (and that this IP is not locked out)')
+        clients = [Client(base_url, args.password, random.Random(args.seed + i)) for i in range(args.clients)]
+        start = time.monotonic()
+        deadline = start + args.duration
+        threads = [threading.Thread(target=run_client, args=(client, mix, fys, deadline, args.think), daemon=True)
+                   for client in clients]
+        backup_log = []
+        if args.backup_at is not None:
+            backup_client = Client(base_url, args.password, random.Random(args.seed - 1))
+            clients.append(backup_client)
+            threads.append(threading.Thread(target=run_backup, daemon=True,
+                                            args=(backup_client, args.backup_at, start, backup_log)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    samples = [sample for client in clients for sample in client.samples]
+    results = summarise(samples, duration)
+    print_results(results)
+    for line in backup_log:
+        print(f"  {line}")
+
+    report = {
+        'scale': args.scale,
+        'clients': args.clients,
+        'duration': round(duration, 1),
+        'think': args.think,
+        'mix': mix,
+        'backup_at': args.backup_at,
+        'env': args.env,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'endpoints': results,
+    }
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline saved to {baseline_path}")
+
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            print(f"No baseline at {baseline_path}; run with --save-baseline first")
+            return 2
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n=== REGRESSIONS ===")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            return 1
+        print("✓ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
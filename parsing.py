@@ -0,0 +1,86 @@
+"""
+Parsing for the values that arrive as free text: spreadsheet cells, form fields.
+
+One precompiled pattern per accepted shape is tried in a single dispatch
+(no strptime-and-catch loops), and string results are memoised because
+import sheets repeat the same cells thousands of times. Shared by app.py
+and the import scripts so they agree on the edge cases:
+
+- dates: ISO YYYY-MM-DD, or Australian D/M/Y with '/' or '-' (one kind per
+  date) and a 2- or 4-digit year. Two-digit years are 20YY - every job is
+  from 2000 on. 'x' placeholders ("xx/03/2015") and impossible dates are None.
+- prices: numbers with optional '$', thousands commas and sign; anything
+  else (including 'nan'/'inf') is 0.0.
+- phones: kept as typed, except Excel numbers lose their '.0', and blanks,
+  '0' and 'None' become None.
+"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+CACHE_SIZE = 4096  # Distinct cell strings remembered per parser
+
+DATE_RE = re.compile(r'(?:(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})'
+                     r'|(?P<day>\d{1,2})(?P<sep>[/-])(?P<month>\d{1,2})(?P=sep)(?P<year>\d{4}|\d{2}))')
+PRICE_RE = re.compile(r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)')
+PRICE_JUNK = str.maketrans('', '', '$,')
+EMPTY_PHONES = {'', '0', 'None'}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_date_text(text):
+    match = DATE_RE.fullmatch(text.strip())
+    if not match:
+        return None
+    if match.group('iso_year'):
+        year, month, day = match.group('iso_year', 'iso_month', 'iso_day')
+    else:
+        year, month, day = match.group('year', 'month', 'day')
+        if len(year) == 2:
+            year = '20' + year
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    """A date from a date/datetime, or a string in one of the accepted formats; None otherwise"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return _parse_date_text(value)
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_price_text(text):
+    text = text.translate(PRICE_JUNK).strip()
+    return float(text) if PRICE_RE.fullmatch(text) else 0.0
+
+
+def parse_price(value):
+    """A float from a number or a price string like '$1,234.50'; 0.0 when blank or unreadable"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _parse_price_text(value)
+    return 0.0
+
+
+def parse_phone(value):
+    """A phone number as typed, or None when the cell is blank"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stored it as a number, leading zero already gone
+    text = str(value).strip() if value is not None else ''
+    return None if text in EMPTY_PHONES else text
+
+
+def phone_digits(phone):
+    """Digits only, with +61 numbers rewritten to their local 0 form"""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('61') and len(digits) == 11:
+        digits = '0' + digits[2:]
+    return digits
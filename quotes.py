@@ -0,0 +1,179 @@
+"""
+Printable quote / tax invoice documents.
+
+app.py turns a job into a plain-data context (job, customer, line items,
+GST breakdown); this module renders that context to print-ready HTML and
+PDF and keeps the results on disk as <job id>/<content hash>.html|pdf. Nothing
+here touches Flask or the database, so batches can be handed to a process
+pool.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from fpdf import FPDF
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+LAYOUT_VERSION = 1  # Bump when render_pdf() changes, so cached documents are rebuilt
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+TEMPLATE_NAME = 'quote.html'
+MIN_PARALLEL = 4  # Fewer misses than this render inline - not worth starting a pool
+
+
+def currency(value):
+    return f'${value or 0:,.2f}'
+
+
+def ausdate(iso):
+    if not iso:
+        return ''
+    year, month, day = iso.split('-')
+    return f'{day}/{month}/{year}'
+
+
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+_env.filters['currency'] = currency
+_env.filters['ausdate'] = ausdate
+_layout_hash = None
+
+
+def layout_hash():
+    """Hash of the HTML template and PDF layout version - part of every document key"""
+    global _layout_hash
+    if _layout_hash is None:
+        with open(os.path.join(TEMPLATE_DIR, TEMPLATE_NAME), 'rb') as f:
+            _layout_hash = hashlib.sha256(f.read() + str(LAYOUT_VERSION).encode()).hexdigest()
+    return _layout_hash
+
+
+def quote_digest(context):
+    """Content hash of everything that appears on the document"""
+    payload = json.dumps(context, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256((layout_hash() + payload).encode()).hexdigest()[:32]
+
+
+def cached_paths(cache_dir, job_id, digest):
+    base = os.path.join(cache_dir, str(job_id), digest)
+    return base + '.html', base + '.pdf'
+
+
+def render_html(context):
+    return _env.get_template(TEMPLATE_NAME).render(**context).encode('utf-8')
+
+
+def pdf_text(value):
+    """Core PDF fonts are Latin-1 only"""
+    return (value or '').replace('’', "'").replace('–', '-').encode('latin-1', 'replace').decode('latin-1')
+
+
+def render_pdf(context):
+    pdf = FPDF(format='A4')
+    pdf.set_auto_page_break(auto=True, margin=18)
+    pdf.add_page()
+    width = pdf.epw
+
+    pdf.set_font('Helvetica', 'B', 18)
+    pdf.cell(width / 2, 10, pdf_text(context['business_name']))
+    pdf.cell(width / 2, 10, context['title'], align='R', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 9)
+    if context['business_details']:
+        pdf.multi_cell(width / 2, 4.5, pdf_text(context['business_details']), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(6)
+
+    pdf.set_font('Helvetica', 'B', 10)
+    top = pdf.get_y()
+    pdf.cell(width / 2, 6, 'Bill To', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 10)
+    customer = context['customer']
+    for line in [customer['name'], customer['address'], customer['phone'], customer['email']]:
+        if line:
+            pdf.multi_cell(width / 2, 5, pdf_text(line), new_x='LMARGIN', new_y='NEXT')
+    bottom = pdf.get_y()
+
+    pdf.set_xy(pdf.l_margin + width / 2, top)
+    job = context['job']
+    for label, value in [('Number', job['quote_number']), ('Date', ausdate(job['date'])), ('Status', job['status'])]:
+        pdf.set_x(pdf.l_margin + width / 2)
+        pdf.set_font('Helvetica', 'B', 10)
+        pdf.cell(width / 4, 6, label, align='R')
+        pdf.set_font('Helvetica', '', 10)
+        pdf.cell(width / 4, 6, pdf_text(value), align='R', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_y(max(bottom, pdf.get_y()) + 6)
+
+    pdf.set_font('Helvetica', 'B', 10)
+    pdf.set_fill_color(235, 235, 235)
+    pdf.cell(width, 7, 'Description', fill=True, new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.multi_cell(width, 5, pdf_text(job['description'] or 'Upholstery work'), new_x='LMARGIN', new_y='NEXT')
+    if context['items']:
+        pdf.ln(2)
+        pdf.set_font('Helvetica', 'I', 9)
+        pdf.cell(width, 5, 'Includes:', new_x='LMARGIN', new_y='NEXT')
+        for item in context['items']:
+            pdf.multi_cell(width, 4.5, pdf_text(f"- {item['description']} ({item['category']})"),
+                           new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(6)
+
+    totals = context['totals']
+    rows = [('Price (ex GST)', totals['price']), (f"GST ({context['gst_percent']}%)", totals['gst']),
+            ('Total (inc GST)', totals['price_inc_gst'])]
+    if totals['deposit']:
+        rows += [('Deposit Paid', totals['deposit']), ('Balance Due', totals['balance'])]
+    for label, value in rows:
+        bold = label.startswith(('Total', 'Balance'))
+        pdf.set_font('Helvetica', 'B' if bold else '', 11 if bold else 10)
+        pdf.cell(width * 0.7, 7, label, align='R')
+        pdf.cell(width * 0.3, 7, currency(value), align='R', new_x='LMARGIN', new_y='NEXT')
+
+    if context['footer']:
+        pdf.ln(8)
+        pdf.set_font('Helvetica', 'I', 8)
+        pdf.multi_cell(width, 4, pdf_text(context['footer']), align='C', new_x='LMARGIN', new_y='NEXT')
+    return bytes(pdf.output())
+
+
+def write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def render_to_cache(cache_dir, job_id, digest, context):
+    """Render both formats for one job and drop its older cached versions (process pool entry point)"""
+    html_path, pdf_path = cached_paths(cache_dir, job_id, digest)
+    job_dir = os.path.dirname(html_path)
+    os.makedirs(job_dir, exist_ok=True)
+    write_atomic(html_path, render_html(context))
+    write_atomic(pdf_path, render_pdf(context))
+    for name in os.listdir(job_dir):
+        if not name.startswith(digest) and not name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(job_dir, name))
+            except OSError:
+                pass
+    return job_id
+
+
+def render_batch(cache_dir, misses, workers=None):
+    """Render [(job_id, digest, context)] into cache_dir, in a process pool when there are enough"""
+    os.makedirs(cache_dir, exist_ok=True)
+    if len(misses) < MIN_PARALLEL or workers == 1:
+        for job_id, digest, context in misses:
+            render_to_cache(cache_dir, job_id, digest, context)
+        return len(misses)
+    job_ids, digests, contexts = zip(*misses)
+    # forkserver, not fork: the caller is a threaded server (scheduler, task runner, SSE streams), and a
+    # forked worker could inherit a lock that one of those threads was holding
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+        # Chunked so each round trip to a worker carries a batch of contexts, not one
+        list(pool.map(render_to_cache, repeat(cache_dir), job_ids, digests, contexts, chunksize=16))
+    return len(misses)
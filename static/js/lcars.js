@@ -0,0 +1,205 @@
+// ============ LCARS SOUND SYSTEM ============
+let audioCtx = null;
+let audioUnlocked = false;
+
+function initAudio() {
+    if (!audioCtx) {
+        audioCtx = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    // Resume context if suspended (browser autoplay policy)
+    if (audioCtx.state === 'suspended') {
+        audioCtx.resume();
+    }
+    return audioCtx;
+}
+
+// Unlock audio on first user interaction
+function unlockAudio() {
+    if (!audioUnlocked) {
+        const ctx = initAudio();
+        // Play silent sound to unlock
+        const osc = ctx.createOscillator();
+        const gain = ctx.createGain();
+        gain.gain.value = 0;
+        osc.connect(gain);
+        gain.connect(ctx.destination);
+        osc.start(0);
+        osc.stop(0.01);
+        audioUnlocked = true;
+        
+        // Hide audio prompt
+        const prompt = document.getElementById('audio-prompt');
+        if (prompt) prompt.style.display = 'none';
+        
+        // Play confirmation beep
+        setTimeout(() => beepSuccess(), 50);
+        
+        console.log('LCARS Audio System: ENABLED');
+    }
+}
+
+// Add unlock listeners
+document.addEventListener('click', unlockAudio, { once: true });
+document.addEventListener('keydown', unlockAudio, { once: true });
+document.addEventListener('touchstart', unlockAudio, { once: true });
+
+function playBeep(frequency = 800, duration = 0.1, type = 'square', volume = 0.3) {
+    try {
+        const ctx = initAudio();
+        const oscillator = ctx.createOscillator();
+        const gainNode = ctx.createGain();
+        
+        oscillator.connect(gainNode);
+        gainNode.connect(ctx.destination);
+        
+        oscillator.frequency.value = frequency;
+        oscillator.type = type; // 'sine', 'square', 'sawtooth', 'triangle'
+        
+        gainNode.gain.setValueAtTime(volume, ctx.currentTime);
+        gainNode.gain.exponentialRampToValueAtTime(0.01, ctx.currentTime + duration);
+        
+        oscillator.start(ctx.currentTime);
+        oscillator.stop(ctx.currentTime + duration);
+    } catch(e) {
+        console.error('LCARS Audio Error:', e);
+    }
+}
+
+// Different beep types
+function beepBoot() { playBeep(600, 0.08, 'square', 0.4); }
+function beepProgress() { playBeep(800, 0.05, 'square', 0.3); }
+function beepSuccess() { 
+    playBeep(880, 0.1, 'square', 0.4);
+    setTimeout(() => playBeep(1100, 0.15, 'square', 0.5), 100);
+}
+function beepPanel() { playBeep(1200, 0.06, 'sine', 0.3); }
+function beepClick() { playBeep(1400, 0.04, 'square', 0.4); }
+function beepHover() { playBeep(1800, 0.02, 'sine', 0.2); }
+
+// ============ BOOT SEQUENCE LOGIC ============
+document.addEventListener('DOMContentLoaded', () => {
+    const bootScreen = document.getElementById('boot-screen');
+    const mainInterface = document.getElementById('main-interface');
+    const bootProgress = document.getElementById('boot-progress');
+    const bootText = document.getElementById('boot-text');
+    const texts = [
+        "MEMORY CHECK...",
+        "LOADING LCARS PROTOCOLS...",
+        "CONNECTING TO NEURAL NET...",
+        "ACCESS GRANTED"
+    ];
+
+    // If session storage says we already booted, skip
+    if (sessionStorage.getItem('booted')) {
+        bootScreen.style.display = 'none';
+        mainInterface.style.opacity = '1';
+        startSequence();
+        updateStardate();
+        addClickSounds();
+        return;
+    }
+
+    let progress = 0;
+    let textIndex = 0;
+    let lastBeepProgress = 0;
+
+    // Initial boot beep
+    setTimeout(() => beepBoot(), 100);
+
+    const interval = setInterval(() => {
+        progress += Math.random() * 5;
+        if (progress > 100) progress = 100;
+        bootProgress.style.width = progress + "%";
+
+        // Beep every ~15% progress
+        if (progress - lastBeepProgress > 15) {
+            beepProgress();
+            lastBeepProgress = progress;
+        }
+
+        if (progress > (textIndex + 1) * 25 && textIndex < texts.length) {
+            bootText.innerText = texts[textIndex];
+            beepBoot();
+            textIndex++;
+        }
+
+        if (progress === 100) {
+            clearInterval(interval);
+            beepSuccess();
+            setTimeout(finishBoot, 500);
+        }
+    }, 50);
+
+    function finishBoot() {
+        bootScreen.style.opacity = '0';
+        setTimeout(() => {
+            bootScreen.style.display = 'none';
+            mainInterface.style.opacity = '1';
+            sessionStorage.setItem('booted', 'true');
+            startSequence();
+            addClickSounds();
+        }, 500);
+    }
+
+    function startSequence() {
+        const sidebar = document.querySelector('.left-col');
+        if(sidebar) {
+            sidebar.classList.add('anim-sidebar');
+            beepPanel();
+        }
+        
+        setTimeout(() => {
+            const topbar = document.querySelector('.top-bar');
+            if(topbar) {
+                topbar.classList.add('anim-topbar');
+                beepPanel();
+            }
+        }, 400);
+
+        const panels = document.querySelectorAll('.lcars-panel');
+        let delay = 800;
+        panels.forEach((el) => {
+            setTimeout(() => {
+                el.classList.add('anim-panel');
+                beepPanel();
+            }, delay);
+            delay += 200;
+        });
+    }
+
+    function updateStardate() {
+        const now = new Date();
+        const start = new Date(now.getFullYear(), 0, 0);
+        const diff = now - start;
+        const oneDay = 1000 * 60 * 60 * 24;
+        const day = Math.floor(diff / oneDay);
+        const stardate = (40000 + (now.getFullYear() - 2323) * 1000 + (day * 1000 / 365)).toFixed(1);
+        const el = document.getElementById('stardate');
+        if(el) el.innerText = "SD " + stardate;
+    }
+    updateStardate();
+});
+
+// Add click sounds to interactive elements
+function addClickSounds() {
+    // Sidebar blocks
+    document.querySelectorAll('.sidebar-block').forEach(el => {
+        el.addEventListener('click', () => beepClick());
+        el.addEventListener('mouseenter', () => beepHover());
+    });
+    
+    // Panels and tiles
+    document.querySelectorAll('.lcars-panel, .lcars-panel a, table tr').forEach(el => {
+        el.addEventListener('click', () => beepClick());
+    });
+    
+    // Buttons
+    document.querySelectorAll('button, .lcars-search-btn').forEach(el => {
+        el.addEventListener('click', () => beepClick());
+    });
+    
+    // Status items
+    document.querySelectorAll('[style*="border-left"]').forEach(el => {
+        el.addEventListener('click', () => beepClick());
+    });
+}